@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+# Measures the speed of the accounting file parser on generated accounting 
+# files, so that changes that make parsing slower can be found.  The results
+# are saved as JSON, and can be compared with the results of an earlier run.
+
+from optparse import OptionParser
+import csv
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from multiprocessing import Pool
+from lsfpy.accounting import *
+from lsfpy.aggregate import *
+from lsfpy.synthetic import AcctGenerator
+
+p=OptionParser()
+p.add_option("-n", "--records", dest="records", default="10000,100000",help="Comma separated list of the number of records in each generated file", metavar="COUNTS")
+p.add_option("-d", "--dir", dest="dir", default=tempfile.gettempdir(), help="Directory to keep the generated files in", metavar="DIR")
+p.add_option("-o", "--output", dest="output",help="Save the results to FILE", metavar="FILE")
+p.add_option("-c", "--compare", dest="compare",help="Compare the results with those saved in FILE", metavar="FILE")
+p.add_option("-s", "--sample", dest="sample", type="int", default=10000, help="Number of records used to measure the cost of each field", metavar="COUNT")
+
+(options, args)=p.parse_args()
+
+## Returns the path to a generated file with count records, creating it if 
+#  it does not exist.
+def generated(count):
+	path=os.path.join(options.dir, "lsb.acct.bench.%d" % count)
+	if not os.path.exists(path):
+		f=open(path+".tmp", 'w')
+		AcctGenerator(seed=count).write(f, count)
+		f.close()
+		os.rename(path+".tmp", path)
+	return path
+
+def tokenize(path):
+	n=0
+	for row in csv.reader(open(path, 'r'), delimiter=' ', quotechar='"'):
+		n+=1
+	return n
+
+def split(path):
+	n=0
+	for row in readRows(open(path, 'rb')):
+		n+=1
+	return n
+
+## The legacy parser, reading a text mode file through the csv module.
+def text(path):
+	n=0
+	for i in AcctFile(open(path, 'r')):
+		n+=1
+	return n
+
+def eager(path):
+	n=0
+	for i in AcctFile(open(path, 'rb')):
+		n+=1
+	return n
+
+def lazy(path):
+	n=0
+	for i in AcctFile(open(path, 'rb'), lazy=True):
+		i.queue
+		n+=1
+	return n
+
+def compact(path):
+	jobs=list(AcctFile(open(path, 'rb'), eventClass=CompactJobFinishEvent))
+	return len(jobs)
+
+def jobFinishEvent(path):
+	rows=list(readRows(open(path, 'rb')))
+	start=time.time()
+	for row in rows:
+		JobFinishEvent(row)
+	# Only the time spent creating events is reported
+	return len(rows), time.time()-start
+
+def jobStats(path):
+	aggregates=[Count(name='numFJobs', where=failed), Sum('waitTime'), Sum('runTime', name='wallTime'),
+			Sum('cpuTime', name='runTime'), Sum('cpuTime', name='wasteTime', where=failed)]
+	qs=GroupBy(['queue'], aggregates)
+	us=GroupBy(['userName'], aggregates)
+	n=0
+	for i in AcctFile(open(path, 'rb'), lazy=True):
+		qs.add(i)
+		us.add(i)
+		n+=1
+	return n
+
+BENCHMARKS=(
+		("csv", tokenize),
+		("splitRecord", split),
+		("AcctFile text", text),
+		("AcctFile", eager),
+		("AcctFile lazy", lazy),
+		("AcctFile compact", compact),
+		("JobFinishEvent", jobFinishEvent),
+		("jobStats", jobStats),
+		)
+
+## Runs a benchmark in the worker process, so the peak memory use only 
+#  includes that benchmark.
+def run(args):
+	name, path=args
+	func=dict(BENCHMARKS)[name]
+	start=time.time()
+	result=func(path)
+	elapsed=time.time()-start
+	if isinstance(result, tuple):
+		result, elapsed=result
+	# ru_maxrss is in kilobytes on Linux
+	return result, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+## Measures the cost of decoding each field of a LazyJobFinishEvent.
+def fieldCosts(path):
+	rows=[]
+	for row in readRows(open(path, 'rb')):
+		rows.append(row)
+		if len(rows)>=options.sample:
+			break
+	names=[n for n, c in JOB_FINISH_HEAD+JOB_FINISH_TAIL]+["eventTime","submitTime","startTime",
+			"askedHosts","execHosts","runTime","waitTime"]
+	costs={}
+	for name in names:
+		events=[LazyJobFinishEvent(r) for r in rows]
+		start=time.time()
+		for e in events:
+			getattr(e, name)
+		costs[name]=(time.time()-start)/len(events)*1e9
+	return costs
+
+results={
+		"time":time.time(),
+		"python":platform.python_version(),
+		"platform":platform.platform(),
+		"benchmarks":[],
+		"fieldCosts":{},
+		}
+
+for count in [int(c) for c in options.records.split(",")]:
+	path=generated(count)
+	size=os.path.getsize(path)
+	for name, func in BENCHMARKS:
+		pool=Pool(1)
+		records, elapsed, rss=pool.apply(run, ((name, path),))
+		pool.close()
+		pool.join()
+		r={
+				"name":name,
+				"records":records,
+				"seconds":elapsed,
+				"recordsPerSecond":records/elapsed,
+				"mbPerSecond":size/elapsed/1024/1024,
+				"peakRSSKB":rss,
+				}
+		results["benchmarks"].append(r)
+		print("%-18s %9d records %8.2fs %10.0f rec/s %7.1f MB/s %8d KB" % (name, records, elapsed, 
+				r["recordsPerSecond"], r["mbPerSecond"], rss))
+	costs=fieldCosts(path)
+	results["fieldCosts"][str(count)]=costs
+	print("Field decode cost (ns/record):")
+	for name in sorted(costs, key=costs.get, reverse=True):
+		print(" %-18s %8.0f" % (name, costs[name]))
+
+if options.output:
+	f=open(options.output, 'w')
+	json.dump(results, f, indent=1)
+	f.close()
+
+if options.compare:
+	f=open(options.compare, 'r')
+	previous=json.load(f)
+	f.close()
+	old=dict(((b["name"], b["records"]), b) for b in previous["benchmarks"])
+	print("Compared with %s (Python %s):" % (options.compare, previous["python"]))
+	for b in results["benchmarks"]:
+		o=old.get((b["name"], b["records"]))
+		if o:
+			print("%-18s %9d records %+7.1f%% rec/s" % (b["name"], b["records"], 
+					(b["recordsPerSecond"]/o["recordsPerSecond"]-1)*100))
@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 #
 # This file is part of the python lsf collection.
 #
@@ -20,101 +20,68 @@
 
 from optparse import OptionParser
 import os
-import csv
 import datetime
+import json
 from lsfpy.accounting import *
+from lsfpy.aggregate import *
 
 p=OptionParser()
 p.add_option("-f", "--file", dest="filename",help="Read from lsb accounting FILE", metavar="FILE")
+p.add_option("-s", "--stats", dest="stats", action="store_true", default=False, help="Print parsing statistics as JSON to standard error")
 
 (options, args)=p.parse_args()
 
 if not options.filename:
-	print "No filename specified."
+	print("No filename specified.")
 	sys.exit(253)
 	
 if not os.path.isfile(options.filename):
-	print "File does not exist: %s" % options.filename
+	print("File does not exist: %s" % options.filename)
 	sys.exit(255)
 	
 try:
-	acctf=open(options.filename,'r')
+	acctf=open(options.filename,'rb')
 except IOError as e:
-	print 'File cannot be opened.'
+	print('File cannot be opened.')
 	sys.exit(254)
 	
 
-# Dictionary containing an entry for each queue, which is in itself a dictionary 
-# containing the stats for the queue
-qs={}
-us={}
+# Totals for each queue and user, the times are in seconds.
+aggregates=[
+		Count(name='numFJobs', where=failed),
+		Sum('waitTime'),
+		Sum('runTime', name='wallTime'),
+		# The CPU time is the wall clock time multiplied by the number of 
+		# slots.
+		Sum('cpuTime', name='runTime'),
+		# If the terminfo number is >0, then it was not a normal exit status.
+		# Add the cpu time to the wasted time.
+		Sum('cpuTime', name='wasteTime', where=failed),
+		]
+qs=GroupBy(['queue'], aggregates)
+us=GroupBy(['userName'], aggregates)
 
-for i in AcctFile(acctf):
-	# If the queue does not have an entry in the dictionary, then create
-	# one now.
-	if not i.queue in qs:
-		qs[i.queue]={
-				'name':i.queue,
-				'numJobs':0,
-				'numFJobs':0,
-				'waitTime':datetime.timedelta(0),
-				'runTime':datetime.timedelta(0),
-				'wallTime':datetime.timedelta(0),
-				'wasteTime':datetime.timedelta(0),
-				}
-	# Based on the queue, increment the timers and counters accordingly
-	# increment the number of jobs
-	qs[i.queue]['numJobs']+=1
-	# Add the time the job had to wait before it was started
-	qs[i.queue]['waitTime']+=i.waitTime
-	# Work out the CPU time, this is the wall clock time multiplied by the 
-	# number of slots.
-	qs[i.queue]['runTime']+=(i.numProcessors*i.runTime)
-	# Add the wall clock time
-	qs[i.queue]['wallTime']+=i.runTime
-	# If the terminfo number is >0, then it was not a normal exit status.  Add
-	# the cpu time to the wasted time.
-	if i.termInfo.number>0:
-		qs[i.queue]['wasteTime']+=(i.numProcessors*i.runTime)
-		qs[i.queue]['numFJobs']+=1
+stats=None
+if options.stats:
+	stats=ParseStats(callback=lambda r: sys.stderr.write(json.dumps(r, indent=1, sort_keys=True)+"\n"))
 
-	# Do the same based on the user name.
-	if not i.userName in us:
-		us[i.userName]={
-				'name':i.userName,
-				'numJobs':0,
-				'numFJobs':0,
-				'waitTime':datetime.timedelta(0),
-				'runTime':datetime.timedelta(0),
-				'wallTime':datetime.timedelta(0),
-				'wasteTime':datetime.timedelta(0),
-				}
-	us[i.userName]['numJobs']+=1
-	us[i.userName]['waitTime']+=i.waitTime
-	us[i.userName]['runTime']+=(i.numProcessors*i.runTime)
-	us[i.userName]['wallTime']+=i.runTime
-	if i.termInfo.number>0:
-		us[i.userName]['wasteTime']+=(i.numProcessors*i.runTime)
-		us[i.userName]['numFJobs']+=1
+for i in AcctFile(acctf, lazy=True, stats=stats):
+	qs.add(i)
+	us.add(i)
 
+def printSummary(name, r):
+	print("Name: %s" % name)
+	print(" Total Jobs:      %d" % r['numJobs'])
+	print(" Failed Jobs:     %d" % r['numFJobs'])
+	print(" Total Wait Time: %s" % datetime.timedelta(seconds=r['waitTime']))
+	print(" Total Wall Time: %s" % datetime.timedelta(seconds=r['wallTime']))
+	print(" Total CPU Time:  %s" % datetime.timedelta(seconds=r['runTime']))
+	print(" Total Terminated CPU Time: %s" % datetime.timedelta(seconds=r['wasteTime']))
 
 # Print out a summary per queue.
-for q in qs.values():
-	print "Name: %s" % q['name']
-	print " Total Jobs:      %d" % q['numJobs']
-	print " Failed Jobs:     %d" % q['numFJobs']
-	print " Total Wait Time: %s" % q['waitTime']
-	print " Total Wall Time: %s" % q['wallTime']
-	print " Total CPU Time:  %s" % q['runTime']
-	print " Total Terminated CPU Time: %s" %q['wasteTime']
-
+for key, r in qs.rows():
+	printSummary(key[0], r)
 
 # Print out a summary per user, highest abuser at the top.
-for u in sorted(us.values(), key=lambda k: k['wasteTime'], reverse=True):
-	print "Name: %s" % u['name']
-	print " Total Jobs:      %d" % u['numJobs']
-	print " Failed Jobs:     %d" % u['numFJobs']
-	print " Total Wait Time: %s" % u['waitTime']
-	print " Total Wall Time: %s" % u['wallTime']
-	print " Total CPU Time:  %s" % u['runTime']
-	print " Total Terminated CPU Time: %s" %u['wasteTime']
+for key, r in sorted(us.rows(), key=lambda k: k[1]['wasteTime'], reverse=True):
+	printSummary(key[0], r)
@@ -1,4 +1,4 @@
-#!/usr/bin/python
+#!/usr/bin/python3
 #
 # This file is part of the python lsf collection.
 #
@@ -22,35 +22,36 @@
 from optparse import OptionParser
 import os
 import csv
-import datetime
 from lsfpy.accounting import *
+from lsfpy.aggregate import *
 
 p=OptionParser()
 p.add_option("-f", "--file", dest="filename",help="Read from lsb accounting FILE", metavar="FILE")
 p.add_option("-o", "--output", dest="output",help="Write CSV data to file ", metavar="OUTPUT")
+p.add_option("-m", "--max-groups", dest="maxGroups", type="int", help="Merge the smallest groups once there are more than MAX groups", metavar="MAX")
 
 (options, args)=p.parse_args()
 
 if not options.filename:
-	print "No filename specified."
+	print("No filename specified.")
 	sys.exit(253)
 	
 if not os.path.isfile(options.filename):
-	print "File does not exist: %s" % options.filename
+	print("File does not exist: %s" % options.filename)
 	sys.exit(255)
 	
 try:
-	acctf=open(options.filename,'r')
+	acctf=open(options.filename,'rb')
 except IOError as e:
-	print 'File cannot be opened.'
+	print('File cannot be opened.')
 	sys.exit(254)
 	
 if not options.output:
-	print 'No output filename specified.  You must specify a filename to write the data to.'
+	print('No output filename specified.  You must specify a filename to write the data to.')
 	sys.exit(252)
 
 try:
-	of=csv.writer(open(options.output, 'wb'), dialect='excel')
+	of=csv.writer(open(options.output, 'w', newline=''), dialect='excel')
 	of.writerow([
 		'User Name',
 		'Project Name',
@@ -67,80 +68,41 @@ try:
 		'Total Wallclock Time',
    ])
 except IOError as e:
-	print 'Output file cannot be opened.'
+	print('Output file cannot be opened.')
 	sys.exit(253)
 
 
 
-
-
-
-
-
-buckets={}
-
-
-
-for job in AcctFile(acctf):
-	# The following fields are stored:
-	#  userName
-	#  project
-	#  numProcessors
-	#  queue
-	#  exitStatus
-	#  termInfo
-	#  command without arguments
-	#  SAAP
-	fields=[
-			job.userName,
-			job.projectName,
-			job.numProcessors,
-			job.queue,
-			job.jStatus,
-			job.termInfo.name,
-			job.command.split(" ")[0],
-			"%s-%s" % (job.submitTime.year,job.submitTime.month),
-			job.chargedSAAP,
-			]
-	# Iterate through each value of vield, if there is no bucket
-	# for that value yet, then create it.
-	bucket=buckets
-	for f in fields:
-		if not f in bucket:
-			bucket[f]={}
-		bucket=bucket[f]
-	# If there are no entries for the metrics in the bucket, create them
-	if not "numJobs" in bucket:
-		bucket['numJobs']=0
-		bucket['pendTime']=datetime.timedelta(0)
-		bucket['CPUTime']=datetime.timedelta(0)
-		bucket['wallTime']=datetime.timedelta(0)
-		bucket['__END__']=True
-
-	bucket['numJobs']+=1
-	bucket['pendTime']+=job.waitTime
-	bucket['CPUTime']+=(job.numProcessors*job.runTime)
-	bucket['wallTime']+=job.runTime
-
-
-
-
-def iterBuckets(items, bucket):
-	if '__END__' in bucket:
-		line=[]
-		for i in items:
-			line.append(str(i))
-		for i in (bucket['numJobs'],bucket['pendTime'].total_seconds(),bucket['CPUTime'].total_seconds(),bucket['wallTime'].total_seconds()):
-			line.append(str(i))
-		of.writerow(line)
-	else:
-		for key in bucket.keys():
-			ritems=items[:]
-			ritems.append(key)
-			iterBuckets(ritems,bucket[key])
-
-
-items=[]
-iterBuckets(items, buckets)
-
-
+# The following fields are stored:
+#  userName
+#  project
+#  numProcessors
+#  queue
+#  exitStatus
+#  termInfo
+#  command without arguments
+#  submit month
+#  SAAP
+buckets=GroupBy([
+		'userName',
+		'projectName',
+		'numProcessors',
+		'queue',
+		'jStatus',
+		lambda job: job.termInfo.name,
+		lambda job: job.command.split(" ")[0],
+		lambda job: "%s-%s" % (job.submitTime.year,job.submitTime.month),
+		'chargedSAAP',
+		],[
+		Sum('pendTime'),
+		Sum('cpuTime', name='CPUTime'),
+		Sum('runTime', name='wallTime'),
+		], maxGroups=options.maxGroups)
+
+buckets.extend(AcctFile(acctf, lazy=True))
+
+for key, r in buckets.rows():
+	line=[str(i) for i in key]
+	for i in (r['numJobs'],r['pendTime'],r['CPUTime'],r['wallTime']):
+		line.append(str(i))
+	of.writerow(line)
@@ -30,20 +30,20 @@ p.add_option("-f", "--file", dest="filename",help="Read from lsb accounting FILE
 (options, args)=p.parse_args()
 
 if not options.filename:
-	print "No filename specified."
+	print("No filename specified.")
 	sys.exit(253)
 	
 if not os.path.isfile(options.filename):
-	print "File does not exist: %s" % options.filename
+	print("File does not exist: %s" % options.filename)
 	sys.exit(255)
 	
 try:
-	acctf=open(options.filename,'r')
+	acctf=open(options.filename,'rb')
 except IOError as e:
-	print 'File cannot be opened.'
+	print('File cannot be opened.')
 	sys.exit(254)
 	
 
 
-for i in AcctFile(acctf):
-	print i.queue
+for i in AcctFile(acctf, lazy=True):
+	print(i.queue)
@@ -19,12 +19,42 @@
 #
 
 
+import calendar
 import datetime
+import io
 import sys
 import os
+import time
 from optparse import OptionParser
 import csv
 import unittest
+from sys import intern
+from lsfpy.compressed import openCompressed
+
+## Converts a field read from a file opened in binary mode to a string.  
+#  Accounting files are normally UTF-8, a field that is not valid UTF-8 is 
+#  decoded as latin-1 so that no bytes are lost.  Strings are returned as 
+#  they are.
+def decodeField(value):
+	if isinstance(value, bytes):
+		try:
+			return value.decode("utf-8")
+		except UnicodeDecodeError:
+			return value.decode("latin-1")
+	return value
+
+## Converts every field of a row to a string with decodeField.  The fields 
+#  of a row read in binary mode are decoded together, which is much faster
+#  than decoding them one at a time.
+def decodeRow(row):
+	if row and isinstance(row[0], bytes):
+		try:
+			fields=b"\0".join(row).decode("utf-8").split("\0")
+			if len(fields)==len(row):
+				return fields
+		except UnicodeDecodeError:
+			pass
+	return [decodeField(v) for v in row]
 
 TERMINFO={
 		"-1":{
@@ -158,7 +188,7 @@ TERMINFO={
 #  class takes the error number and provides an error name and description as attributes.
 class TermInfo:
 	def __init__(self, id):
-		id=str(id)
+		id=str(decodeField(id))
 		if (not id in TERMINFO):
 			id="0"
 		## The name of the error as specified in lsbatch.h, for example TERM_RUNLIMIT
@@ -175,6 +205,7 @@ class TermInfo:
 #  to access and manipulate the data accordingly.
 class JobFinishEvent:
 	def __init__(self,row=[]):
+		row=decodeRow(row)
 		# If the first entry isn't JOB_FINISH, then its the wrong type of accounting entry
 		if not row[0]=="JOB_FINISH":
 			raise ValueError
@@ -200,7 +231,7 @@ class JobFinishEvent:
 		## A datetime object for the time the event was generated (The time 
 		#  the job finished)
 		#\returns A datetime object.
-		self.eventTime=datetime.datetime.utcfromtimestamp(self.eventTimeEpoch)
+		self.eventTime=fromEpoch(self.eventTimeEpoch)
 
 		## The ID number of the job.
 		#\returns Job ID as integer
@@ -220,22 +251,22 @@ class JobFinishEvent:
 		self.submitTimeEpoch=float(row.pop(0))
 
 		## A datetime object for when the job was submitted.
-		self.submitTime=datetime.datetime.utcfromtimestamp(self.submitTimeEpoch)
+		self.submitTime=fromEpoch(self.submitTimeEpoch)
 
 		## The epoch time when the job can be started, Job start time . the job should be started at or after this time
 		self.beginTimeEpoch=float(row.pop(0))
 
 
 		## A datetime object for the job start time, the job should be started at or after this time.
-		self.beginTime=datetime.datetime.utcfromtimestamp(self.beginTimeEpoch)
+		self.beginTime=fromEpoch(self.beginTimeEpoch)
 
 		## The epoch time of the Job termination deadline. the job should be terminated by this time.
 		self.termTimeEpoch=float(row.pop(0))
 
-		self.termTime=datetime.datetime.utcfromtimestamp(self.termTimeEpoch)
+		self.termTime=fromEpoch(self.termTimeEpoch)
 
 		self.startTimeEpoch=float(row.pop(0))
-		self.startTime=datetime.datetime.utcfromtimestamp(self.startTimeEpoch)
+		self.startTime=fromEpoch(self.startTimeEpoch)
 		## The user name of the submitter.
 		#\returns User Name as string.
 		self.userName=row.pop(0)
@@ -503,6 +534,426 @@ class JobFinishEvent:
 		self.pendTime=self.waitTime
 
 
+## Converts an rusage time in seconds to a timedelta.  LSF logs -1 when the
+#  value is unavailable, this is treated as no time used.
+def _seconds(value):
+	sec=float(value)
+	if (sec<0):
+		sec=0
+	return datetime.timedelta(seconds=sec)
+
+## Layout of the fields in a JOB_FINISH record that are logged before the
+#  variable length askedHosts list.  Each entry holds the attribute name and
+#  the function used to convert the logged string, None leaves the string 
+#  as it is.
+JOB_FINISH_HEAD=(
+		("eventType",None),
+		("version",None),
+		("eventTimeEpoch",float),
+		("jobID",int),
+		("userId",int),
+		("options",None),
+		("numProcessors",int),
+		("submitTimeEpoch",float),
+		("beginTimeEpoch",float),
+		("termTimeEpoch",float),
+		("startTimeEpoch",float),
+		("userName",None),
+		("queue",None),
+		("resReq",None),
+		("dependCond",None),
+		("preExecCmd",None),
+		("fromHost",None),
+		("cwd",None),
+		("inFile",None),
+		("outFile",None),
+		("errFile",None),
+		("jobFile",None),
+		("numAskedHosts",int),
+		)
+
+## Layout of the fields in a JOB_FINISH record that are logged after the 
+#  variable length execHosts list, in the same form as JOB_FINISH_HEAD.
+JOB_FINISH_TAIL=(
+		("jStatus",int),
+		("hostFactor",float),
+		("jobName",None),
+		("command",None),
+		("utime",_seconds),
+		("stime",_seconds),
+		("maxrss",None),
+		("ixrss",None),
+		("ismrss",None),
+		("idrss",None),
+		("isrss",None),
+		("minflt",None),
+		("majflt",None),
+		("nswap",None),
+		("inblock",None),
+		("oublock",None),
+		("ioch",None),
+		("msgsnd",None),
+		("msgrcv",None),
+		("nsignals",None),
+		("nvcsw",None),
+		("nivcsw",None),
+		("exutime",None),
+		("mailUser",None),
+		("projectName",None),
+		("exitStatus",int),
+		("maxNumProcessors",int),
+		("loginShell",None),
+		("timeEvent",None),
+		("idx",None),
+		("maxRMem",None),
+		("maxRSwap",None),
+		("inFileSpool",None),
+		("commandSpool",None),
+		("rsvId",None),
+		("sla",None),
+		("exceptMask",None),
+		("additionalInfo",None),
+		("termInfo",TermInfo),
+		("warningAction",None),
+		("warningTimePeriod",None),
+		("chargedSAAP",None),
+		("licenseProject",None),
+		)
+
+## Resolves the position of the variable length host lists in a JOB_FINISH 
+#  row.
+#\param row A sequence containing the fields of a JOB_FINISH record.
+#\returns A tuple containing the index of the numExHosts field, and the index
+#  of the first field following the execHosts list (jStatus).
+#\throws ValueError if the row is too short to hold every field.
+def jobFinishOffsets(row):
+	ex=len(JOB_FINISH_HEAD)+int(row[len(JOB_FINISH_HEAD)-1])
+	tail=ex+1+int(row[ex])
+	if len(row)<tail+len(JOB_FINISH_TAIL):
+		raise ValueError("JOB_FINISH record is truncated")
+	return ex, tail
+
+
+## Attribute of a LazyJobFinishEvent that decodes its value the first time it
+#  is read, then stores the value on the event so the next read is a plain
+#  attribute lookup.
+class _LazyField(object):
+	def __init__(self, name, decode):
+		self.name=name
+		self.decode=decode
+
+	def __get__(self, event, cls):
+		if event is None:
+			return self
+		value=self.decode(event)
+		event.__dict__[self.name]=value
+		return value
+
+def _headDecoder(i, convert):
+	if convert is None:
+		return lambda e: decodeField(e._row[i])
+	return lambda e: convert(e._row[i])
+
+def _tailDecoder(i, convert):
+	if convert is None:
+		return lambda e: decodeField(e._row[e._tail+i])
+	return lambda e: convert(e._row[e._tail+i])
+
+def _startTime(e):
+	if e.startTimeEpoch<1:
+		# Job never started
+		return e.termTime
+	return fromEpoch(e.startTimeEpoch)
+
+def _runTime(e):
+	if e.startTimeEpoch<1:
+		# Job never started
+		return datetime.timedelta(0)
+	return e.eventTime-e.startTime
+
+def _waitTime(e):
+	if e.startTimeEpoch<1:
+		# Job never started
+		return e.eventTime-e.submitTime
+	return e.startTime-e.submitTime
+
+## The event type of a JOB_FINISH row, read in text or binary mode.
+_JOB_FINISH=("JOB_FINISH", b"JOB_FINISH")
+
+## A JOB_FINISH event that provides the same attributes as JobFinishEvent, but
+#  only converts a field when the attribute is first read.  The raw row is 
+#  kept as a tuple, and the position of the host lists is worked out once when
+#  the event is created.  This makes creating the event cheap, so scans that 
+#  only read a few attributes of each job spend very little time per record.
+#  When the row was read in binary mode, only the string fields that are read
+#  are decoded.
+#
+#  As fields are only converted on demand, a badly formed value will raise an
+#  exception when the attribute is read, not when the event is created.
+class LazyJobFinishEvent(object):
+	def __init__(self, row=[]):
+		# If the first entry isn't JOB_FINISH, then its the wrong type of accounting entry
+		if not row[0] in _JOB_FINISH:
+			raise ValueError
+		self._row=tuple(row)
+		self._ex, self._tail=jobFinishOffsets(self._row)
+
+	eventTime=_LazyField("eventTime", lambda e: fromEpoch(e.eventTimeEpoch))
+	submitTime=_LazyField("submitTime", lambda e: fromEpoch(e.submitTimeEpoch))
+	beginTime=_LazyField("beginTime", lambda e: fromEpoch(e.beginTimeEpoch))
+	termTime=_LazyField("termTime", lambda e: fromEpoch(e.termTimeEpoch))
+	startTime=_LazyField("startTime", _startTime)
+	askedHosts=_LazyField("askedHosts", lambda e: [decodeField(h) for h in e._row[len(JOB_FINISH_HEAD):e._ex]])
+	numExHosts=_LazyField("numExHosts", lambda e: int(e._row[e._ex]))
+	execHosts=_LazyField("execHosts", lambda e: [decodeField(h) for h in e._row[e._ex+1:e._tail]])
+	runTime=_LazyField("runTime", _runTime)
+	waitTime=_LazyField("waitTime", _waitTime)
+	pendTime=_LazyField("pendTime", _waitTime)
+
+for _i, (_name, _convert) in enumerate(JOB_FINISH_HEAD):
+	setattr(LazyJobFinishEvent, _name, _LazyField(_name, _headDecoder(_i, _convert)))
+for _i, (_name, _convert) in enumerate(JOB_FINISH_TAIL):
+	setattr(LazyJobFinishEvent, _name, _LazyField(_name, _tailDecoder(_i, _convert)))
+
+
+## Shared TermInfo objects, keyed on the logged termination number.
+_termInfos={}
+
+## Returns a shared TermInfo object for a termination number, so records that
+#  store many TermInfo objects only hold one per reason.
+#\param id The termination number as logged.
+#\returns A TermInfo object, the same object is returned for the same id.
+def termInfoFor(id):
+	try:
+		return _termInfos[id]
+	except KeyError:
+		t=_termInfos[id]=TermInfo(id)
+		return t
+
+## Converts a logged resource usage counter to an int, or a float if the value
+#  has a fractional part.  -1 is kept when LSF could not collect the value.
+def _number(value):
+	try:
+		return int(value)
+	except ValueError:
+		return float(value)
+
+def _clampedSeconds(value):
+	sec=float(value)
+	if (sec<0):
+		sec=0.0
+	return sec
+
+## String fields that usually hold only a few distinct values, these are 
+#  interned by CompactJobFinishEvent so each distinct value is stored once.
+_INTERNED=set(("eventType","version","userName","queue","fromHost","mailUser",
+		"projectName","loginShell","sla","chargedSAAP","licenseProject"))
+
+## How CompactJobFinishEvent stores the fields that it does not keep in the 
+#  same form as JobFinishEvent, each entry maps the field name to the name of
+#  the slot and the function used to convert the logged string.
+_COMPACT={
+		"utime":("utimeSeconds",_clampedSeconds),
+		"stime":("stimeSeconds",_clampedSeconds),
+		"termInfo":("termInfo",termInfoFor),
+		}
+for _name in ("maxrss","ixrss","ismrss","idrss","isrss","minflt","majflt",
+		"nswap","inblock","oublock","ioch","msgsnd","msgrcv","nsignals",
+		"nvcsw","nivcsw","exutime","maxRMem","maxRSwap"):
+	_COMPACT[_name]=(_name,_number)
+
+def _internField(value):
+	return intern(decodeField(value))
+
+def _compactLayout(fields):
+	layout=[]
+	for name, convert in fields:
+		if name in _COMPACT:
+			layout.append(_COMPACT[name])
+		elif name in _INTERNED:
+			layout.append((name,_internField))
+		else:
+			layout.append((name,convert or decodeField))
+	return tuple(layout)
+
+## A JOB_FINISH event that uses as little memory as possible, for when a large
+#  number of jobs are held in memory for analysis.  The event has no __dict__,
+#  times are only stored as seconds since the epoch with the datetime and 
+#  timedelta attributes of JobFinishEvent calculated each time they are read,
+#  and the resource usage counters are stored as numbers instead of strings.
+#  Strings that are repeated between jobs such as the user name and queue are
+#  interned, and every job that ended for the same reason shares one TermInfo
+#  object.
+#
+#  The event provides every attribute that JobFinishEvent does, with the 
+#  exception that the resource usage counters are numbers, and that askedHosts
+#  and execHosts are tuples.
+class CompactJobFinishEvent(object):
+	_head=_compactLayout(JOB_FINISH_HEAD)
+	_tail=_compactLayout(JOB_FINISH_TAIL)
+	__slots__=tuple(name for name, convert in _head+_tail)+("askedHosts","numExHosts","execHosts")
+
+	def __init__(self, row=[]):
+		# If the first entry isn't JOB_FINISH, then its the wrong type of accounting entry
+		if not row[0] in _JOB_FINISH:
+			raise ValueError
+		ex, tail=jobFinishOffsets(row)
+		for (name, convert), value in zip(self._head, row):
+			setattr(self, name, convert(value))
+		self.askedHosts=tuple(_internField(h) for h in row[len(self._head):ex])
+		self.numExHosts=int(row[ex])
+		self.execHosts=tuple(_internField(h) for h in row[ex+1:tail])
+		for (name, convert), value in zip(self._tail, row[tail:]):
+			setattr(self, name, convert(value))
+
+	## A datetime object for the time the event was generated (The time 
+	#  the job finished)
+	@property
+	def eventTime(self):
+		return fromEpoch(self.eventTimeEpoch)
+
+	## A datetime object for when the job was submitted.
+	@property
+	def submitTime(self):
+		return fromEpoch(self.submitTimeEpoch)
+
+	## A datetime object for the job start time, the job should be started at or after this time.
+	@property
+	def beginTime(self):
+		return fromEpoch(self.beginTimeEpoch)
+
+	@property
+	def termTime(self):
+		return fromEpoch(self.termTimeEpoch)
+
+	## A datetime object for when the job started, or the termination deadline
+	#  if the job never started.
+	@property
+	def startTime(self):
+		if self.startTimeEpoch<1:
+			return self.termTime
+		return fromEpoch(self.startTimeEpoch)
+
+	## User time used as a timedelta.
+	@property
+	def utime(self):
+		return datetime.timedelta(seconds=self.utimeSeconds)
+
+	## System time used as a timedelta.
+	@property
+	def stime(self):
+		return datetime.timedelta(seconds=self.stimeSeconds)
+
+	## The wall clock time the job ran for as a timedelta.
+	@property
+	def runTime(self):
+		if self.startTimeEpoch<1:
+			return datetime.timedelta(0)
+		return datetime.timedelta(seconds=self.eventTimeEpoch-self.startTimeEpoch)
+
+	## The time the job was pending as a timedelta.
+	@property
+	def waitTime(self):
+		if self.startTimeEpoch<1:
+			return datetime.timedelta(seconds=self.eventTimeEpoch-self.submitTimeEpoch)
+		return datetime.timedelta(seconds=self.startTimeEpoch-self.submitTimeEpoch)
+
+	pendTime=waitTime
+
+
+## Reads the complete records from an accounting file, along with the offset
+#  of each record.  A record is normally a single line, but a quoted field can
+#  contain newlines, so lines are joined until every quote has been closed.  
+#  A record at the end of the file without its trailing newline is either
+#  the last record of a file that does not end with a newline, or a record
+#  that has not been completely written yet.
+#\param fh A file object opened in binary mode, reading starts at the current
+#  position.
+#\param partial If True, a record at the end of the file without its 
+#  trailing newline is returned as it is.  If False, it is not returned, 
+#  and the file is left positioned at its start so it can be read again once
+#  the rest has been written, as when following a file that is being logged
+#  to.
+#\returns A generator of (offset, record) tuples, where record is the text of
+#  the record including the trailing newline.
+def readRecords(fh, partial=True):
+	offset=fh.tell()
+	while True:
+		record=fh.readline()
+		# Every quote in a complete record is paired, so an odd number of 
+		# quotes means a quoted field continues on the next line.
+		while record and (record.count(b'"')%2 or not record.endswith(b"\n")):
+			line=fh.readline()
+			if not line:
+				break
+			record+=line
+		if not record or (not partial and (record.count(b'"')%2 or not record.endswith(b"\n"))):
+			fh.seek(offset)
+			return
+		yield offset, record
+		offset+=len(record)
+
+## Splits a record read in binary mode into a list of fields without decoding
+#  them, quotes around a field are removed and doubled quotes inside a 
+#  quoted field are replaced by a single quote.  Splitting on the quotes 
+#  first is several times faster than matching each field with a regular
+#  expression.
+#\param record The bytes of a record as returned by readRecords.
+#\returns A list of bytes objects.
+def splitRecord(record):
+	# Odd numbered parts are inside quotes, even numbered parts hold the 
+	# unquoted fields between them.
+	parts=iter(record.split(b'"'))
+	fields=next(parts).split()
+	for field in parts:
+		unquoted=next(parts, None)
+		# Nothing between two quotes is a doubled quote inside the field
+		while unquoted==b"":
+			quoted=next(parts, None)
+			if quoted is None:
+				break
+			field+=b'"'+quoted
+			unquoted=next(parts, None)
+		fields.append(field)
+		if unquoted:
+			fields.extend(unquoted.split())
+	return fields
+
+## Splits a record into a list of fields.
+#\param record The record as returned by readRecords, or a line of text.
+#\returns A list of bytes objects if record is bytes, otherwise a list of 
+#  strings.
+def parseRecord(record):
+	if isinstance(record, bytes):
+		return splitRecord(record)
+	return next(csv.reader(record.splitlines(True), delimiter=' ', quotechar='"'))
+
+## Returns True if a file object was opened in binary mode.
+def isBinary(fh):
+	return isinstance(fh, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(fh, "mode", "")
+
+## Reads the rows of an accounting file opened in binary mode.
+#\param fh A file object opened in binary mode.
+#\returns A generator of lists of bytes objects, one for each record.
+def readRows(fh):
+	for offset, record in readRecords(fh):
+		yield splitRecord(record)
+
+_EPOCH=datetime.datetime(1970, 1, 1)
+
+## Converts seconds since the epoch to a datetime object in UTC, without a 
+#  time zone, the same as the deprecated datetime.utcfromtimestamp.
+def fromEpoch(t):
+	return _EPOCH+datetime.timedelta(seconds=t)
+
+## Converts a time to seconds since the epoch.
+#\param t A datetime object in UTC as used by JobFinishEvent, a number of 
+#  seconds since the epoch, or None.
+def toEpoch(t):
+	if isinstance(t, datetime.datetime):
+		return calendar.timegm(t.utctimetuple())+t.microsecond/1e6
+	return t
+
 ## Parses the LSB accounting file, and returns an iterator that can be used to
 #  get the details for each job entry.  Each job that is successfully submitted
 #  into LSF has an entry created in the LSF accounting file.  This stores 
@@ -525,26 +976,408 @@ class JobFinishEvent:
 # The following code prints out the queue for each job found.
 #\code
 #from lsfpy.accounting import AcctFile
-#for i in AcctFile(open('lsb.acct','r')):
-#    print i.queue
+#for i in AcctFile(open('lsb.acct','rb')):
+#    print(i.queue)
 #\endcode
+#
+#  The file should be opened in binary mode, each record is then split into 
+#  fields without decoding it, and only the string fields that are used are 
+#  decoded.  A file opened in text mode, or a list of lines, is parsed with 
+#  the csv module.
+#
+#  When only a few attributes of each job are needed, pass lazy=True to get
+#  LazyJobFinishEvent objects, these only convert the fields that are read.
+#  To keep a large number of jobs in memory, pass 
+#  eventClass=CompactJobFinishEvent.
 
 class AcctFile:
 	## Initializer is called with an open file handle object opened to the 
 	#  lsb accounting file.
-	#\param fh An open file object to the accounting file.
-	def __init__(self, fh):
-		self.reader=csv.reader(fh,delimiter=' ', quotechar='"')
+	#\param fh An open file object to the accounting file.  A file opened in
+	#  binary mode can be compressed with gzip, bzip2, xz or zstd, which is
+	#  detected from its first bytes.
+	#\param lazy If True, return LazyJobFinishEvent objects instead of 
+	#  JobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row, for example CompactJobFinishEvent.  This overrides lazy.
+	#\param stats A ParseStats object that is updated as the file is read, or
+	#  None to read the file without collecting statistics.
+	#\param strict If True, raise the error from a malformed JOB_FINISH 
+	#  record instead of skipping it.  Records of other types are always 
+	#  skipped.
+	def __init__(self, fh, lazy=False, eventClass=None, stats=None, strict=False):
+		if isBinary(fh):
+			fh=openCompressed(fh)
+		## The ParseStats object updated as the file is read, or None.
+		self.stats=stats
+		self.strict=strict
+		if stats is not None:
+			self._returned=None
+			if isBinary(fh):
+				self.reader=(splitRecord(r) for r in _timedRecords(fh, stats))
+			else:
+				self.reader=csv.reader(_timedLines(fh, stats),delimiter=' ', quotechar='"')
+		elif isBinary(fh):
+			self.reader=readRows(fh)
+		else:
+			self.reader=csv.reader(fh,delimiter=' ', quotechar='"')
+		## The class used to create an event from each JOB_FINISH row.
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
 
 	def __iter__(self):
 		return self
 
 	## Iterator function is called each iteration and parses the next line of
 	#  the config file returning an event object for the specific event.
+	#  Records that are not JOB_FINISH records, and JOB_FINISH records that 
+	#  cannot be parsed, are skipped.
 	#\return An event object corresponding to the type of event in the log file.
-	def next(self):
+	def __next__(self):
+		if self.stats is not None:
+			return self._nextCounted()
+		while True:
+			row=next(self.reader)
+			try:
+				return self.eventClass(row)
+			except (ValueError, IndexError):
+				if self.strict and row and row[0] in _JOB_FINISH:
+					raise
+
+	def _nextCounted(self):
+		stats=self.stats
+		times=stats.times
+		clock=time.perf_counter
+		now=clock()
+		if self._returned:
+			times["consumer"]+=now-self._returned
+		while True:
+			line=stats.lines+1
+			read=times["read"]
+			try:
+				row=next(self.reader)
+			except StopIteration:
+				if self._returned is not False:
+					times["tokenize"]+=clock()-now-(times["read"]-read)
+					self._returned=False
+					stats.finished()
+				raise
+			started=clock()
+			times["tokenize"]+=started-now-(times["read"]-read)
+			stats.records+=1
+			eventType=decodeField(row[0]) if row else ""
+			stats.byType[eventType]=stats.byType.get(eventType, 0)+1
+			event=None
+			try:
+				event=self.eventClass(row)
+			except (ValueError, IndexError) as e:
+				if eventType!="JOB_FINISH":
+					stats.skipped+=1
+				elif self.strict:
+					raise
+				else:
+					stats.malformed+=1
+					stats.error(line, "%s: %s" % (type(e).__name__, e))
+			now=clock()
+			times["convert"]+=now-started
+			if event is not None:
+				stats.events+=1
+				if stats.sampleInterval and not stats.events%stats.sampleInterval:
+					stats.sample(row)
+			if stats.interval and not stats.records%stats.interval:
+				stats.report()
+			if event is not None:
+				self._returned=clock()
+				return event
+
+## Reads the records of a file opened in binary mode, see readRecords, 
+#  adding the time spent reading, the number of bytes and the number of lines
+#  to a ParseStats object.
+def _timedRecords(fh, stats):
+	clock=time.perf_counter
+	times=stats.times
+	records=readRecords(fh)
+	while True:
+		started=clock()
+		try:
+			offset, record=next(records)
+		except StopIteration:
+			times["read"]+=clock()-started
+			return
+		times["read"]+=clock()-started
+		stats.bytesRead+=len(record)
+		stats.lines+=record.count(b"\n")
+		yield record
+
+## Reads the lines of a file opened in text mode, in the same way as
+#  _timedRecords.  The number of characters is counted as bytesRead.
+def _timedLines(fh, stats):
+	clock=time.perf_counter
+	times=stats.times
+	lines=iter(fh)
+	while True:
+		started=clock()
 		try:
-			j=JobFinishEvent(self.reader.next())
-		except:
-			j=JobFinishEvent(self.reader.next())
-		return j
+			line=next(lines)
+		except StopIteration:
+			times["read"]+=clock()-started
+			return
+		times["read"]+=clock()-started
+		stats.bytesRead+=len(line)
+		stats.lines+=1
+		yield line
+
+## The fields timed by ParseStats.sample, the logged fields followed by the 
+#  fields LazyJobFinishEvent calculates.
+SAMPLED_FIELDS=tuple(name for name, convert in JOB_FINISH_HEAD+JOB_FINISH_TAIL)+(
+		"eventTime","submitTime","startTime","askedHosts","execHosts","runTime","waitTime")
+
+## Statistics collected by an AcctFile while it reads a file, pass a 
+#  ParseStats object to AcctFile to collect them.  When no ParseStats object 
+#  is passed AcctFile does not time anything, so reading costs the same as 
+#  it would without statistics.
+#
+#  The time spent in each stage is kept in times, in seconds:
+#  - read: reading records or lines from the file.
+#  - tokenize: splitting each record into fields.
+#  - convert: creating the event from the fields.
+#  - consumer: the time between an event being returned and the next event
+#    being asked for, the time spent by the code using the events, for 
+#    example aggregating them.
+#
+# Example Usage:
+#
+# The following code prints the statistics every 100000 records, and at the
+# end of the file.
+#\code
+#from lsfpy.accounting import AcctFile, ParseStats
+#stats=ParseStats(callback=print, interval=100000)
+#for i in AcctFile(open('lsb.acct','rb'), stats=stats):
+#    pass
+#\endcode
+class ParseStats(object):
+	## The stages that are timed.
+	STAGES=("read","tokenize","convert","consumer")
+
+	## Initializer is called with how to report the statistics.
+	#\param callback A function called with the dictionary returned by 
+	#  toDict every interval records, and when the end of the file is reached.
+	#\param interval The number of records between calls to callback, or 0 to
+	#  only call it at the end of the file.
+	#\param sampleInterval Time the decoding of each field of every 
+	#  sampleInterval-th event, see sample, or 0 to not time fields.
+	#\param maxErrors The number of malformed records whose line and reason
+	#  are kept, later malformed records are only counted.
+	def __init__(self, callback=None, interval=0, sampleInterval=0, maxErrors=100):
+		self.callback=callback
+		self.interval=interval
+		self.sampleInterval=sampleInterval
+		self.maxErrors=maxErrors
+		## The number of bytes read, characters for a file opened in text mode.
+		self.bytesRead=0
+		## The number of lines read.
+		self.lines=0
+		## The number of records read, of any type.
+		self.records=0
+		## The number of records of each event type.
+		self.byType={}
+		## The number of events returned.
+		self.events=0
+		## The number of records skipped because they are not JOB_FINISH 
+		#  records.
+		self.skipped=0
+		## The number of JOB_FINISH records that could not be parsed.
+		self.malformed=0
+		## A list of (line, reason) tuples for the first maxErrors malformed
+		#  records, line is the line number the record starts on.
+		self.errors=[]
+		## The time spent in each stage in seconds, keyed on the stage.
+		self.times=dict((stage, 0.0) for stage in self.STAGES)
+		## The total time spent decoding each field, and the number of times
+		#  it was timed, keyed on the field name.
+		self.fieldCosts={}
+
+	## Records a malformed record.
+	#\param line The line number the record starts on.
+	#\param reason A description of the problem.
+	def error(self, line, reason):
+		if len(self.errors)<self.maxErrors:
+			self.errors.append((line, reason))
+
+	## Times the decoding of each field of a JOB_FINISH row, this is called 
+	#  for every sampleInterval-th event and can be overridden to sample 
+	#  something else.
+	#\param row The fields of the record.
+	def sample(self, row):
+		clock=time.perf_counter
+		event=LazyJobFinishEvent(row)
+		for name in SAMPLED_FIELDS:
+			started=clock()
+			try:
+				getattr(event, name)
+			except (ValueError, IndexError):
+				pass
+			cost=self.fieldCosts.setdefault(name, [0.0, 0])
+			cost[0]+=clock()-started
+			cost[1]+=1
+
+	## Calls the callback with the current statistics.
+	def report(self):
+		if self.callback is not None:
+			self.callback(self.toDict())
+
+	## Called by AcctFile when the end of the file is reached.
+	def finished(self):
+		self.report()
+
+	## Returns the statistics as a dictionary, that only holds numbers, 
+	#  strings, lists and dictionaries so it can be passed to a metrics system
+	#  or saved as JSON.
+	#\returns A dictionary of the statistics, fieldCosts holds the average 
+	#  cost of decoding each field in nanoseconds.
+	def toDict(self):
+		return {
+				"bytesRead":self.bytesRead,
+				"lines":self.lines,
+				"records":self.records,
+				"byType":dict(self.byType),
+				"events":self.events,
+				"skipped":self.skipped,
+				"malformed":self.malformed,
+				"errors":[{"line":line, "reason":reason} for line, reason in self.errors],
+				"times":dict(self.times),
+				"fieldCosts":dict((name, total/count*1e9) for name, (total, count) in self.fieldCosts.items()),
+				}
+
+
+## Position of the projectName field in JOB_FINISH_TAIL.
+_PROJECT=[name for name, convert in JOB_FINISH_TAIL].index("projectName")
+
+# The quote, JOB_FINISH prefix and separator for text and binary records, 
+# indexed by whether the record is bytes.
+_QUOTE=('"', b'"')
+_PREFIX=('"JOB_FINISH" ', b'"JOB_FINISH" ')
+_SPACE=(' ', b' ')
+
+def _filterSet(values, convert=None):
+	if values is None:
+		return None
+	if convert:
+		values=[convert(v) for v in values]
+	return frozenset(values)
+
+## Reads the JOB_FINISH events in an accounting file that match a set of 
+#  filters.  Each filter is checked as early as possible, the event time,
+#  user name and queue are checked on the start of the line before it is 
+#  split into fields, and the project name and job status are checked before
+#  the event object is created.  Records of other types are skipped by 
+#  looking at the first few characters.  When only a small part of the file
+#  matches, this is much faster than checking the attributes of every event
+#  returned by AcctFile.
+#
+#  Filters that are None are not checked, a job has to match every filter 
+#  that is given.
+#
+# Example Usage:
+#
+# The following code prints the job ID of each job that exited in the
+# normal queue.
+#\code
+#from lsfpy.accounting import AcctScan
+#for i in AcctScan(open('lsb.acct','rb'), queues=['normal'], jStatus=[32]):
+#    print(i.jobID)
+#\endcode
+class AcctScan:
+	## Initializer is called with an open file handle object opened to the 
+	#  lsb accounting file, and the filters to apply.
+	#\param fh An open file object to the accounting file, which can be
+	#  compressed, see AcctFile.
+	#\param queues A list of queue names.
+	#\param users A list of user names.
+	#\param projects A list of project names.
+	#\param since Only return jobs that finished at or after this time, a
+	#  datetime in UTC or seconds since the epoch.
+	#\param until Only return jobs that finished before this time.
+	#\param jStatus A list of job status numbers, for example [32] for jobs 
+	#  that exited.
+	#\param lazy If True, return LazyJobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row.  This overrides lazy.
+	def __init__(self, fh, queues=None, users=None, projects=None, since=None, until=None, jStatus=None, lazy=False, eventClass=None):
+		if isBinary(fh):
+			fh=openCompressed(fh)
+		self.lines=iter(fh)
+		self.queues=_filterSet(queues)
+		self.users=_filterSet(users)
+		self.projects=_filterSet(projects)
+		self.jStatus=_filterSet(jStatus, int)
+		self.since=toEpoch(since)
+		self.until=toEpoch(until)
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
+
+	def __iter__(self):
+		return self
+
+	## Reads the next record, joining lines when a quoted field contains a
+	#  newline.
+	def _record(self):
+		record=next(self.lines)
+		quote=_QUOTE[isinstance(record, bytes)]
+		while record.count(quote)%2:
+			record+=next(self.lines)
+		return record
+
+	## Checks the filters that can be applied to the start of the record.  
+	#  The fields up to and including the queue never contain spaces.
+	def _matchPrefix(self, record):
+		binary=isinstance(record, bytes)
+		if not record.startswith(_PREFIX[binary]):
+			return False
+		fields=record.split(_SPACE[binary], 13)
+		if len(fields)<14:
+			return False
+		if self.since is not None or self.until is not None:
+			t=float(fields[2])
+			if self.since is not None and t<self.since:
+				return False
+			if self.until is not None and t>=self.until:
+				return False
+		if self.users is not None and decodeField(fields[11][1:-1]) not in self.users:
+			return False
+		if self.queues is not None and decodeField(fields[12][1:-1]) not in self.queues:
+			return False
+		return True
+
+	## Checks the filters that need the record split into fields.
+	def _matchRow(self, row):
+		if self.projects is None and self.jStatus is None:
+			return True
+		ex, tail=jobFinishOffsets(row)
+		if self.jStatus is not None and int(row[tail]) not in self.jStatus:
+			return False
+		if self.projects is not None and decodeField(row[tail+_PROJECT]) not in self.projects:
+			return False
+		return True
+
+	## Returns the next event that matches the filters.
+	def __next__(self):
+		while True:
+			record=self._record()
+			try:
+				if not self._matchPrefix(record):
+					continue
+				row=parseRecord(record)
+				if self._matchRow(row):
+					return self.eventClass(row)
+			except (ValueError, IndexError):
+				# Badly formed record
+				continue
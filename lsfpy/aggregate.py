@@ -0,0 +1,484 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import math
+from operator import attrgetter
+from lsfpy.sketch import TDigest, HyperLogLog, SpaceSaving
+
+## Returns the time a job was pending in seconds.  For jobs that never 
+#  started this is the time until the job finished, the same as the waitTime
+#  attribute of JobFinishEvent.
+def waitSeconds(e):
+	if e.startTimeEpoch<1:
+		return e.eventTimeEpoch-e.submitTimeEpoch
+	return e.startTimeEpoch-e.submitTimeEpoch
+
+## Returns the wall clock time a job ran for in seconds, zero for jobs that
+#  never started.
+def runSeconds(e):
+	if e.startTimeEpoch<1:
+		return 0.0
+	return e.eventTimeEpoch-e.startTimeEpoch
+
+## Returns the wall clock time a job ran for multiplied by the number of 
+#  processors, in seconds.
+def cpuSeconds(e):
+	return e.numProcessors*runSeconds(e)
+
+## Returns True if the job did not exit normally.
+def failed(e):
+	return e.termInfo.number>0
+
+## Fields calculated from the event that can be used by name in keys and 
+#  aggregates, times are in seconds.
+FIELDS={
+		"waitTime":waitSeconds,
+		"pendTime":waitSeconds,
+		"runTime":runSeconds,
+		"cpuTime":cpuSeconds,
+		}
+
+## Returns a function that gets a field from an event.
+#\param field The name of an attribute of the event, the name of an entry in
+#  FIELDS, or a function that is called with the event.
+def fieldGetter(field):
+	if callable(field):
+		return field
+	if field in FIELDS:
+		return FIELDS[field]
+	return attrgetter(field)
+
+## Base class for the aggregates used by GroupBy.  An aggregate holds no data
+#  itself, GroupBy keeps a state for each group and aggregate, and calls the 
+#  aggregate to update it.  States only contain numbers, lists, dictionaries
+#  and the sketches from lsfpy.sketch, so partial results can be pickled and 
+#  sent between processes.
+class Aggregate(object):
+	## Initializer is called with the field to aggregate.
+	#\param field The field to aggregate, see fieldGetter.
+	#\param name The name of the result, defaults to the name of the field.
+	#\param where A function called with each event, only events where it
+	#  returns True are aggregated.
+	def __init__(self, field=None, name=None, where=None):
+		if field is not None:
+			self.get=fieldGetter(field)
+		if name is None and isinstance(field, str):
+			name=self.defaultName(field)
+		self.name=name
+		self.where=where
+
+	## Returns the name of the result when no name is given.
+	def defaultName(self, field):
+		return field
+
+	## Returns the state for a new group.
+	def initial(self):
+		return 0.0
+
+	## Returns the state after adding an event.
+	def add(self, state, event):
+		raise NotImplementedError
+
+	## Returns the state combining two partial states.
+	def merge(self, a, b):
+		raise NotImplementedError
+
+	## Returns the result from a state.
+	def result(self, state):
+		return state
+
+## Counts the events in each group.
+class Count(Aggregate):
+	def __init__(self, name="count", where=None):
+		Aggregate.__init__(self, None, name, where)
+
+	def initial(self):
+		return 0
+
+	def add(self, state, event):
+		return state+1
+
+	def merge(self, a, b):
+		return a+b
+
+## Totals a field.
+class Sum(Aggregate):
+	def add(self, state, event):
+		return state+self.get(event)
+
+	def merge(self, a, b):
+		return a+b
+
+## The smallest value of a field, None if the group is empty.
+class Min(Aggregate):
+	def defaultName(self, field):
+		return "min%s%s" % (field[:1].upper(), field[1:])
+
+	def initial(self):
+		return None
+
+	def add(self, state, event):
+		v=self.get(event)
+		if state is None or v<state:
+			return v
+		return state
+
+	def merge(self, a, b):
+		if a is None:
+			return b
+		if b is None:
+			return a
+		return min(a, b)
+
+## The largest value of a field, None if the group is empty.
+class Max(Min):
+	def defaultName(self, field):
+		return "max%s%s" % (field[:1].upper(), field[1:])
+
+	def add(self, state, event):
+		v=self.get(event)
+		if state is None or v>state:
+			return v
+		return state
+
+	def merge(self, a, b):
+		if a is None:
+			return b
+		if b is None:
+			return a
+		return max(a, b)
+
+## The mean of a field, None if the group is empty.
+class Mean(Aggregate):
+	def defaultName(self, field):
+		return "mean%s%s" % (field[:1].upper(), field[1:])
+
+	def initial(self):
+		return [0.0, 0]
+
+	def add(self, state, event):
+		state[0]+=self.get(event)
+		state[1]+=1
+		return state
+
+	def merge(self, a, b):
+		return [a[0]+b[0], a[1]+b[1]]
+
+	def result(self, state):
+		if not state[1]:
+			return None
+		return state[0]/state[1]
+
+## An estimate of a percentile of a field.  Values are counted in buckets 
+#  whose width grows with the value, so the estimate is within relativeError
+#  of the true value, and the memory used only depends on the range of the 
+#  values, not on how many there are.  Values of zero or less are counted 
+#  together.
+class Percentile(Aggregate):
+	## Initializer is called with the field and the percentile.
+	#\param field The field to aggregate, see fieldGetter.
+	#\param q The percentile as a fraction, for example 0.95.
+	#\param name The name of the result, defaults to the name of the field 
+	#  followed by the percentile, for example waitTimeP95.
+	#\param where A function called with each event, only events where it
+	#  returns True are aggregated.
+	#\param relativeError The accuracy of the estimate.
+	def __init__(self, field, q, name=None, where=None, relativeError=0.01):
+		self.q=q
+		Aggregate.__init__(self, field, name, where)
+		self.gamma=(1+relativeError)/(1-relativeError)
+		self.logGamma=math.log(self.gamma)
+
+	def defaultName(self, field):
+		return "%sP%g" % (field, self.q*100)
+
+	def initial(self):
+		return {}
+
+	def add(self, state, event):
+		v=self.get(event)
+		if v>0:
+			b=int(math.ceil(math.log(v)/self.logGamma))
+		else:
+			b=None
+		state[b]=state.get(b, 0)+1
+		return state
+
+	def merge(self, a, b):
+		a=dict(a)
+		for k, v in b.items():
+			a[k]=a.get(k, 0)+v
+		return a
+
+	def result(self, state):
+		n=sum(state.values())
+		if not n:
+			return None
+		rank=self.q*(n-1)
+		seen=state.get(None, 0)
+		if rank<seen:
+			return 0.0
+		for b in sorted(k for k in state if k is not None):
+			seen+=state[b]
+			if rank<seen:
+				# The middle of the bucket, in relative terms
+				return 2*self.gamma**b/(self.gamma+1)
+		return 2*self.gamma**b/(self.gamma+1)
+
+## Estimates several quantiles of a field with a t-digest, which is more 
+#  accurate than Percentile for the extreme quantiles and shares one sketch 
+#  between all of the quantiles.  The result is a dictionary keyed on each 
+#  quantile, None if the group is empty.
+class Quantiles(Aggregate):
+	## Initializer is called with the field and the quantiles.
+	#\param field The field to aggregate, see fieldGetter.
+	#\param qs The quantiles as fractions.
+	#\param name The name of the result, defaults to the name of the field 
+	#  followed by Quantiles, for example waitTimeQuantiles.
+	#\param where A function called with each event, only events where it
+	#  returns True are aggregated.
+	#\param compression The compression of the t-digest.
+	def __init__(self, field, qs=(0.5, 0.9, 0.99), name=None, where=None, compression=100):
+		Aggregate.__init__(self, field, name, where)
+		self.qs=tuple(qs)
+		self.compression=compression
+
+	def defaultName(self, field):
+		return "%sQuantiles" % field
+
+	def initial(self):
+		return TDigest(self.compression)
+
+	def add(self, state, event):
+		state.add(self.get(event))
+		return state
+
+	def merge(self, a, b):
+		state=self.initial()
+		state.merge(a)
+		state.merge(b)
+		return state
+
+	def result(self, state):
+		if not state.count:
+			return None
+		return dict((q, state.quantile(q)) for q in self.qs)
+
+## Estimates the number of distinct values of a field, for example the number
+#  of users of each queue, using HyperLogLog.
+class DistinctCount(Aggregate):
+	## Initializer is called with the field.
+	#\param field The field to count, see fieldGetter.
+	#\param name The name of the result, defaults to distinct followed by the
+	#  name of the field, for example distinctUserName.
+	#\param where A function called with each event, only events where it
+	#  returns True are aggregated.
+	#\param precision The precision of the sketch, see HyperLogLog.
+	def __init__(self, field, name=None, where=None, precision=12):
+		Aggregate.__init__(self, field, name, where)
+		self.precision=precision
+
+	def defaultName(self, field):
+		return "distinct%s%s" % (field[:1].upper(), field[1:])
+
+	def initial(self):
+		return HyperLogLog(self.precision)
+
+	def add(self, state, event):
+		state.add(self.get(event))
+		return state
+
+	def merge(self, a, b):
+		state=self.initial()
+		state.merge(a)
+		state.merge(b)
+		return state
+
+	def result(self, state):
+		return state.count()
+
+## Finds the most frequent values of a field, or the values with the largest
+#  total weight, using the Space Saving algorithm.  The result is a list of 
+#  (value, count) tuples, largest first.
+class TopK(Aggregate):
+	## Initializer is called with the field and the number of values.
+	#\param field The field, see fieldGetter.
+	#\param k The number of values in the result.
+	#\param weight A field added to the count of each value instead of one,
+	#  for example cpuTime.
+	#\param name The name of the result, defaults to top followed by the 
+	#  name of the field, for example topUserName.
+	#\param where A function called with each event, only events where it
+	#  returns True are aggregated.
+	#\param capacity The number of values tracked, more than k so that the 
+	#  counts of the top k are accurate.
+	def __init__(self, field, k=10, weight=None, name=None, where=None, capacity=None):
+		Aggregate.__init__(self, field, name, where)
+		self.k=k
+		self.capacity=capacity or 10*k
+		self.weight=weight is not None and fieldGetter(weight) or None
+
+	def defaultName(self, field):
+		return "top%s%s" % (field[:1].upper(), field[1:])
+
+	def initial(self):
+		return SpaceSaving(self.capacity)
+
+	def add(self, state, event):
+		if self.weight is None:
+			state.add(self.get(event))
+		else:
+			state.add(self.get(event), self.weight(event))
+		return state
+
+	def merge(self, a, b):
+		state=self.initial()
+		state.merge(a)
+		state.merge(b)
+		return state
+
+	def result(self, state):
+		return [(v, c) for v, c, e in state.top(self.k)]
+
+## Groups events by one or more keys, and calculates aggregates for each 
+#  group as the events are added.  Groups are held in a single dictionary 
+#  keyed on a tuple of the key values, each holding the state of every 
+#  aggregate.
+#
+#  Results from several GroupBy objects with the same aggregates, for example
+#  from different files or worker processes, can be combined with merge().  
+#
+#  For keys with a very large number of distinct values, such as the 
+#  command, maxGroups limits the memory used.  When there are more groups 
+#  than this, the half of the groups with the fewest events are merged into a
+#  single group whose key values are all OTHER.
+#
+# Example Usage:
+#
+# The following code prints the number of jobs and the total and 95th 
+# percentile wait time for each queue.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.aggregate import *
+#g=GroupBy(['queue'], [Count(), Sum('waitTime'), Percentile('waitTime', 0.95)])
+#g.extend(AcctFile(open('lsb.acct','rb'), lazy=True))
+#for key, r in g.rows():
+#    print(key[0], r['count'], r['waitTime'], r['waitTimeP95'])
+#\endcode
+class GroupBy(object):
+	## The key value used for groups that have been merged because there were
+	#  more than maxGroups groups.
+	OTHER="*OTHER*"
+
+	## Initializer is called with the keys and aggregates.
+	#\param keys A list of fields to group on, see fieldGetter.
+	#\param aggregates A list of Aggregate objects.
+	#\param maxGroups The maximum number of groups to keep, or None for no 
+	#  limit.
+	def __init__(self, keys, aggregates, maxGroups=None):
+		self.keys=list(keys)
+		self.aggregates=list(aggregates)
+		self.maxGroups=maxGroups
+		## The groups, keyed on a tuple of key values.  The first entry of 
+		#  each group is the number of events, followed by the state of each 
+		#  aggregate.
+		self.groups={}
+		if all(isinstance(k, str) and k not in FIELDS for k in self.keys) and len(self.keys)>1:
+			self._key=attrgetter(*self.keys)
+		else:
+			getters=[fieldGetter(k) for k in self.keys]
+			self._key=lambda e: tuple([g(e) for g in getters])
+
+	def _new(self):
+		return [0]+[a.initial() for a in self.aggregates]
+
+	## Adds an event to its group.
+	def add(self, event):
+		key=self._key(event)
+		try:
+			group=self.groups[key]
+		except KeyError:
+			group=self.groups[key]=self._new()
+			if self.maxGroups and len(self.groups)>self.maxGroups:
+				self._shrink()
+				group=self.groups.get(key) or self.groups[self._other()]
+		group[0]+=1
+		i=1
+		for a in self.aggregates:
+			if a.where is None or a.where(event):
+				group[i]=a.add(group[i], event)
+			i+=1
+
+	## Adds every event from an iterable, such as an AcctFile.
+	def extend(self, events):
+		for e in events:
+			self.add(e)
+
+	def _other(self):
+		return tuple([self.OTHER]*len(self.keys))
+
+	def _mergeGroup(self, key, group):
+		try:
+			into=self.groups[key]
+		except KeyError:
+			# Merge into a new group, so no state is shared with the other GroupBy
+			into=self.groups[key]=self._new()
+		into[0]+=group[0]
+		for i, a in enumerate(self.aggregates):
+			into[i+1]=a.merge(into[i+1], group[i+1])
+
+	## Merges the half of the groups with the fewest events into the OTHER 
+	#  group.
+	def _shrink(self):
+		other=self._other()
+		ranked=sorted((k for k in self.groups if k!=other), key=lambda k: self.groups[k][0])
+		for key in ranked[:len(ranked)-self.maxGroups//2]:
+			self._mergeGroup(other, self.groups.pop(key))
+
+	## Merges the groups of another GroupBy with the same aggregates.
+	#\param other A GroupBy object, or its groups attribute.
+	def merge(self, other):
+		if isinstance(other, GroupBy):
+			other=other.groups
+		for key, group in other.items():
+			self._mergeGroup(key, group)
+		if self.maxGroups and len(self.groups)>self.maxGroups:
+			self._shrink()
+
+	## Returns the results of a group.
+	#\returns A dictionary keyed on the name of each aggregate, numJobs holds 
+	#  the number of events in the group.
+	def result(self, key):
+		group=self.groups[key]
+		r={"numJobs":group[0]}
+		for i, a in enumerate(self.aggregates):
+			r[a.name]=a.result(group[i+1])
+		return r
+
+	## Returns the results of every group.
+	#\returns A list of (key, result) tuples sorted on the key, with the OTHER
+	#  group last.
+	def rows(self):
+		other=self._other()
+		keys=sorted(k for k in self.groups if k!=other)
+		if other in self.groups:
+			keys.append(other)
+		return [(k, self.result(k)) for k in keys]
@@ -0,0 +1,194 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+## Reads an accounting file from asyncio code.
+
+import asyncio
+import threading
+from lsfpy.accounting import JobFinishEvent, LazyJobFinishEvent, parseRecord
+from lsfpy.parallel import RECORD
+
+_END=object()
+
+## Reads the JOB_FINISH events of an accounting file with async for, without
+#  blocking the event loop.  The file is read in chunks, and each chunk is 
+#  split into records and parsed, in an executor.  The parsed events are 
+#  passed to the consumer in batches through a bounded queue, so when the 
+#  consumer is slower than the reader, reading pauses until it catches up, 
+#  and the memory used is at most queueSize batches.
+#
+#  The last record of the file is read even if it does not end with a 
+#  newline.  In follow mode the file is read as mbatchd appends to it, a 
+#  record that is only partly written is left until the rest of it has been
+#  written, and iteration never ends.  Cancelling the task that is iterating, or calling 
+#  close(), stops the reader.  The offset attribute holds the position after
+#  the last record of the batches that have been consumed, which can be used
+#  to resume reading later.
+#
+# Example Usage:
+#
+# The following code prints the queue of each job as it finishes.
+#\code
+#from lsfpy.aio import AsyncAcctFile
+#async def watch():
+#    async with AsyncAcctFile('lsb.acct', follow=True) as f:
+#        async for i in f:
+#            print(i.queue)
+#\endcode
+class AsyncAcctFile(object):
+	## Initializer is called with the path to the accounting file.
+	#\param path The path to the accounting file.
+	#\param lazy If True, create LazyJobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row.  This overrides lazy.
+	#\param offset The position in the file to start reading from.
+	#\param follow If True, wait for new records at the end of the file 
+	#  instead of stopping.
+	#\param interval The number of seconds to wait before checking for new 
+	#  records in follow mode.
+	#\param chunkSize The number of bytes read at a time.
+	#\param queueSize The maximum number of parsed batches waiting to be 
+	#  consumed.
+	#\param executor The concurrent.futures executor used to read and parse,
+	#  defaults to the event loop's default executor.
+	def __init__(self, path, lazy=False, eventClass=None, offset=0, follow=False, 
+			interval=1.0, chunkSize=1<<20, queueSize=4, executor=None):
+		self.path=path
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
+		## The position after the last record of the consumed batches.
+		self.offset=offset
+		self.follow=follow
+		self.interval=interval
+		self.chunkSize=chunkSize
+		self.queueSize=queueSize
+		self.executor=executor
+		self._fh=None
+		self._closed=False
+		self._lock=threading.Lock()
+		self._buffer=b""
+		self._readOffset=offset
+		self._queue=None
+		self._task=None
+		self._batch=[]
+		self._batchEnd=offset
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		if self._task is None:
+			self._queue=asyncio.Queue(self.queueSize)
+			self._task=asyncio.ensure_future(self._read())
+		while not self._batch:
+			self.offset=self._batchEnd
+			try:
+				item=await self._queue.get()
+			except asyncio.CancelledError:
+				self.close()
+				raise
+			if item is _END:
+				self._queue.put_nowait(_END)
+				raise StopAsyncIteration
+			if isinstance(item, BaseException):
+				self._queue.put_nowait(_END)
+				raise item
+			self._batch, self._batchEnd=item
+			self._batch.reverse()
+		return self._batch.pop()
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc):
+		self.close()
+
+	async def _read(self):
+		loop=asyncio.get_running_loop()
+		try:
+			while True:
+				batch=await loop.run_in_executor(self.executor, self._readChunk)
+				if batch is None:
+					if not self.follow:
+						break
+					await asyncio.sleep(self.interval)
+					continue
+				if batch[0]:
+					# Waits while the queue is full
+					await self._queue.put(batch)
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			await self._queue.put(e)
+			return
+		await self._queue.put(_END)
+
+	## Reads a chunk of the file and parses the complete records in it, this
+	#  runs in the executor.
+	#\returns A tuple of the events and the position after the last complete
+	#  record, or None at the end of the file.  When not following, the rest
+	#  of the file is returned as the last record once the end is reached.
+	def _readChunk(self):
+		with self._lock:
+			if self._closed:
+				return None
+			if self._fh is None:
+				self._fh=open(self.path, 'rb')
+				self._fh.seek(self._readOffset)
+			data=self._fh.read(self.chunkSize)
+		if not data and (self.follow or not self._buffer):
+			return None
+		buf=self._buffer+data
+		records=[]
+		pos=0
+		match=RECORD.match(buf, pos)
+		while match:
+			records.append(buf[pos:match.end()])
+			pos=match.end()
+			match=RECORD.match(buf, pos)
+		if not data:
+			# The last record of the file does not end with a newline
+			records.append(buf[pos:])
+			pos=len(buf)
+		events=[]
+		for record in records:
+			try:
+				events.append(self.eventClass(parseRecord(record)))
+			except (ValueError, IndexError):
+				pass
+		self._buffer=buf[pos:]
+		self._readOffset+=pos
+		return events, self._readOffset
+
+	## Stops reading and closes the file.
+	def close(self):
+		if self._task is not None and not self._task.done():
+			self._task.cancel()
+		# The executor may be reading the file
+		with self._lock:
+			self._closed=True
+			if self._fh is not None:
+				self._fh.close()
+				self._fh=None
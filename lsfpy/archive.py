@@ -0,0 +1,199 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import glob
+import os
+import re
+from lsfpy.accounting import AcctFile, JobFinishEvent, LazyJobFinishEvent, readRecords, toEpoch
+from lsfpy.compressed import SPLITTABLE, memberTails, openAcct, pathCompression
+from lsfpy.parallel import ParallelAcctFile, recordStart, lastRecordStart, _lastStart
+
+## Matches the names of the accounting file and its rotated archives, which
+#  may be compressed.
+_ACCT_NAME=re.compile(r'^lsb\.acct(\.[0-9]+)?(\.(gz|bz2|xz|zst))?$')
+
+## Reads the event time from the start of a record.
+def _eventTime(record):
+	# The event type and version are quoted strings without spaces, the
+	# third field is the event time.
+	return float(record.split(b" ", 3)[2])
+
+## Reads the event time of the record at an offset.
+def _eventTimeAt(fh, offset):
+	fh.seek(offset)
+	return _eventTime(fh.readline())
+
+## The time spans of compressed files that have been read, keyed on the 
+#  path, with the size and modification time of the file when it was read.
+#  Rotated archives do not change, so each one is only decompressed once.
+_SPANS={}
+
+## Returns the event time of the first and last record in a compressed 
+#  accounting file, reading it only if it has changed since it was last 
+#  read.
+def _compressedTimeSpan(path, compression):
+	st=os.stat(path)
+	key=(st.st_size, st.st_mtime_ns)
+	path=os.path.abspath(path)
+	cached=_SPANS.get(path)
+	if cached is not None and cached[0]==key:
+		return cached[1]
+	span=_readCompressedTimeSpan(path, compression)
+	_SPANS[path]=(key, span)
+	return span
+
+## Reads the event time of the first and last record in a compressed 
+#  accounting file.  The last record of a gzip or zstd file made of many
+#  members is found by decompressing the last few members, any other file
+#  is decompressed to the end.
+def _readCompressedTimeSpan(path, compression):
+	fh=openAcct(path)
+	try:
+		first=fh.readline()
+	finally:
+		fh.close()
+	if not first:
+		return None
+	if compression in SPLITTABLE:
+		for offset, data in memberTails(path, compression):
+			last=_lastStart(data)
+			if last:
+				return (_eventTime(first), _eventTime(data[last:]))
+	fh=openAcct(path)
+	try:
+		for offset, record in readRecords(fh):
+			last=record
+	finally:
+		fh.close()
+	return (_eventTime(first), _eventTime(last))
+
+## Reads the event time of the first and last record in an accounting file 
+#  without parsing the rest of the file.
+#\param path The path to the accounting file.
+#\returns A tuple of the first and last event time in seconds since the 
+#  epoch, or None if the file has no records.
+def timeSpan(path):
+	compression=pathCompression(path)
+	if compression:
+		return _compressedTimeSpan(path, compression)
+	size=os.path.getsize(path)
+	fh=open(path, 'rb')
+	try:
+		last=lastRecordStart(fh, size)
+		if last is None:
+			return None
+		return (_eventTimeAt(fh, recordStart(fh, 0, size)), _eventTimeAt(fh, last))
+	finally:
+		fh.close()
+
+## Reads the accounting file and its rotated archives, lsb.acct.1, 
+#  lsb.acct.2 etc, as a single stream of events in chronological order.
+#  Archives compressed with gzip, bzip2, xz or zstd, such as lsb.acct.1.gz,
+#  are decompressed as they are read.
+#
+#  When a time window is given, the time of the first and last record of 
+#  each file is read, and files that are entirely outside the window are not
+#  parsed at all.  Events in the remaining files that are outside the window
+#  are skipped.
+#
+# Example Usage:
+#
+# The following code prints the queue of each job that finished in the 
+# last seven days.
+#\code
+#import datetime
+#from lsfpy.archive import AcctArchive
+#since=datetime.datetime.utcnow()-datetime.timedelta(days=7)
+#for i in AcctArchive('/lsf/work/cluster/logdir', since=since):
+#    print(i.queue)
+#\endcode
+class AcctArchive(object):
+	## Initializer is called with the files to read.
+	#\param source A directory containing the accounting files, a glob 
+	#  pattern, or a list of paths.
+	#\param since Only return events at or after this time, a datetime in
+	#  UTC or seconds since the epoch.
+	#\param until Only return events before this time.
+	#\param lazy If True, create LazyJobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row.  This overrides lazy.
+	#\param processes If set, each file is parsed by a ParallelAcctFile using
+	#  this many processes.
+	def __init__(self, source, since=None, until=None, lazy=False, eventClass=None, processes=None):
+		if isinstance(source, (list, tuple)):
+			self.paths=list(source)
+		elif os.path.isdir(source):
+			self.paths=[os.path.join(source, n) for n in os.listdir(source) if _ACCT_NAME.match(n)]
+		else:
+			self.paths=glob.glob(source)
+		self.since=toEpoch(since)
+		self.until=toEpoch(until)
+		self.processes=processes
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
+
+	## Returns the files that contain events in the time window.
+	#\returns A list of (path, first, last) tuples sorted by the time of the 
+	#  first event, first and last are the times of the first and last event 
+	#  in the file.
+	def files(self):
+		files=[]
+		for path in self.paths:
+			span=timeSpan(path)
+			if span is None:
+				continue
+			first, last=span
+			if self.since is not None and last<self.since:
+				continue
+			if self.until is not None and first>=self.until:
+				continue
+			files.append((path, first, last))
+		files.sort(key=lambda f: f[1])
+		return files
+
+	def _events(self, path):
+		if self.processes:
+			for e in ParallelAcctFile(path, processes=self.processes, eventClass=self.eventClass):
+				yield e
+			return
+		fh=open(path, 'rb')
+		try:
+			for e in AcctFile(fh, eventClass=self.eventClass):
+				yield e
+		finally:
+			fh.close()
+
+	def __iter__(self):
+		since=self.since
+		until=self.until
+		for path, first, last in self.files():
+			# Only check the times when part of the file is outside the window
+			check=(since is not None and first<since) or (until is not None and last>=until)
+			for e in self._events(path):
+				if check:
+					t=e.eventTimeEpoch
+					if (since is not None and t<since) or (until is not None and t>=until):
+						continue
+				yield e
@@ -0,0 +1,423 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+import datetime
+from array import array
+from lsfpy.accounting import AcctFile, fromEpoch, termInfoFor
+from lsfpy.hosts import HOSTS, HostAllocation
+
+## Fields that are normally the same for every element of an array, these are
+#  stored once for the array.  An element with a different value keeps its
+#  own value as an override.
+SHARED=("jobID","userId","userName","queue","fromHost","cwd","numProcessors",
+		"jobName","command","resReq","projectName","loginShell","mailUser","sla",
+		"chargedSAAP","licenseProject","termTimeEpoch")
+
+## Fields that differ between elements, with the array type code used to
+#  store them and the function that gets the stored value from an event.
+#  utime and stime are stored in seconds, and termInfo stores the
+#  termination number.
+ELEMENT=(
+		("submitTimeEpoch","d",lambda e: e.submitTimeEpoch),
+		("startTimeEpoch","d",lambda e: e.startTimeEpoch),
+		("eventTimeEpoch","d",lambda e: e.eventTimeEpoch),
+		("jStatus","l",lambda e: e.jStatus),
+		("exitStatus","l",lambda e: e.exitStatus),
+		("termInfo","l",lambda e: e.termInfo.number),
+		("utime","d",lambda e: e.utime.total_seconds()),
+		("stime","d",lambda e: e.stime.total_seconds()),
+		("maxRMem","d",lambda e: float(e.maxRMem or 0)),
+		("maxRSwap","d",lambda e: float(e.maxRSwap or 0)),
+		)
+
+_ELEMENT_NAMES=set(name for name, code, get in ELEMENT)
+
+## Returns the array name of a job name, LSF logs the job name of an element
+#  as the name of the array followed by the element index in brackets.
+def _arrayName(jobName, idx):
+	suffix="[%d]" % idx
+	if jobName.endswith(suffix):
+		return jobName[:-len(suffix)]
+	return None
+
+## Merges a sorted list of numbers into ranges of consecutive numbers.
+#\returns A list of (first, last) tuples.
+def toRanges(values):
+	ranges=[]
+	for v in values:
+		if ranges and v==ranges[-1][1]+1:
+			ranges[-1]=(ranges[-1][0], v)
+		elif not ranges or v!=ranges[-1][1]:
+			ranges.append((v, v))
+	return ranges
+
+## One element of a JobArray.  An element is created when it is read, and
+#  provides the shared and per-element fields of the array with the same
+#  names and types as JobFinishEvent.
+class ArrayElement(object):
+	__slots__=("array","position")
+
+	def __init__(self, array, position):
+		self.array=array
+		self.position=position
+
+	@property
+	def idx(self):
+		return self.array.indexAt(self.position)
+
+	@property
+	def execHosts(self):
+		return list(self.array.hosts[self.position].expand(self.array.dictionary))
+
+	@property
+	def termInfo(self):
+		return termInfoFor(str(self.array.columns["termInfo"][self.position]))
+
+	@property
+	def utime(self):
+		return datetime.timedelta(seconds=self.array.columns["utime"][self.position])
+
+	@property
+	def stime(self):
+		return datetime.timedelta(seconds=self.array.columns["stime"][self.position])
+
+	@property
+	def eventTime(self):
+		return fromEpoch(self.eventTimeEpoch)
+
+	@property
+	def submitTime(self):
+		return fromEpoch(self.submitTimeEpoch)
+
+	@property
+	def termTime(self):
+		return fromEpoch(self.termTimeEpoch)
+
+	## The start time, or the termination deadline if the element never
+	#  started, as JobFinishEvent.startTime.
+	@property
+	def startTime(self):
+		if self.startTimeEpoch<1:
+			return self.termTime
+		return fromEpoch(self.startTimeEpoch)
+
+	@property
+	def runTime(self):
+		if self.startTimeEpoch<1:
+			return datetime.timedelta(0)
+		return datetime.timedelta(seconds=self.eventTimeEpoch-self.startTimeEpoch)
+
+	@property
+	def waitTime(self):
+		if self.startTimeEpoch<1:
+			return datetime.timedelta(seconds=self.eventTimeEpoch-self.submitTimeEpoch)
+		return datetime.timedelta(seconds=self.startTimeEpoch-self.submitTimeEpoch)
+
+	def __getattr__(self, name):
+		if name in _ELEMENT_NAMES:
+			return self.array.columns[name][self.position]
+		if name in self.array.shared:
+			override=self.array.overrides.get(self.position)
+			if override and name in override:
+				return override[name]
+			if name=="jobName" and self.array.name is not None:
+				return "%s[%d]" % (self.array.name, self.idx)
+			return self.array.shared[name]
+		raise AttributeError(name)
+
+	def __repr__(self):
+		return "ArrayElement(%d[%d])" % (self.array.jobID, self.idx)
+
+## The elements of a job array.  The fields in SHARED are stored once for the
+#  array, the fields in ELEMENT are stored in a typed array for each field,
+#  and the hosts of each element are a HostAllocation shared with the other
+#  elements, and arrays, that ran on the same hosts.  The element
+#  indexes are stored as ranges of consecutive indexes in the order the
+#  elements were added, so an array whose elements finish in index order
+#  stores a single range.  Fields that are in neither SHARED nor ELEMENT are
+#  not kept.
+#
+#  Elements are read as ArrayElement objects, which are created when they
+#  are read and provide the same attributes as JobFinishEvent.
+class JobArray(object):
+	## Initializer is called with the dictionary used for the hosts.
+	#\param dictionary The HostDictionary used for the execHosts of each
+	#  element.
+	#\param allocations A dictionary of the HostAllocation objects shared
+	#  between arrays, by default the array shares them between its own
+	#  elements.
+	def __init__(self, dictionary=HOSTS, allocations=None):
+		self.dictionary=dictionary
+		self.allocations={} if allocations is None else allocations
+		## The values of the SHARED fields.
+		self.shared={}
+		## The values of SHARED fields that differ from the shared value,
+		#  keyed on the position of the element.
+		self.overrides={}
+		## The name of the array, when the job name of each element is the
+		#  array name followed by the index.
+		self.name=None
+		## A typed array for each field in ELEMENT.
+		self.columns=dict((name, array(code)) for name, code, get in ELEMENT)
+		## The HostAllocation of each element.
+		self.hosts=[]
+		self._first=array("l")
+		self._last=array("l")
+		self._ends=array("l")
+
+	## The ID of the array.
+	@property
+	def jobID(self):
+		return self.shared.get("jobID")
+
+	def __len__(self):
+		return len(self.hosts)
+
+	## Adds an element.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	def add(self, event):
+		self._append(event, HostAllocation.fromEvent(event, self.dictionary, self.allocations))
+
+	def _append(self, event, allocation):
+		position=len(self.hosts)
+		idx=int(event.idx)
+		if not position:
+			for name in SHARED:
+				self.shared[name]=getattr(event, name)
+			self.name=_arrayName(self.shared["jobName"], idx)
+		else:
+			override=None
+			for name in SHARED:
+				value=getattr(event, name)
+				if name=="jobName" and self.name is not None and value=="%s[%d]" % (self.name, idx):
+					continue
+				if value!=self.shared[name]:
+					if override is None:
+						override=self.overrides[position]={}
+					override[name]=value
+		for name, code, get in ELEMENT:
+			self.columns[name].append(get(event))
+		self.hosts.append(allocation)
+		if self._last and idx==self._last[-1]+1:
+			self._last[-1]=idx
+			self._ends[-1]+=1
+		else:
+			self._first.append(idx)
+			self._last.append(idx)
+			self._ends.append(position+1)
+
+	## Adds the elements of another JobArray.
+	def merge(self, other):
+		for e in other:
+			if other.dictionary is self.dictionary:
+				allocation=other.hosts[e.position]
+				self._append(e, self.allocations.setdefault(allocation, allocation))
+			else:
+				self.add(e)
+
+	## Returns the element index of the element at a position.
+	def indexAt(self, position):
+		if position<0:
+			position+=len(self)
+		lo=0
+		hi=len(self._ends)
+		while lo<hi:
+			mid=(lo+hi)//2
+			if self._ends[mid]<=position:
+				lo=mid+1
+			else:
+				hi=mid
+		if lo>=len(self._ends):
+			raise IndexError(position)
+		start=self._ends[lo-1] if lo else 0
+		return self._first[lo]+position-start
+
+	## Returns the element indexes in the order the elements were added.
+	def indexes(self):
+		for first, last in zip(self._first, self._last):
+			for idx in range(first, last+1):
+				yield idx
+
+	## Returns the ranges of element indexes in the array.
+	#\returns A sorted list of (first, last) tuples.
+	def indexRanges(self):
+		return toRanges(sorted(self.indexes()))
+
+	## Returns an element.
+	#\param position The position of the element in the order they were
+	#  added.
+	def element(self, position):
+		if position<0:
+			position+=len(self)
+		if not 0<=position<len(self):
+			raise IndexError(position)
+		return ArrayElement(self, position)
+
+	## Returns the element with an index, or None if there is no element with
+	#  the index.
+	def find(self, idx):
+		start=0
+		for first, last, end in zip(self._first, self._last, self._ends):
+			if first<=idx<=last:
+				return ArrayElement(self, start+idx-first)
+			start=end
+		return None
+
+	def __iter__(self):
+		for position in range(len(self)):
+			yield ArrayElement(self, position)
+
+	## Returns the time from when the first element was submitted until the
+	#  last element finished, in seconds.
+	def makespan(self):
+		if not len(self):
+			return 0.0
+		return max(self.columns["eventTimeEpoch"])-min(self.columns["submitTimeEpoch"])
+
+	## Returns the wall clock time each element ran for in seconds, zero for
+	#  elements that never started.
+	def runTimes(self):
+		return array("d", [0.0 if s<1 else e-s for s, e in
+				zip(self.columns["startTimeEpoch"], self.columns["eventTimeEpoch"])])
+
+	## Returns the distribution of the run time of the elements that started.
+	#\param percentiles The percentiles to calculate, between 0 and 1.
+	#\returns A dictionary holding the count, min, max and mean of the run
+	#  times in seconds, and each percentile keyed on its name, for example
+	#  p95.  The values are None if no element started.
+	def runTimeDistribution(self, percentiles=(0.5, 0.9, 0.99)):
+		times=sorted(e-s for s, e in zip(self.columns["startTimeEpoch"],
+				self.columns["eventTimeEpoch"]) if s>=1)
+		result={"count":len(times)}
+		names=["min","max","mean"]+["p%g" % (p*100) for p in percentiles]
+		if not times:
+			result.update((name, None) for name in names)
+			return result
+		result["min"]=times[0]
+		result["max"]=times[-1]
+		result["mean"]=sum(times)/len(times)
+		for p, name in zip(percentiles, names[3:]):
+			result[name]=times[min(len(times)-1, int(p*len(times)))]
+		return result
+
+	## Returns the ranges of the indexes of the elements that did not exit
+	#  normally, see lsfpy.aggregate.failed.
+	#\returns A sorted list of (first, last) tuples.
+	def failedIndexRanges(self):
+		terms=self.columns["termInfo"]
+		return toRanges(sorted(idx for idx, t in zip(self.indexes(), terms) if t>0))
+
+	## Returns a summary of the array.
+	#\returns A dictionary holding the shared fields, the number of elements
+	#  and failed elements, the makespan and the run time distribution.
+	def stats(self):
+		failed=self.failedIndexRanges()
+		result=dict(self.shared)
+		result.update({
+				"numElements":len(self),
+				"numFailed":sum(last-first+1 for first, last in failed),
+				"failedIndexRanges":failed,
+				"indexRanges":self.indexRanges(),
+				"makespan":self.makespan(),
+				"runTime":self.runTimeDistribution(),
+				})
+		return result
+
+## Groups the elements of job arrays read from an accounting file into
+#  JobArray objects.  Elements are grouped on their job ID and submit time,
+#  so a job ID that is reused after LSF wraps the job IDs starts a new array.
+#  Jobs that are not array elements are not kept.
+#
+# Example Usage:
+#
+# The following code prints the failed elements of each array.
+#\code
+#from lsfpy.arrays import JobArrays
+#arrays=JobArrays.load(open('lsb.acct','rb'))
+#for a in arrays:
+#    print(a.jobID, len(a), a.failedIndexRanges())
+#\endcode
+class JobArrays(object):
+	## Initializer is called with the dictionary used for the hosts.
+	#\param dictionary The HostDictionary used by each JobArray.
+	def __init__(self, dictionary=HOSTS):
+		self.dictionary=dictionary
+		## The HostAllocation objects shared by the arrays.
+		self.allocations={}
+		## The arrays keyed on (jobID, submitTimeEpoch).
+		self.arrays={}
+		self._latest={}
+
+	## Creates the arrays from every JOB_FINISH event in an accounting file.
+	#\param fh An open file object to the accounting file.
+	@classmethod
+	def load(cls, fh):
+		a=cls()
+		a.extend(AcctFile(fh, lazy=True))
+		return a
+
+	## Adds an event if it is an element of a job array.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	#\returns The JobArray the event was added to, or None if the event is
+	#  not an array element.
+	def add(self, event):
+		if not int(event.idx):
+			return None
+		key=(event.jobID, event.submitTimeEpoch)
+		try:
+			a=self.arrays[key]
+		except KeyError:
+			a=self.arrays[key]=JobArray(self.dictionary, self.allocations)
+			self._latest[key[0]]=max(key, self._latest.get(key[0], key))
+		a.add(event)
+		return a
+
+	## Adds every event from an iterable, such as an AcctFile.
+	def extend(self, events):
+		for e in events:
+			self.add(e)
+
+	## Adds the arrays of another JobArrays object.
+	def merge(self, other):
+		for key, a in other.arrays.items():
+			try:
+				self.arrays[key].merge(a)
+			except KeyError:
+				# Copy the array, so adding elements does not change other
+				a, b=JobArray(self.dictionary, self.allocations), a
+				a.merge(b)
+				self.arrays[key]=a
+				self._latest[key[0]]=max(key, self._latest.get(key[0], key))
+
+	## Returns the array with a job ID, or None if there is no array with
+	#  the ID.  If the ID has been reused the last array submitted is
+	#  returned.
+	def get(self, jobID):
+		key=self._latest.get(jobID)
+		if key is None:
+			return None
+		return self.arrays[key]
+
+	def __len__(self):
+		return len(self.arrays)
+
+	## Returns the arrays in the order they were first seen.
+	def __iter__(self):
+		return iter(self.arrays.values())
@@ -0,0 +1,201 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from lsfpy.accounting import *
+from lsfpy.columnar import AcctTable, typecodeOf
+
+_MAGIC=b"LSFACCT1"
+_LENGTH=struct.Struct("<Q")
+## The number of bytes checked at the start of the accounting file, and before
+#  the cached offset, to make sure the cached part of the file is unchanged.
+_CHECK=65536
+
+def _crc(fh, start, end):
+	fh.seek(start)
+	return zlib.crc32(fh.read(end-start)) & 0xffffffff
+
+def _align(n):
+	return (n+7)//8*8
+
+## Caches the JOB_FINISH events of an accounting file as an AcctTable stored
+#  in a binary file.  The first time the cache is loaded the whole accounting
+#  file is parsed and the table is saved.  Later loads map the cache file and
+#  each column of the table is a memoryview of the mapping, so the columns
+#  are neither parsed nor copied, and the mapping stays open for as long as
+#  the table uses it.  Only the records added to the accounting file since 
+#  the cache was saved are parsed, and when there are any the columns are 
+#  copied into arrays before the new rows are appended.
+#
+#  The cache records the inode of the accounting file, the offset that has 
+#  been parsed, and checksums of the start of the file and of the bytes 
+#  before the offset.  If the accounting file has been replaced, truncated or
+#  rewritten, the cache is ignored and the whole file is parsed again.
+#
+# Example Usage:
+#
+# The following code prints the total wait time in seconds for each queue,
+# only parsing new jobs after the first run.
+#\code
+#from lsfpy.cache import AcctCache
+#t=AcctCache('lsb.acct', '/var/tmp/lsfpy').load()
+#for q in t.groupBy('queue').values():
+#    print(q['name'], q['waitTime'])
+#\endcode
+class AcctCache(object):
+	## Initializer is called with the accounting file and cache directory.
+	#\param path The path to the accounting file.
+	#\param cacheDir The directory the cache file is written to.
+	def __init__(self, path, cacheDir):
+		self.path=path
+		self.cacheDir=cacheDir
+		name=hashlib.md5(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+		## The path to the cache file.
+		self.cachePath=os.path.join(cacheDir, "%s-%s.cache" % (os.path.basename(path), name))
+
+	## Loads the table from the cache, parses any new records, and saves the
+	#  cache if anything changed.
+	#\returns An AcctTable object.
+	def load(self):
+		st=os.stat(self.path)
+		fh=open(self.path, 'rb')
+		try:
+			table, header=self._read(fh, st)
+			if header and header["offset"]==st.st_size:
+				return table
+			offset=header and header["offset"] or 0
+			fh.seek(offset)
+			added=False
+			for offset, record in readRecords(fh, partial=False):
+				offset+=len(record)
+				if not record.startswith(b'"JOB_FINISH"'):
+					continue
+				try:
+					table.append(LazyJobFinishEvent(parseRecord(record)))
+				except (ValueError, IndexError):
+					continue
+				added=True
+			if header is None or added or offset!=header["offset"]:
+				self._write(fh, st, offset, table)
+			return table
+		finally:
+			fh.close()
+
+	## Reads the cache file if it is valid for the accounting file.
+	#\returns A tuple of the table and the cache header, or an empty table 
+	#  and None.  The columns of the table are memoryviews of the mapped 
+	#  cache file.
+	def _read(self, fh, st):
+		empty=(AcctTable(), None)
+		if not os.path.exists(self.cachePath):
+			return empty
+		f=open(self.cachePath, 'rb')
+		try:
+			if os.fstat(f.fileno()).st_size<len(_MAGIC)+_LENGTH.size:
+				return empty
+			mm=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		finally:
+			f.close()
+		valid=False
+		try:
+			if mm[:len(_MAGIC)]!=_MAGIC:
+				return empty
+			n=_LENGTH.unpack_from(mm, len(_MAGIC))[0]
+			start=len(_MAGIC)+_LENGTH.size
+			header=json.loads(mm[start:start+n].decode("utf-8"))
+			offset=header["offset"]
+			if header["inode"]!=st.st_ino or st.st_size<offset:
+				return empty
+			if header["headCrc"]!=_crc(fh, 0, min(_CHECK, offset)):
+				return empty
+			if header["tailCrc"]!=_crc(fh, max(0, offset-_CHECK), offset):
+				return empty
+			# The columns keep the mapping open, it is closed when they are 
+			# no longer used
+			valid=True
+			view=memoryview(mm)
+			columns={}
+			for name, typecode, pos, size in header["columns"]:
+				columns[name]=view[pos:pos+size].cast(typecode)
+			values={}
+			for name, pos, size in header["strings"]:
+				values[name]=self._strings(mm[pos:pos+size])
+			return AcctTable.fromColumns(columns, values), header
+		finally:
+			if not valid:
+				mm.close()
+
+	def _strings(self, data):
+		values=[]
+		pos=0
+		while pos<len(data):
+			n=_LENGTH.unpack_from(data, pos)[0]
+			pos+=_LENGTH.size
+			values.append(data[pos:pos+n].decode("utf-8"))
+			pos+=n
+		return values
+
+	def _write(self, fh, st, offset, table):
+		blocks=[]
+		header={
+				"inode":st.st_ino,
+				"offset":offset,
+				"headCrc":_crc(fh, 0, min(_CHECK, offset)),
+				"tailCrc":_crc(fh, max(0, offset-_CHECK), offset),
+				"count":len(table),
+				"columns":[],
+				"strings":[],
+				}
+		for name, a in sorted(table.columns().items()):
+			blocks.append((header["columns"], name, typecodeOf(a), a.tobytes()))
+		for name in table.STRINGS:
+			encoded=[v.encode("utf-8") for v in table.values(name)]
+			data=b"".join(_LENGTH.pack(len(v))+v for v in encoded)
+			blocks.append((header["strings"], name, None, data))
+		# Work out where each block goes, the header size depends on the 
+		# positions so leave room for them to grow.
+		size=len(json.dumps(header))+64*len(blocks)
+		pos=_align(len(_MAGIC)+_LENGTH.size+size)
+		for entries, name, typecode, data in blocks:
+			if typecode:
+				entries.append([name, typecode, pos, len(data)])
+			else:
+				entries.append([name, pos, len(data)])
+			pos=_align(pos+len(data))
+		encoded=json.dumps(header).encode("utf-8")
+		if not os.path.isdir(self.cacheDir):
+			os.makedirs(self.cacheDir)
+		tmp=self.cachePath+".tmp"
+		f=open(tmp, 'wb')
+		try:
+			f.write(_MAGIC+_LENGTH.pack(len(encoded))+encoded)
+			for entries, name, typecode, data in blocks:
+				pos=entries[[e[0] for e in entries].index(name)][-2]
+				f.write(b"\0"*(pos-f.tell()))
+				f.write(data)
+		finally:
+			f.close()
+		os.rename(tmp, self.cachePath)
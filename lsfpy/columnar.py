@@ -0,0 +1,498 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+from array import array
+from bisect import bisect_left, bisect_right
+from lsfpy.accounting import AcctFile
+
+try:
+	import numpy
+except ImportError:
+	numpy=None
+
+## Returns the array type code of a column, which is either an array or a
+#  memoryview, such as one of a cache file.
+def typecodeOf(a):
+	try:
+		return a.typecode
+	except AttributeError:
+		return a.format
+
+## Holds the JOB_FINISH events from an accounting file as columns instead of
+#  one object per job.  Numeric fields are stored in typed arrays, and string
+#  fields are dictionary encoded, each job stores an integer code that indexes
+#  the list of distinct values for the field.  This uses a fraction of the
+#  memory of a list of events, and allows totals per queue, user etc to be
+#  calculated over whole columns at once.
+#
+#  When NumPy is installed, column() returns NumPy arrays that share memory
+#  with the table, and groupBy() uses NumPy to do the reductions.  Without
+#  NumPy the table works the same way using the array module.
+#
+# Example Usage:
+#
+# The following code prints the total wait time in seconds for each queue.
+#\code
+#from lsfpy.columnar import AcctTable
+#t=AcctTable.load(open('lsb.acct','rb'))
+#for q in t.groupBy('queue').values():
+#    print(q['name'], q['waitTime'])
+#\endcode
+class AcctTable(object):
+	## The numeric columns stored in the table, with the array type code used
+	#  to store them.  utime and stime are stored in seconds, and termInfo 
+	#  stores the termination number.
+	NUMERIC=(
+			("eventTimeEpoch","d"),
+			("submitTimeEpoch","d"),
+			("startTimeEpoch","d"),
+			("numProcessors","l"),
+			("jStatus","l"),
+			("exitStatus","l"),
+			("termInfo","l"),
+			("utime","d"),
+			("stime","d"),
+			("maxRMem","l"),
+			)
+
+	## The string columns stored in the table, these are dictionary encoded.
+	STRINGS=("queue","userName","projectName","chargedSAAP")
+
+	def __init__(self):
+		self._numeric=dict((name, array(code)) for name, code in self.NUMERIC)
+		self._codes=dict((name, array("l")) for name in self.STRINGS)
+		self._values=dict((name, []) for name in self.STRINGS)
+		self._lookup=dict((name, {}) for name in self.STRINGS)
+		self._views=False
+
+	## Creates a table from columns that have already been built, for example
+	#  by a table loaded from a cache.
+	#\param columns A dictionary of arrays keyed on the name of each column,
+	#  as returned by columns().  A column can also be a memoryview cast to 
+	#  the type code of the column, which is used without copying it until 
+	#  a row is appended.
+	#\param values A dictionary keyed on the name of each string column of 
+	#  the distinct values of the column, as returned by values().
+	#\returns An AcctTable object.
+	@classmethod
+	def fromColumns(cls, columns, values):
+		t=cls()
+		for name, code in cls.NUMERIC:
+			t._numeric[name]=columns[name]
+		for name in cls.STRINGS:
+			t._codes[name]=columns[name]
+			t._values[name]=list(values[name])
+			t._lookup[name]=dict((v, i) for i, v in enumerate(t._values[name]))
+		t._views=not all(isinstance(a, array) for a in t.columns().values())
+		return t
+
+	## Returns the arrays that hold the columns of the table.
+	#\returns A dictionary of array.array objects, or the memoryviews the 
+	#  table was created with, keyed on the name of each column, string 
+	#  columns hold the code of each value.
+	def columns(self):
+		columns=dict(self._numeric)
+		columns.update(self._codes)
+		return columns
+
+	## Creates a table containing every JOB_FINISH event in an accounting file.
+	#\param fh An open file object to the accounting file.
+	#\returns An AcctTable object.
+	@classmethod
+	def load(cls, fh):
+		t=cls()
+		t.extend(AcctFile(fh, lazy=True))
+		return t
+
+	def __len__(self):
+		return len(self._numeric["eventTimeEpoch"])
+
+	## Adds an event to the end of the table.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	def append(self, event):
+		if self._views:
+			self._writable()
+		n=self._numeric
+		n["eventTimeEpoch"].append(event.eventTimeEpoch)
+		n["submitTimeEpoch"].append(event.submitTimeEpoch)
+		n["startTimeEpoch"].append(event.startTimeEpoch)
+		n["numProcessors"].append(event.numProcessors)
+		n["jStatus"].append(event.jStatus)
+		n["exitStatus"].append(event.exitStatus)
+		n["termInfo"].append(event.termInfo.number)
+		n["utime"].append(event.utime.total_seconds())
+		n["stime"].append(event.stime.total_seconds())
+		n["maxRMem"].append(int(event.maxRMem or 0))
+		for name in self.STRINGS:
+			value=getattr(event, name)
+			lookup=self._lookup[name]
+			try:
+				code=lookup[value]
+			except KeyError:
+				code=lookup[value]=len(self._values[name])
+				self._values[name].append(value)
+			self._codes[name].append(code)
+
+	## Copies the columns that are memoryviews into arrays, so rows can be
+	#  appended to them.
+	def _writable(self):
+		for columns in (self._numeric, self._codes):
+			for name, a in columns.items():
+				if not isinstance(a, array):
+					columns[name]=array(a.format)
+					columns[name].frombytes(a.cast("B"))
+		self._views=False
+
+	## Adds every event from an iterable, such as an AcctFile, to the table.
+	def extend(self, events):
+		for e in events:
+			self.append(e)
+
+	## Returns the values of a column.  For a string column this is the 
+	#  integer code of each value, see values() for the strings the codes 
+	#  refer to.
+	#\param name The name of the column, for example submitTimeEpoch or queue.
+	#\returns A NumPy array if NumPy is available, otherwise an array.array.
+	def column(self, name):
+		if name in self._codes:
+			a=self._codes[name]
+		else:
+			a=self._numeric[name]
+		if numpy is not None:
+			return numpy.frombuffer(a, dtype=typecodeOf(a)) if len(a) else numpy.zeros(0, dtype=typecodeOf(a))
+		return a
+
+	## Returns the distinct values of a string column, the position of each
+	#  value in the list is the code stored in the column.
+	def values(self, name):
+		return self._values[name]
+
+	## Returns the time each job was pending in seconds.  For jobs that never
+	#  started this is the time until the job finished.
+	def waitTimes(self):
+		if numpy is not None:
+			submit=self.column("submitTimeEpoch")
+			start=self.column("startTimeEpoch")
+			event=self.column("eventTimeEpoch")
+			return numpy.where(start<1, event, start)-submit
+		n=self._numeric
+		return array("d", [(e if s<1 else s)-sub for sub, s, e in 
+				zip(n["submitTimeEpoch"], n["startTimeEpoch"], n["eventTimeEpoch"])])
+
+	## Returns the wall clock time each job ran for in seconds, zero for jobs
+	#  that never started.
+	def runTimes(self):
+		if numpy is not None:
+			start=self.column("startTimeEpoch")
+			return numpy.where(start<1, 0.0, self.column("eventTimeEpoch")-start)
+		n=self._numeric
+		return array("d", [0.0 if s<1 else e-s for s, e in 
+				zip(n["startTimeEpoch"], n["eventTimeEpoch"])])
+
+	## Calculates totals for each distinct value of a string column.  The 
+	#  totals are the same as those reported by jobStats.py, but are in 
+	#  seconds instead of timedelta objects.
+	#\param name The string column to group on, for example queue.
+	#\returns A dictionary keyed on the value of the column, each value is a
+	#  dictionary containing name, numJobs, numFJobs (jobs that did not exit
+	#  normally), waitTime, wallTime, runTime (wall time multiplied by the 
+	#  number of processors) and wasteTime (runTime of the failed jobs).
+	def groupBy(self, name):
+		values=self._values[name]
+		if numpy is not None:
+			totals=self._numpyGroupBy(name)
+		else:
+			totals=self._arrayGroupBy(name)
+		groups={}
+		for code, value in enumerate(values):
+			if totals["numJobs"][code]:
+				g=dict((k, v[code]) for k, v in totals.items())
+				g["numJobs"]=int(g["numJobs"])
+				g["numFJobs"]=int(g["numFJobs"])
+				g["name"]=value
+				groups[value]=g
+		return groups
+
+	def _numpyGroupBy(self, name):
+		codes=self.column(name)
+		size=len(self._values[name])
+		wall=self.runTimes()
+		cpu=wall*self.column("numProcessors")
+		failed=self.column("termInfo")>0
+		return {
+				"numJobs":numpy.bincount(codes, minlength=size),
+				"numFJobs":numpy.bincount(codes, weights=failed, minlength=size),
+				"waitTime":numpy.bincount(codes, weights=self.waitTimes(), minlength=size),
+				"wallTime":numpy.bincount(codes, weights=wall, minlength=size),
+				"runTime":numpy.bincount(codes, weights=cpu, minlength=size),
+				"wasteTime":numpy.bincount(codes, weights=cpu*failed, minlength=size),
+				}
+
+	def _arrayGroupBy(self, name):
+		size=len(self._values[name])
+		totals=dict((k, [0.0]*size) for k in ("numJobs","numFJobs","waitTime","wallTime","runTime","wasteTime"))
+		numJobs=totals["numJobs"]
+		numFJobs=totals["numFJobs"]
+		waitTime=totals["waitTime"]
+		wallTime=totals["wallTime"]
+		runTime=totals["runTime"]
+		wasteTime=totals["wasteTime"]
+		n=self._numeric
+		for code, wait, wall, procs, term in zip(self._codes[name], self.waitTimes(), 
+				self.runTimes(), n["numProcessors"], n["termInfo"]):
+			numJobs[code]+=1
+			waitTime[code]+=wait
+			wallTime[code]+=wall
+			runTime[code]+=wall*procs
+			if term>0:
+				numFJobs[code]+=1
+				wasteTime[code]+=wall*procs
+		return totals
+
+## An AcctTable that also stores the jobID and array index of each job, and 
+#  builds indexes to find jobs without scanning the whole table.
+#
+#  - Hash indexes on userName, queue, projectName and chargedSAAP give the 
+#    rows for a value.
+#  - Sorted indexes on submitTimeEpoch, startTimeEpoch and eventTimeEpoch 
+#    give the rows in a time range using a binary search.
+#  - An interval tree on the start and event times gives the jobs that were 
+#    running at a time.
+#
+#  Indexes are built the first time they are used, and are rebuilt if jobs 
+#  have been added to the table since.  Queries return the positions of the 
+#  matching rows in ascending order, filter() returns a new table holding 
+#  only those rows, which can then be grouped with groupBy().
+#
+# Example Usage:
+#
+# The following code prints the total wait time for each user of the normal 
+# queue, for jobs that were running at midnight on the 1st of January 2012.
+#\code
+#from lsfpy.columnar import JobTable
+#t=JobTable.load(open('lsb.acct','rb'))
+#jobs=t.filter(queue='normal', runningAt=1325376000)
+#for u in jobs.groupBy('userName').values():
+#    print(u['name'], u['waitTime'])
+#\endcode
+class JobTable(AcctTable):
+	NUMERIC=AcctTable.NUMERIC+(
+			("jobID","l"),
+			("idx","l"),
+			)
+
+	## The columns that have sorted indexes.
+	TIMES=("submitTimeEpoch","startTimeEpoch","eventTimeEpoch")
+
+	def __init__(self):
+		AcctTable.__init__(self)
+		self._indexes={}
+
+	@classmethod
+	def fromColumns(cls, columns, values):
+		t=super(JobTable, cls).fromColumns(columns, values)
+		t._indexes={}
+		return t
+
+	def append(self, event):
+		AcctTable.append(self, event)
+		self._numeric["jobID"].append(event.jobID)
+		self._numeric["idx"].append(int(event.idx))
+
+	def _index(self, key, build):
+		try:
+			size, index=self._indexes[key]
+			if size==len(self):
+				return index
+		except KeyError:
+			pass
+		index=build()
+		self._indexes[key]=(len(self), index)
+		return index
+
+	## Returns the hash index of a string column.
+	#\param name The name of the string column, for example queue.
+	#\returns A list holding an array of rows for each code of the column.
+	def hashIndex(self, name):
+		def build():
+			rows=[array("l") for v in self._values[name]]
+			for i, code in enumerate(self._codes[name]):
+				rows[code].append(i)
+			return rows
+		return self._index(name, build)
+
+	## Returns the sorted index of a time column.
+	#\param name The name of the column, one of TIMES.
+	#\returns A tuple of an array of the sorted times, and an array of the 
+	#  row each time belongs to.
+	def sortedIndex(self, name):
+		def build():
+			times=self._numeric[name]
+			if numpy is not None and len(times):
+				order=numpy.argsort(self.column(name), kind="mergesort")
+				rows=array("l", order.tolist())
+			else:
+				rows=array("l", sorted(range(len(times)), key=times.__getitem__))
+			return array("d", [times[i] for i in rows]), rows
+		return self._index(name, build)
+
+	## Returns the rows where a string column has a value.
+	#\param name The name of the string column.
+	#\param value The value to find.
+	#\returns An array of rows.
+	def rowsWhere(self, name, value):
+		try:
+			code=self._lookup[name][value]
+		except KeyError:
+			return array("l")
+		return self.hashIndex(name)[code]
+
+	## Returns the rows where a time column is in a range.
+	#\param name The name of the column, one of TIMES.
+	#\param since Only rows at or after this time, in seconds since the 
+	#  epoch, None for no lower limit.
+	#\param until Only rows before this time, None for no upper limit.
+	#\returns A list of rows in ascending order.
+	def rowsBetween(self, name, since=None, until=None):
+		times, rows=self.sortedIndex(name)
+		lo=0 if since is None else bisect_left(times, since)
+		hi=len(times) if until is None else bisect_left(times, until)
+		return sorted(rows[lo:hi])
+
+	## Returns the rows of the jobs that were running at a time, jobs that 
+	#  started at or before the time and finished after it.  Jobs that never 
+	#  started are not included.
+	#\param t The time in seconds since the epoch.
+	#\returns A list of rows in ascending order.
+	def runningAt(self, t):
+		found=[]
+		nodes=self._index("intervals", self._intervalTree)
+		node=0
+		while node>=0:
+			center, left, right, starts, byStart, ends, byEnd=nodes[node]
+			if t<center:
+				# Every interval here ends after t, so it is running if it 
+				# has started.
+				for i in range(bisect_right(starts, t)):
+					found.append(byStart[i])
+				node=left
+			else:
+				# Every interval here starts before t, ends are sorted in
+				# descending order.
+				for i in range(len(ends)):
+					if ends[i]<=t:
+						break
+					found.append(byEnd[i])
+				node=right
+		found.sort()
+		return found
+
+	## Builds a centered interval tree of the start and event times of the 
+	#  jobs that ran.  Each node holds the intervals that contain its center,
+	#  sorted by start and by descending end, and the position of the nodes 
+	#  holding the intervals entirely before and after the center.  The 
+	#  center is the median start time, so each node holds at least one 
+	#  interval.
+	def _intervalTree(self):
+		starts=self._numeric["startTimeEpoch"]
+		ends=self._numeric["eventTimeEpoch"]
+		nodes=[]
+		pending=[([i for i in range(len(starts)) if 1<=starts[i]<ends[i]], None, None)]
+		while pending:
+			rows, parent, side=pending.pop()
+			if not rows:
+				continue
+			center=sorted([starts[i] for i in rows])[len(rows)//2]
+			before=[i for i in rows if ends[i]<=center]
+			after=[i for i in rows if starts[i]>center]
+			here=[i for i in rows if starts[i]<=center<ends[i]]
+			byStart=sorted(here, key=starts.__getitem__)
+			byEnd=sorted(here, key=ends.__getitem__, reverse=True)
+			node=len(nodes)
+			nodes.append([center, -1, -1, array("d", [starts[i] for i in byStart]), byStart,
+					array("d", [ends[i] for i in byEnd]), byEnd])
+			if parent is not None:
+				nodes[parent][side]=node
+			pending.append((before, node, 1))
+			pending.append((after, node, 2))
+		if not nodes:
+			nodes.append([0.0, -1, -1, array("d"), [], array("d"), []])
+		return nodes
+
+	## Returns the rows that match all of the criteria given.
+	#\param userName, queue, projectName, chargedSAAP A value, or a list of
+	#  values, of the column.
+	#\param submitted, started, finished A tuple of (since, until) times, see
+	#  rowsBetween.
+	#\param runningAt A time, see runningAt.
+	#\returns A list of rows in ascending order.
+	def select(self, userName=None, queue=None, projectName=None, chargedSAAP=None,
+			submitted=None, started=None, finished=None, runningAt=None):
+		matches=[]
+		for name, value in (("userName", userName), ("queue", queue),
+				("projectName", projectName), ("chargedSAAP", chargedSAAP)):
+			if value is None:
+				continue
+			if isinstance(value, (list, tuple, set, frozenset)):
+				rows=[]
+				for v in value:
+					rows.extend(self.rowsWhere(name, v))
+				matches.append(rows)
+			else:
+				matches.append(self.rowsWhere(name, value))
+		for name, window in (("submitTimeEpoch", submitted), ("startTimeEpoch", started),
+				("eventTimeEpoch", finished)):
+			if window is not None:
+				matches.append(self.rowsBetween(name, *window))
+		if runningAt is not None:
+			matches.append(self.runningAt(runningAt))
+		if not matches:
+			return list(range(len(self)))
+		matches.sort(key=len)
+		rows=set(matches[0])
+		for m in matches[1:]:
+			rows.intersection_update(m)
+		return sorted(rows)
+
+	## Returns a new table holding some of the rows of this table.
+	#\param rows The rows to keep, for example from select().
+	#\returns A JobTable object.
+	def subset(self, rows):
+		columns={}
+		for name, a in self.columns().items():
+			columns[name]=array(typecodeOf(a), [a[i] for i in rows])
+		return self.fromColumns(columns, self._values)
+
+	## Returns a new table holding the rows that match the criteria, see 
+	#  select.
+	#\returns A JobTable object.
+	def filter(self, **criteria):
+		return self.subset(self.select(**criteria))
+
+	## Returns the values of a row.
+	#\param row The position of the row.
+	#\returns A dictionary keyed on column name, string columns hold the 
+	#  value instead of the code.
+	def row(self, row):
+		values=dict((name, a[row]) for name, a in self._numeric.items())
+		for name in self.STRINGS:
+			values[name]=self._values[name][self._codes[name][row]]
+		return values
@@ -0,0 +1,527 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+import bisect
+import bz2
+import gzip
+import io
+import lzma
+import os
+import re
+import struct
+import zlib
+try:
+	import zstandard
+except ImportError:
+	zstandard=None
+
+## The magic bytes at the start of each compressed format.
+MAGIC=(
+		("gzip", b"\x1f\x8b"),
+		("bz2", b"BZh"),
+		("xz", b"\xfd7zXZ\x00"),
+		("zstd", b"\x28\xb5\x2f\xfd"),
+		)
+
+## The formats made of independent gzip members or zstd frames, which can
+#  be decompressed starting at any member.
+SPLITTABLE=("gzip", "zstd")
+
+## The number of compressed bytes read at a time.
+_BLOCK=256*1024
+
+_ZSTD_START=b"\x28\xb5\x2f\xfd"
+## Matches the start of a skippable zstd frame, which holds no data.  Tools 
+#  such as pzstd write one before each frame.
+_ZSTD_SKIPPABLE=re.compile(b"[\x50-\x5f]"+re.escape(b"\x2a\x4d\x18"))
+
+## Returns the compression format of some data.
+#\param head The first bytes of the data, at least six are needed to detect
+#  xz.
+#\returns "gzip", "bz2", "xz", "zstd", or None if the data is not compressed.
+def compressionOf(head):
+	for name, magic in MAGIC:
+		if head.startswith(magic):
+			return name
+	if _ZSTD_SKIPPABLE.match(head):
+		return "zstd"
+	return None
+
+## Returns the compression format of an open file without reading from it.
+#  A file that can neither peek nor seek, such as a socket, is not checked.
+#\param fh A file object opened in binary mode.
+#\returns The format, see compressionOf.
+def detectCompression(fh):
+	if hasattr(fh, "peek"):
+		return compressionOf(fh.peek(6)[:6])
+	if fh.seekable():
+		offset=fh.tell()
+		head=fh.read(6)
+		fh.seek(offset)
+		return compressionOf(head)
+	return None
+
+## Returns the compression format of a file.
+#\param path The path to the file.
+#\returns The format, see compressionOf.
+def pathCompression(path):
+	fh=open(path, 'rb')
+	try:
+		return compressionOf(fh.read(6))
+	finally:
+		fh.close()
+
+def _zstd():
+	if zstandard is None:
+		raise ValueError("reading zstd requires zstandard")
+	return zstandard
+
+## The exceptions raised when compressed data is corrupt.
+def _errors():
+	if zstandard is None:
+		return (zlib.error, EOFError, ValueError)
+	return (zlib.error, EOFError, ValueError, zstandard.ZstdError)
+
+## Returns True if the bytes at an offset look like a gzip member header,
+#  which starts with the magic bytes and the compression method, deflate.
+#  The same bytes can appear inside compressed data, so the member is only
+#  known to start there once it has been decompressed.
+def _isGzipHeader(data, i):
+	return (len(data)>=i+10 and not data[i+3]&0xe0 and data[i+8] in (0, 2, 4)
+			and (data[i+9]<=13 or data[i+9]==255))
+
+## Returns True if the bytes at an offset look like a zstd frame header.
+def _isZstdHeader(data, i):
+	return data[i]!=0x28 or (len(data)>=i+5 and not data[i+4]&0x08)
+
+_HEADERS={
+		"gzip":(re.compile(b"\x1f\x8b\x08"), _isGzipHeader),
+		"zstd":(re.compile(re.escape(_ZSTD_START)+b"|"+_ZSTD_SKIPPABLE.pattern), _isZstdHeader),
+		}
+
+## Generates the offsets in a byte range of a gzip or zstd file that could be
+#  the start of a member, without decompressing anything.
+#\param fh A file object opened in binary mode on the compressed file, the
+#  caller can use it between offsets.
+#\param compression "gzip" or "zstd".
+#\param start The offset to start searching from.
+#\param end The offset to stop searching at, defaults to the end of the file.
+def memberCandidates(fh, compression, start=0, end=None):
+	magic, isHeader=_HEADERS[compression]
+	pos=start
+	while end is None or pos<end:
+		fh.seek(pos)
+		# The overlap lets a header that crosses the end of the block be
+		# checked.
+		data=fh.read(_BLOCK+16)
+		if not data:
+			return
+		limit=_BLOCK if end is None else min(_BLOCK, end-pos)
+		for m in magic.finditer(data, 0, limit+3):
+			i=m.start()
+			if i>=limit:
+				break
+			if isHeader(data, i):
+				yield pos+i
+		pos+=_BLOCK
+
+## Returns the length of the zstd frame at an offset, found from the frame
+#  and block headers without decompressing the frame.
+#\param fh A file object opened in binary mode on the compressed file.
+#\param offset The offset of the frame.
+#\param size The size of the file.
+#\returns A tuple of the length of the frame and True if it is a skippable
+#  frame, or None if there is not a complete frame at the offset.
+def _zstdFrame(fh, offset, size):
+	fh.seek(offset)
+	head=fh.read(14)
+	if len(head)<8:
+		return None
+	magic=struct.unpack_from("<I", head)[0]
+	if 0x184d2a50<=magic<=0x184d2a5f:
+		length=8+struct.unpack_from("<I", head, 4)[0]
+		return (length, True) if offset+length<=size else None
+	if head[:4]!=_ZSTD_START:
+		return None
+	descriptor=head[4]
+	single=descriptor>>5&1
+	pos=offset+6-single+(0, 1, 2, 4)[descriptor&3]+(single, 2, 4, 8)[descriptor>>6]
+	while True:
+		fh.seek(pos)
+		block=fh.read(3)
+		if len(block)<3:
+			return None
+		value=block[0]|block[1]<<8|block[2]<<16
+		kind=value>>1&3
+		if kind==3:
+			return None
+		# An RLE block holds the byte that is repeated
+		pos+=3+(1 if kind==1 else value>>3)
+		if value&1:
+			break
+	if descriptor&0x04:
+		pos+=4
+	if pos>size:
+		return None
+	return (pos-offset, False)
+
+## Decompresses a single zstd frame, the caller feeds it the bytes of the
+#  file and it uses exactly the length of the frame, with the same attributes
+#  as the decompressors from zlib.
+class _ZstdFrame(object):
+	def __init__(self, length, skippable):
+		self.remaining=length
+		if skippable:
+			self.decompressor=None
+		else:
+			self.decompressor=_zstd().ZstdDecompressor().decompressobj()
+		self.eof=False
+		self.unused_data=b""
+
+	def decompress(self, data):
+		used=data[:self.remaining]
+		self.unused_data=data[self.remaining:]
+		self.remaining-=len(used)
+		self.eof=not self.remaining
+		if self.decompressor is None:
+			return b""
+		return self.decompressor.decompress(used)
+
+## A file object that decompresses a gzip or zstd file, and records a seek
+#  point at the start of each gzip member or zstd frame.  A file written in
+#  several parts, such as the output of bgzip, writeMembers(), or rotated
+#  files that were compressed and then concatenated, has a member for each
+#  part.  Seeking restarts decompression at the nearest seek point before
+#  the new position, so it only decompresses from the start of the file
+#  when the file is a single member.
+#
+#  Seek points found by an earlier reader can be passed in, for example the
+#  ones stored by an AcctIndex, so the first seek can go straight to the
+#  member it needs.
+#
+#  This is a raw file object, wrap it in an io.BufferedReader to read lines.
+#
+# Example Usage:
+#
+# The following code prints the first 100 bytes after 1GB of uncompressed
+# data.
+#\code
+#from lsfpy.compressed import CompressedFile
+#f=CompressedFile(open('lsb.acct.1.gz','rb'))
+#f.seek(1024*1024*1024)
+#print(f.read(100))
+#\endcode
+class CompressedFile(io.RawIOBase):
+	## Initializer is called with the compressed file.
+	#\param fh A file object opened in binary mode on the compressed file, it
+	#  must be seekable.
+	#\param compression "gzip" or "zstd", detected if None.
+	#\param seekPoints A list of (position, offset) tuples for known members,
+	#  the position in the uncompressed data and offset in the file.
+	#\param start The offset of the member to start reading from, which is
+	#  at position 0.
+	#\param end Stop reading at the first member that starts at or after this
+	#  offset.
+	#\param closeFile True to close fh when this file is closed.
+	def __init__(self, fh, compression=None, seekPoints=None, start=0, end=None, closeFile=False):
+		io.RawIOBase.__init__(self)
+		if compression is None:
+			compression=detectCompression(fh)
+		if compression not in SPLITTABLE:
+			raise ValueError("CompressedFile reads gzip or zstd, not %s" % compression)
+		if compression=="zstd":
+			_zstd()
+		self.fh=fh
+		self.compression=compression
+		self.end=end
+		self.closeFile=closeFile
+		fh.seek(0, 2)
+		self._size=fh.tell()
+		self._positions=[0]
+		self._offsets=[start]
+		for position, offset in seekPoints or ():
+			self._addSeekPoint(position, offset)
+		self._restart(0, start)
+
+	def _restart(self, position, offset):
+		self.fh.seek(offset)
+		## The offset in the compressed file of the next byte to decompress.
+		self.offset=offset
+		self._input=b""
+		self._decompressor=None
+		self._buffer=b""
+		self._used=0
+		self._position=position
+		# The position of the end of the buffer
+		self._produced=position
+
+	def _addSeekPoint(self, position, offset):
+		i=bisect.bisect_left(self._positions, position)
+		# An empty member has the same position as the one after it, keep
+		# the first.
+		if i==len(self._positions) or self._positions[i]!=position:
+			self._positions.insert(i, position)
+			self._offsets.insert(i, offset)
+
+	## The seek points found so far.
+	#\returns A list of (position, offset) tuples in order, see __init__.
+	def seekPoints(self):
+		return list(zip(self._positions, self._offsets))
+
+	def _startMember(self):
+		while len(self._input)<4:
+			more=self.fh.read(_BLOCK)
+			if not more:
+				break
+			self._input+=more
+		if self.compression=="gzip":
+			if not self._input.startswith(b"\x1f\x8b"):
+				return False
+			self._decompressor=zlib.decompressobj(31)
+		else:
+			frame=_zstdFrame(self.fh, self.offset, self._size)
+			self.fh.seek(self.offset+len(self._input))
+			if frame is None:
+				if compressionOf(self._input[:4])=="zstd":
+					raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+				return False
+			self._decompressor=_ZstdFrame(*frame)
+		self._addSeekPoint(self._produced, self.offset)
+		return True
+
+	## Decompresses more data into the buffer.
+	#\returns False at the end of the data.
+	def _fill(self):
+		while True:
+			if self._decompressor is None:
+				if self.end is not None and self.offset>=self.end:
+					return False
+				# gzip allows zeros to pad the file after a member
+				data=self._input.lstrip(b"\0")
+				self.offset+=len(self._input)-len(data)
+				self._input=data
+				if not data:
+					self._input=self.fh.read(_BLOCK)
+					if not self._input:
+						return False
+					continue
+				if not self._startMember():
+					raise ValueError("%s data is corrupt at offset %d" % (self.compression, self.offset))
+			if not self._input:
+				self._input=self.fh.read(_BLOCK)
+				if not self._input:
+					raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+			data=self._input
+			out=self._decompressor.decompress(data)
+			if self._decompressor.eof:
+				self._input=self._decompressor.unused_data
+				self._decompressor=None
+			else:
+				self._input=b""
+			self.offset+=len(data)-len(self._input)
+			if out:
+				self._buffer=out
+				self._used=0
+				self._produced+=len(out)
+				return True
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def readinto(self, b):
+		if self._used>=len(self._buffer) and not self._fill():
+			return 0
+		n=min(len(b), len(self._buffer)-self._used)
+		b[:n]=self._buffer[self._used:self._used+n]
+		self._used+=n
+		self._position+=n
+		return n
+
+	def readall(self):
+		chunks=[self._buffer[self._used:]]
+		while self._fill():
+			chunks.append(self._buffer)
+		self._used=len(self._buffer)
+		self._position=self._produced
+		return b"".join(chunks)
+
+	def tell(self):
+		return self._position
+
+	def seek(self, position, whence=io.SEEK_SET):
+		if whence==io.SEEK_CUR:
+			position+=self._position
+		elif whence==io.SEEK_END:
+			self.readall()
+			position+=self._position
+		if position<0:
+			raise ValueError("negative seek position %d" % position)
+		i=bisect.bisect_right(self._positions, position)-1
+		if position<self._position or self._positions[i]>self._position:
+			self._restart(self._positions[i], self._offsets[i])
+		while self._position<position:
+			if self._used>=len(self._buffer) and not self._fill():
+				break
+			n=min(position-self._position, len(self._buffer)-self._used)
+			self._used+=n
+			self._position+=n
+		return self._position
+
+	def close(self):
+		if not self.closed and self.closeFile:
+			self.fh.close()
+		io.RawIOBase.close(self)
+
+## Returns a file object that reads the decompressed data of a file, or the
+#  file itself if it is not compressed.
+#\param fh A file object opened in binary mode.
+#\param compression The format of the file, detected if None.
+#\returns A file object opened in binary mode.
+def openCompressed(fh, compression=None):
+	if compression is None:
+		compression=detectCompression(fh)
+	if compression is None:
+		return fh
+	if compression in SPLITTABLE and fh.seekable():
+		return io.BufferedReader(CompressedFile(fh, compression), _BLOCK)
+	if compression=="gzip":
+		return gzip.GzipFile(fileobj=fh, mode='rb')
+	if compression=="bz2":
+		return bz2.BZ2File(fh)
+	if compression=="xz":
+		return lzma.LZMAFile(fh)
+	return io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(fh, read_across_frames=True), _BLOCK)
+
+## Opens an accounting file that may be compressed.
+#\param path The path to the file.
+#\returns A file object opened in binary mode that reads the decompressed
+#  data, closing it closes the file.
+def openAcct(path):
+	compression=pathCompression(path)
+	if compression=="bz2":
+		return bz2.open(path, 'rb')
+	if compression=="xz":
+		return lzma.open(path, 'rb')
+	fh=open(path, 'rb')
+	if compression is None:
+		return fh
+	return io.BufferedReader(CompressedFile(fh, compression, closeFile=True), _BLOCK)
+
+## Decompresses the members of a gzip or zstd file that start in a byte
+#  range.  The last member is read to its end even when that is after the
+#  end of the range, so splitting a file into ranges decompresses each member
+#  once.  A candidate member that cannot be decompressed is part of the data
+#  of another member, and is skipped.
+#\param path The path to the compressed file.
+#\param compression "gzip" or "zstd".
+#\param start The offset of the start of the range.
+#\param end The offset of the end of the range.
+#\returns A tuple of (first, last, data), first is the offset of the first
+#  member in the range, or None if no member starts in the range, last is
+#  the offset after the last member, and data is the decompressed data.
+def decompressRange(path, compression, start, end):
+	fh=open(path, 'rb')
+	try:
+		for offset in memberCandidates(fh, compression, start, end):
+			try:
+				reader=CompressedFile(fh, compression, start=offset, end=end)
+				data=reader.readall()
+			except _errors():
+				continue
+			return (offset, reader.offset, data)
+		return (None, end, b"")
+	finally:
+		fh.close()
+
+## Generates the decompressed data from each member of a gzip or zstd file
+#  to the end of the file, starting with the last member and working back, 
+#  so the end of the data can be read without decompressing the whole file.
+#  The first member is not included, if it is needed the whole file has to
+#  be read anyway.
+#\param path The path to the compressed file.
+#\param compression "gzip" or "zstd".
+#\returns A generator of (offset, data) tuples, offset is the offset of the
+#  member in the file.
+def memberTails(path, compression):
+	fh=open(path, 'rb')
+	try:
+		end=os.fstat(fh.fileno()).st_size
+		while end>1:
+			start=max(1, end-_BLOCK)
+			for offset in reversed(list(memberCandidates(fh, compression, start, end))):
+				try:
+					data=CompressedFile(fh, compression, start=offset).readall()
+				except _errors():
+					continue
+				yield offset, data
+			end=start
+	finally:
+		fh.close()
+
+## Returns True if a gzip or zstd file has a member that starts after the
+#  first member, but before an offset.  Only a file made of members that
+#  are small compared to the file can be decompressed in parallel.
+#\param path The path to the compressed file.
+#\param compression "gzip" or "zstd".
+#\param within The offset the second member must start before.
+def hasMembers(path, compression, within):
+	fh=open(path, 'rb')
+	try:
+		for offset in memberCandidates(fh, compression, 1, within):
+			try:
+				reader=CompressedFile(fh, compression, start=offset, end=offset+1)
+				while reader.read(_BLOCK):
+					pass
+			except _errors():
+				continue
+			return True
+		return False
+	finally:
+		fh.close()
+
+## Compresses a file as a series of gzip members, each holding memberSize
+#  bytes of the uncompressed data.  Any gzip reader can read the result as
+#  the original data, and a CompressedFile can start at any member, so an
+#  archive written this way can be indexed and read in parallel.
+#\param source The path to the file, which may already be compressed.
+#\param dest The path of the file to write.
+#\param memberSize The number of uncompressed bytes in each member.
+#\param level The gzip compression level.
+#\returns The number of members written.
+def writeMembers(source, dest, memberSize=4*1024*1024, level=6):
+	members=0
+	src=openAcct(source)
+	try:
+		out=open(dest, 'wb')
+		try:
+			while True:
+				data=src.read(memberSize)
+				if not data:
+					break
+				out.write(gzip.compress(data, level, mtime=0))
+				members+=1
+		finally:
+			out.close()
+	finally:
+		src.close()
+	return members
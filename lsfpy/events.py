@@ -0,0 +1,640 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import csv
+import re
+from lsfpy.accounting import JobFinishEvent, LazyJobFinishEvent, decodeField, fromEpoch, isBinary, readRows
+from lsfpy.compressed import openCompressed
+from lsfpy.hosts import countHosts
+
+## The classes used for each type of event, keyed on the event type logged 
+#  in the first field of the record.
+EVENT_TYPES={}
+
+## Adds an event class to EVENT_TYPES.
+#\param cls The class, its eventType attribute is the type of event it is 
+#  used for.
+#\returns The class.
+def register(cls):
+	EVENT_TYPES[cls.eventType]=cls
+	return cls
+
+## Describes a single field in a layout.
+#\param name The name of the attribute.
+#\param convert The function used to convert the logged string, None leaves
+#  the string as it is.
+def field(name, convert=None):
+	return ("field", name, convert, None, 1)
+
+## Describes a variable number of fields, the number is logged in an earlier 
+#  field.
+#\param name The name of the attribute, this is set to a list.
+#\param count The name of the earlier field holding the number of entries.
+#\param convert The function used to convert each entry.
+#\param width The number of fields in each entry, when this is more than 
+#  one each entry is a tuple of unconverted strings.
+def listOf(name, count, convert=None, width=1):
+	return ("list", name, convert, count, width)
+
+## Describes a group of fields that is only logged when an earlier field is 
+#  not zero.
+#\param name The name of the attribute, this is set to a list of the fields,
+#  or None when they are not logged.
+#\param flag The name of the earlier field.
+#\param size The number of fields in the group.
+#\param convert The function used to convert each field.
+def optional(name, flag, size, convert=None):
+	return ("optional", name, convert, flag, size)
+
+## Converts a version string to a tuple that can be compared, for example 
+#  "7.06" becomes (7, 6).
+def versionKey(version):
+	key=[]
+	for part in version.split("."):
+		try:
+			key.append(int(part))
+		except ValueError:
+			break
+	return tuple(key)
+
+## Compiles a layout into a function that decodes a row, setting an 
+#  attribute on an event for each field.  The function is generated as 
+#  Python source, so every field is read with a constant index, or a 
+#  constant offset from the end of the last variable length list or 
+#  optional group.
+#
+#  The first required fields must be in every record, if the record is 
+#  shorter ValueError is raised before any field is converted.  Fields after
+#  those are only decoded when the record is long enough to hold them, so a 
+#  record that was logged without them still parses, and the missing fields
+#  are left unset.
+#\param fields A sequence of entries made by field(), listOf() and 
+#  optional().
+#\param required The number of entries that must be logged.
+#\param start The index of the first field in the row.
+#\param extra When True the fields logged after the layout are set in extra.
+#\returns A function called with the event and the row.
+def compileLayout(fields, required, start=0, extra=False):
+	names={"decodeField":decodeField}
+	lines=["def decode(e, row):", "\td=e.__dict__", "\tn=len(row)"]
+	base="0"
+	offset=start
+	# The length is checked once the last list of the required fields has 
+	# been read, as the position of the remaining required fields is known.
+	check=-1
+	for i, entry in enumerate(fields[:required]):
+		if entry[0]!="field":
+			check=i
+	if required and check<0:
+		lines.append("\tif n<%d:" % (start+required))
+		lines.append("\t\traise ValueError('JOB_FINISH record is truncated')")
+	for i, (kind, name, convert, arg, width) in enumerate(fields):
+		if i>=required and (kind=="field" or not required):
+			lines.append("\tif n<=%s+%d:" % (base, offset))
+			lines.append("\t\treturn")
+		pos="%s+%d" % (base, offset)
+		names["c_"+name]=convert or decodeField
+		if kind=="field":
+			lines.append("\td[%r]=c_%s(row[%s])" % (name, name, pos))
+			offset+=1
+			continue
+		lines.append("\tp=%s" % pos)
+		if kind=="optional":
+			lines.append("\tif d[%r]:" % arg)
+			lines.append("\t\td[%r]=[c_%s(v) for v in row[p:p+%d]]" % (name, name, width))
+			lines.append("\t\tp+=%d" % width)
+			lines.append("\telse:")
+			lines.append("\t\td[%r]=None" % name)
+		else:
+			lines.append("\tc=d[%r]*%d" % (arg, width))
+			if width>1:
+				lines.append("\td[%r]=[tuple(map(c_%s, row[i:i+%d])) for i in range(p, p+c, %d)]" % (name, name, width, width))
+			else:
+				lines.append("\td[%r]=[c_%s(v) for v in row[p:p+c]]" % (name, name))
+			lines.append("\tp+=c")
+		base="p"
+		offset=0
+		if i==check:
+			lines.append("\tif n<p+%d:" % (required-i-1))
+			lines.append("\t\traise ValueError('JOB_FINISH record is truncated')")
+	if extra:
+		lines.append("\td['extra']=[decodeField(f) for f in row[%s+%d:]]" % (base, offset))
+	exec("\n".join(lines), names)
+	return names["decode"]
+
+## Base class for events read from lsb.events and lsb.acct.  Each subclass 
+#  sets eventType, and layouts, a list of (version, fields) tuples giving the
+#  fields logged by each version of LSF after the event type, version and 
+#  event time that all events start with.  A record uses the layout of the 
+#  newest version that is not newer than the version logged in the record.
+#
+#  The layout for each version is compiled with compileLayout() the first 
+#  time a record of that version is read.  Fields that are missing 
+#  from the end of a record, for example because it was logged by an older
+#  version of LSF, are set to None.  Fields logged after the last field in 
+#  the layout are kept in extra.
+class Event(object):
+	eventType=None
+	layouts=()
+	## Compiled decoders keyed on the event type and logged version, shared by
+	#  all subclasses.
+	_compiled={}
+
+	def __init__(self, row):
+		if not decodeField(row[0])==self.eventType:
+			raise ValueError
+		## Version number of the log file format.
+		self.version=decodeField(row[1])
+		## The time the event was logged in seconds since the epoch.
+		self.eventTimeEpoch=float(row[2])
+		## Any fields logged after the fields in the layout.
+		self.extra=[]
+		try:
+			decode=self._compiled[(self.eventType, self.version)]
+		except KeyError:
+			decode=self._decoder(self.version)
+		decode(self, row)
+
+	@classmethod
+	def _decoder(cls, version):
+		key=(cls.eventType, version)
+		try:
+			return cls._compiled[key]
+		except KeyError:
+			pass
+		logged=versionKey(version)
+		layout=None
+		for v, fields in sorted(cls.layouts, key=lambda l: versionKey(l[0])):
+			if layout is None or versionKey(v)<=logged:
+				layout=fields
+		# Fields that are missing from a record are read from the class.
+		for entry in layout or ():
+			if not hasattr(cls, entry[1]):
+				setattr(cls, entry[1], None)
+		decode=cls._compiled[key]=compileLayout(layout or (), 0, start=3, extra=True)
+		return decode
+
+	## A datetime object for the time the event was logged.
+	@property
+	def eventTime(self):
+		return fromEpoch(self.eventTimeEpoch)
+
+## An event of a type that has no class in EVENT_TYPES, the fields after the
+#  event time are kept in extra.
+class UnknownEvent(Event):
+	def __init__(self, row):
+		self.eventType=decodeField(row[0])
+		self.version=decodeField(row[1])
+		self.eventTimeEpoch=float(row[2])
+		self.extra=[decodeField(f) for f in row[3:]]
+
+_RLIMITS=("cpuLimit","fileLimit","dataLimit","stackLimit","coreLimit","memLimit",
+		"rLimit6","rLimit7","rLimit8","runLimit","processLimit")
+
+## A job has been submitted (lsb.events).
+@register
+class JobNewEvent(Event):
+	eventType="JOB_NEW"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("userId", int),
+			field("options", int),
+			field("options2", int),
+			field("numProcessors", int),
+			field("submitTimeEpoch", float),
+			field("beginTimeEpoch", float),
+			field("termTimeEpoch", float),
+			field("sigValue", int),
+			field("chkpntPeriod", int),
+			field("restartPid", int),
+			field("userName"),
+			]+[field(n, int) for n in _RLIMITS]+[
+			field("hostSpec"),
+			field("hostFactor", float),
+			field("umask", int),
+			field("queue"),
+			field("resReq"),
+			field("fromHost"),
+			field("cwd"),
+			field("chkpntDir"),
+			field("inFile"),
+			field("outFile"),
+			field("errFile"),
+			field("inFileSpool"),
+			field("commandSpool"),
+			field("jobSpoolDir"),
+			field("subHomeDir"),
+			field("jobFile"),
+			field("numAskedHosts", int),
+			listOf("askedHosts", "numAskedHosts"),
+			field("dependCond"),
+			field("timeEvent"),
+			field("jobName"),
+			field("command"),
+			field("nxf", int),
+			listOf("xf", "nxf", width=3),
+			field("mailUser"),
+			field("projectName"),
+			field("niosPort", int),
+			field("maxNumProcessors", int),
+			field("schedHostType"),
+			field("loginShell"),
+			field("userGroup"),
+			]),)
+
+## A job has been dispatched to its execution hosts (lsb.events).
+@register
+class JobStartEvent(Event):
+	eventType="JOB_START"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("jStatus", int),
+			field("jobPid", int),
+			field("jobPGid", int),
+			field("hostFactor", float),
+			field("numExHosts", int),
+			listOf("execHosts", "numExHosts"),
+			field("queuePreCmd"),
+			field("queuePostCmd"),
+			field("jFlags", int),
+			field("userGroup"),
+			field("idx", int),
+			field("additionalInfo"),
+			]),)
+
+## A job has been started on its execution host (lsb.events).
+@register
+class JobStartAcceptEvent(Event):
+	eventType="JOB_START_ACCEPT"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("jobPid", int),
+			field("jobPGid", int),
+			field("idx", int),
+			]),)
+
+## The status of a job has changed (lsb.events).  The rusage fields are only
+#  logged when ru is not zero.
+@register
+class JobStatusEvent(Event):
+	eventType="JOB_STATUS"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("jStatus", int),
+			field("reason", int),
+			field("subreasons", int),
+			field("cpuTime", float),
+			field("endTimeEpoch", float),
+			field("ru", int),
+			optional("lsfRusage", "ru", 19, float),
+			field("jFlags", int),
+			field("exitStatus", int),
+			field("idx", int),
+			field("exitInfo", int),
+			]),)
+
+## A job has been signalled (lsb.events).
+@register
+class JobSignalEvent(Event):
+	eventType="JOB_SIGNAL"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("userId", int),
+			field("runCount", int),
+			field("signalSymbol"),
+			field("idx", int),
+			field("userName"),
+			]),)
+
+## A job has been switched to another queue (lsb.events).
+@register
+class JobSwitchEvent(Event):
+	eventType="JOB_SWITCH"
+	layouts=(("6.0", [
+			field("userId", int),
+			field("jobID", int),
+			field("queue"),
+			field("idx", int),
+			field("userName"),
+			]),)
+
+## A job has been moved in its queue (lsb.events).
+@register
+class JobMoveEvent(Event):
+	eventType="JOB_MOVE"
+	layouts=(("6.0", [
+			field("userId", int),
+			field("jobID", int),
+			field("position", int),
+			field("base", int),
+			field("idx", int),
+			field("userName"),
+			]),)
+
+## A job has been forced to run with brun (lsb.events).
+@register
+class JobForceEvent(Event):
+	eventType="JOB_FORCE"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("userId", int),
+			field("options", int),
+			field("numExecHosts", int),
+			listOf("execHosts", "numExecHosts"),
+			field("idx", int),
+			field("userName"),
+			]),)
+
+## A job has been requeued (lsb.events).
+@register
+class JobRequeueEvent(Event):
+	eventType="JOB_REQUEUE"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("idx", int),
+			]),)
+
+## A job has been removed from mbatchd's memory (lsb.events).
+@register
+class JobCleanEvent(Event):
+	eventType="JOB_CLEAN"
+	layouts=(("6.0", [
+			field("jobID", int),
+			field("idx", int),
+			]),)
+
+## mbatchd has started (lsb.events).
+@register
+class MbdStartEvent(Event):
+	eventType="MBD_START"
+	layouts=(("6.0", [
+			field("master"),
+			field("cluster"),
+			field("numHosts", int),
+			field("numQueues", int),
+			]),)
+
+## mbatchd has exited (lsb.events).
+@register
+class MbdDieEvent(Event):
+	eventType="MBD_DIE"
+	layouts=(("6.0", [
+			field("master"),
+			field("numRemoveJobs", int),
+			field("exitCode", int),
+			]),)
+
+## An advance reservation has finished (lsb.acct).  Each entry of rsvHosts is
+#  a tuple of the host name and the number of CPUs reserved on it.
+@register
+class AdvanceReservationFinishEvent(Event):
+	eventType="EVENT_ADRSV_FINISH"
+	layouts=(("6.0", [
+			field("rsvCreateTimeEpoch", float),
+			field("rsvType", int),
+			field("creatorId", int),
+			field("rsvId"),
+			field("userName"),
+			field("timeWindow"),
+			field("creatorName"),
+			field("duration", int),
+			field("numResources", int),
+			listOf("rsvHosts", "numResources", width=2),
+			]),)
+
+## The allocation of a resizable job has changed (lsb.acct).
+@register
+class JobResizeEvent(Event):
+	eventType="JOB_RESIZE"
+	layouts=(("7.0", [
+			field("jobID", int),
+			field("idx", int),
+			field("startTimeEpoch", float),
+			field("userId", int),
+			field("userName"),
+			field("resizeType", int),
+			field("lastResizeStartTimeEpoch", float),
+			field("lastResizeFinishTimeEpoch", float),
+			field("numExecHosts", int),
+			listOf("execHosts", "numExecHosts"),
+			field("numResizeHosts", int),
+			listOf("resizeHosts", "numResizeHosts"),
+			]),)
+
+## The resize notification command of a job has been started (lsb.events).
+@register
+class JobResizeNotifyStartEvent(Event):
+	eventType="JOB_RESIZE_NOTIFY_START"
+	layouts=(("7.0", [
+			field("jobID", int),
+			field("idx", int),
+			field("notifyId", int),
+			field("numResizeHosts", int),
+			listOf("resizeHosts", "numResizeHosts"),
+			]),)
+
+## The resize notification command of a job has been accepted (lsb.events).
+@register
+class JobResizeNotifyAcceptEvent(Event):
+	eventType="JOB_RESIZE_NOTIFY_ACCEPT"
+	layouts=(("7.0", [
+			field("jobID", int),
+			field("idx", int),
+			field("notifyId", int),
+			field("resizeNotifyCmdPid", int),
+			field("resizeNotifyCmdPGid", int),
+			field("status", int),
+			]),)
+
+## The resize notification command of a job has finished (lsb.events).
+@register
+class JobResizeNotifyDoneEvent(Event):
+	eventType="JOB_RESIZE_NOTIFY_DONE"
+	layouts=(("7.0", [
+			field("jobID", int),
+			field("idx", int),
+			field("notifyId", int),
+			field("status", int),
+			]),)
+
+EVENT_TYPES["JOB_FINISH"]=JobFinishEvent
+
+## Parses lsb.events or lsb.acct and returns an event object for every 
+#  record, using the class registered in EVENT_TYPES for the type of the 
+#  record.  JOB_FINISH records are returned as JobFinishEvent objects, the 
+#  same as AcctFile.
+#
+# Example Usage:
+#
+# The following code prints the job ID of each job that is started.
+#\code
+#from lsfpy.events import EventFile
+#for i in EventFile(open('lsb.events','rb'), types=['JOB_START']):
+#    print(i.jobID)
+#\endcode
+class EventFile:
+	## Initializer is called with an open file handle object opened to the
+	#  event or accounting file.
+	#\param fh An open file object to the file, which can be compressed, see
+	#  AcctFile.
+	#\param types A list of the event types to return, if None every type is
+	#  returned.  Records of other types are skipped without being parsed.
+	#\param unknown If True, records of types that are not in EVENT_TYPES are
+	#  returned as UnknownEvent objects, otherwise they are skipped.
+	#\param lazy If True, JOB_FINISH records are returned as 
+	#  LazyJobFinishEvent objects.
+	def __init__(self, fh, types=None, unknown=True, lazy=False):
+		if isBinary(fh):
+			self.reader=readRows(openCompressed(fh))
+		else:
+			self.reader=csv.reader(fh,delimiter=' ', quotechar='"')
+		self.types=None
+		if types is not None:
+			self.types=frozenset(types)
+		self.unknown=unknown
+		self.classes=dict(EVENT_TYPES)
+		if lazy:
+			self.classes["JOB_FINISH"]=LazyJobFinishEvent
+
+	def __iter__(self):
+		return self
+
+	## Returns the event for the next record.
+	def __next__(self):
+		while True:
+			row=next(self.reader)
+			if not row:
+				continue
+			eventType=decodeField(row[0])
+			if self.types is not None and eventType not in self.types:
+				continue
+			cls=self.classes.get(eventType)
+			if cls is None:
+				if not self.unknown:
+					continue
+				cls=UnknownEvent
+			try:
+				return cls(row)
+			except (ValueError, IndexError):
+				# Badly formed record
+				continue
+
+## Job status values logged in JOB_STATUS events.
+JOB_STAT_PEND=1
+JOB_STAT_PSUSP=2
+JOB_STAT_RUN=4
+JOB_STAT_SSUSP=8
+JOB_STAT_USUSP=16
+JOB_STAT_EXIT=32
+JOB_STAT_DONE=64
+
+_ARRAY_SPEC=re.compile(r'\[([0-9:,\-]+)\](?:%\d+)?$')
+
+## Returns the number of elements of a job from its job name, which for a
+#  job array ends with the index list in brackets, for example 
+#  myjob[1-100:2,200]%10.
+#\param jobName The job name logged in JOB_NEW.
+#\returns The number of elements, or 1 if the job is not an array.
+def numElements(jobName):
+	match=_ARRAY_SPEC.search(decodeField(jobName or ""))
+	if not match:
+		return 1
+	n=0
+	for part in match.group(1).split(","):
+		first, dash, rest=part.partition("-")
+		last, colon, step=rest.partition(":")
+		try:
+			first=int(first)
+			last=int(last) if dash else first
+			step=int(step) if colon else 1
+		except ValueError:
+			return 1
+		if step>0 and last>=first:
+			n+=(last-first)//step+1
+	return n or 1
+
+## Keeps track of the jobs that are pending and running from the events in 
+#  lsb.events, so the number of jobs and slots in each state can be found 
+#  without running bjobs.  Pass each event to add(), for example by 
+#  following lsb.events.
+#
+#  Jobs are tracked by jobID and idx.  The pending elements of a job array
+#  are kept together under idx 0, counted from the index list in the job name
+#  of its JOB_NEW event, and each element is moved out of them when it starts
+#  or finishes.  Running slots are counted from the execHosts of JOB_START,
+#  in either the long or the short N*host form.  Jobs that were submitted 
+#  before the first event that was read have no queue and are counted under
+#  None.
+class JobStates(object):
+	def __init__(self):
+		## The state of each job keyed on (jobID, idx), each value is a list
+		#  of the state, number of slots, queue, and number of jobs, which is
+		#  more than one for the pending elements of an array.
+		self.jobs={}
+		self._queues={}
+
+	## Removes a job, or one pending element of an array.
+	def _remove(self, jobID, idx):
+		if self.jobs.pop((jobID, idx), None) is not None or not idx:
+			return
+		pending=self.jobs.get((jobID, 0))
+		if pending is not None:
+			pending[3]-=1
+			if pending[3]<1:
+				del self.jobs[(jobID, 0)]
+
+	## Updates the state of the jobs from an event.
+	def add(self, e):
+		t=e.eventType
+		if t=="JOB_NEW":
+			self._queues[e.jobID]=e.queue
+			self.jobs[(e.jobID, 0)]=["PEND", e.numProcessors, e.queue, numElements(e.jobName)]
+		elif t=="JOB_START":
+			idx=e.idx or 0
+			self._remove(e.jobID, idx)
+			slots=sum(n for host, n in countHosts(e.execHosts or []))
+			self.jobs[(e.jobID, idx)]=["RUN", slots, self._queues.get(e.jobID), 1]
+		elif t=="JOB_SWITCH":
+			self._queues[e.jobID]=e.queue
+			for key, job in self.jobs.items():
+				if key[0]==e.jobID:
+					job[2]=e.queue
+		elif t=="JOB_STATUS":
+			key=(e.jobID, e.idx or 0)
+			if e.jStatus & (JOB_STAT_EXIT|JOB_STAT_DONE):
+				self._remove(*key)
+			elif key in self.jobs:
+				if e.jStatus & (JOB_STAT_PEND|JOB_STAT_PSUSP):
+					self.jobs[key][0]="PEND"
+				elif e.jStatus & (JOB_STAT_RUN|JOB_STAT_SSUSP|JOB_STAT_USUSP):
+					self.jobs[key][0]="RUN"
+		elif t in ("JOB_CLEAN", "JOB_FINISH"):
+			self._remove(e.jobID, int(getattr(e, "idx", 0) or 0))
+
+	## Counts the jobs and slots in each state.
+	#\returns A dictionary keyed on (queue, state) of [jobs, slots].
+	def counts(self):
+		counts={}
+		for state, slots, queue, n in self.jobs.values():
+			c=counts.setdefault((queue, state), [0, 0])
+			c[0]+=n
+			c[1]+=slots*n
+		return counts
@@ -0,0 +1,266 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import json
+import sqlite3
+import struct
+from array import array
+from operator import attrgetter
+from lsfpy.aggregate import waitSeconds, runSeconds
+
+try:
+	import pyarrow
+	import pyarrow.parquet
+except ImportError:
+	pyarrow=None
+
+## The fields exported by default, as (name, type, getter) tuples.  The type
+#  is one of "int", "float" or "str".  Times are stored as seconds since the
+#  epoch, utime, stime, waitTime and runTime are in seconds, and termInfo 
+#  stores the termination number.
+EXPORT_FIELDS=(
+		("jobID", "int", attrgetter("jobID")),
+		("idx", "int", lambda e: int(e.idx)),
+		("userName", "str", attrgetter("userName")),
+		("queue", "str", attrgetter("queue")),
+		("projectName", "str", attrgetter("projectName")),
+		("chargedSAAP", "str", attrgetter("chargedSAAP")),
+		("jobName", "str", attrgetter("jobName")),
+		("eventTime", "float", attrgetter("eventTimeEpoch")),
+		("submitTime", "float", attrgetter("submitTimeEpoch")),
+		("startTime", "float", attrgetter("startTimeEpoch")),
+		("numProcessors", "int", attrgetter("numProcessors")),
+		("jStatus", "int", attrgetter("jStatus")),
+		("exitStatus", "int", attrgetter("exitStatus")),
+		("termInfo", "int", lambda e: e.termInfo.number),
+		("utime", "float", lambda e: e.utime.total_seconds()),
+		("stime", "float", lambda e: e.stime.total_seconds()),
+		("maxRMem", "int", lambda e: int(e.maxRMem or 0)),
+		("waitTime", "float", waitSeconds),
+		("runTime", "float", runSeconds),
+		)
+
+## The fields that are indexed by exportSQLite.
+SQLITE_INDEXES=("jobID", "eventTime", "userName", "queue")
+
+_MAGIC=b"LSFCOLS1"
+_LENGTH=struct.Struct("<Q")
+_TYPECODES={"int":"l", "float":"d"}
+_SQLTYPES={"int":"INTEGER", "float":"REAL", "str":"TEXT"}
+
+def _fields(fields):
+	if fields is None:
+		return EXPORT_FIELDS
+	byName=dict((f[0], f) for f in EXPORT_FIELDS)
+	return tuple(byName[f] if f in byName else f for f in fields)
+
+def _text(value):
+	if isinstance(value, bytes):
+		return value.decode("utf-8", "replace")
+	return value
+
+## Reads events in batches, converting each batch to columns.  Only one 
+#  batch is held in memory at a time.
+#\param events An iterable of JOB_FINISH events.
+#\param fields A sequence of (name, type, getter) tuples.
+#\param batchSize The maximum number of events in each batch.
+#\returns A generator of lists of columns, one list of values per field.
+def batches(events, fields, batchSize):
+	getters=[f[2] for f in fields]
+	columns=[[] for f in fields]
+	n=0
+	for e in events:
+		for getter, column in zip(getters, columns):
+			column.append(getter(e))
+		n+=1
+		if n==batchSize:
+			yield columns
+			columns=[[] for f in fields]
+			n=0
+	if n:
+		yield columns
+
+## Writes events to a columnar file.  When pyarrow is installed, or the path
+#  ends in .parquet, the file is written as Parquet, otherwise it is written
+#  in the compact format read by readColumns().  Events are read in batches, each batch is written as a row
+#  group, so the memory used depends on the batch size and not the number of
+#  events.
+#
+# Example Usage:
+#
+# The following code exports an accounting file.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.export import exportColumns
+#exportColumns(AcctFile(open('lsb.acct','rb'), lazy=True), 'jobs.parquet')
+#\endcode
+#\param events An iterable of JOB_FINISH events.
+#\param path The file to write.
+#\param fields The fields to export, names from EXPORT_FIELDS or (name, 
+#  type, getter) tuples, defaults to EXPORT_FIELDS.
+#\param batchSize The number of events in each batch.
+#\param parquet True to write Parquet, which requires pyarrow, False to write
+#  the compact format.  Defaults to Parquet when pyarrow is installed or the
+#  path ends in .parquet.
+#\returns The number of events written.
+def exportColumns(events, path, fields=None, batchSize=65536, parquet=None):
+	fields=_fields(fields)
+	if parquet is None:
+		parquet=pyarrow is not None or str(path).lower().endswith(".parquet")
+	if parquet:
+		if pyarrow is None:
+			raise ValueError("writing Parquet requires pyarrow, install pyarrow or pass parquet=False to write the compact format")
+		return _writeParquet(events, path, fields, batchSize)
+	return _writeCompact(events, path, fields, batchSize)
+
+def _writeParquet(events, path, fields, batchSize):
+	types={"int":pyarrow.int64(), "float":pyarrow.float64(), "str":pyarrow.string()}
+	schema=pyarrow.schema([(name, types[t]) for name, t, getter in fields])
+	writer=pyarrow.parquet.ParquetWriter(path, schema)
+	count=0
+	try:
+		for columns in batches(events, fields, batchSize):
+			arrays=[]
+			for (name, t, getter), column in zip(fields, columns):
+				if t=="str":
+					column=[_text(v) for v in column]
+				arrays.append(pyarrow.array(column, type=types[t]))
+			writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+			count+=len(columns[0])
+	finally:
+		writer.close()
+	return count
+
+def _pack(header):
+	encoded=json.dumps(header).encode("utf-8")
+	return _LENGTH.pack(len(encoded))+encoded
+
+def _writeCompact(events, path, fields, batchSize):
+	f=open(path, 'wb')
+	count=0
+	try:
+		f.write(_MAGIC+_pack({"fields":[[name, t] for name, t, getter in fields]}))
+		for columns in batches(events, fields, batchSize):
+			header={"count":len(columns[0]), "columns":[]}
+			blocks=[]
+			for (name, t, getter), column in zip(fields, columns):
+				if t=="str":
+					# Dictionary encode strings, each batch has its own
+					# list of values.
+					lookup={}
+					codes=array("l", [lookup.setdefault(v, len(lookup)) for v in column])
+					values=sorted(lookup, key=lookup.get)
+					data=b"".join(_LENGTH.pack(len(v))+v for v in [_text(v).encode("utf-8") for v in values])
+					blocks.append(codes.tobytes())
+					blocks.append(data)
+					header["columns"].append([name, len(blocks[-2]), len(data)])
+				else:
+					data=array(_TYPECODES[t], column).tobytes()
+					blocks.append(data)
+					header["columns"].append([name, len(data)])
+			f.write(_pack(header))
+			for data in blocks:
+				f.write(data)
+			count+=header["count"]
+	finally:
+		f.close()
+	return count
+
+## Reads a file written in the compact columnar format, one batch at a time.
+#\param path The file to read.
+#\returns A generator of dictionaries keyed on field name, numeric fields 
+#  are arrays and string fields are lists.
+def readColumns(path):
+	f=open(path, 'rb')
+	try:
+		if f.read(len(_MAGIC))!=_MAGIC:
+			raise ValueError("%s is not a columnar export" % path)
+		types=dict(_readHeader(f)["fields"])
+		while True:
+			header=_readHeader(f)
+			if header is None:
+				return
+			batch={}
+			for entry in header["columns"]:
+				name=entry[0]
+				if types[name]=="str":
+					codes=array("l")
+					codes.frombytes(f.read(entry[1]))
+					data=f.read(entry[2])
+					values=[]
+					pos=0
+					while pos<len(data):
+						n=_LENGTH.unpack_from(data, pos)[0]
+						pos+=_LENGTH.size
+						values.append(data[pos:pos+n].decode("utf-8"))
+						pos+=n
+					batch[name]=[values[c] for c in codes]
+				else:
+					a=array(_TYPECODES[types[name]])
+					a.frombytes(f.read(entry[1]))
+					batch[name]=a
+			yield batch
+	finally:
+		f.close()
+
+def _readHeader(f):
+	data=f.read(_LENGTH.size)
+	if len(data)<_LENGTH.size:
+		return None
+	return json.loads(f.read(_LENGTH.unpack(data)[0]).decode("utf-8"))
+
+## Writes events to a table in an SQLite database.  Each batch is inserted 
+#  with executemany in its own transaction, and indexes on jobID, eventTime,
+#  userName and queue are created once all the events are loaded, which is 
+#  quicker than updating them for each insert.
+#\param events An iterable of JOB_FINISH events.
+#\param database The path to the database, or an sqlite3 connection.
+#\param table The name of the table, it is created if it does not exist.
+#\param fields The fields to export, see exportColumns.
+#\param batchSize The number of events in each transaction.
+#\returns The number of events written.
+def exportSQLite(events, database, table="jobs", fields=None, batchSize=10000):
+	fields=_fields(fields)
+	if isinstance(database, sqlite3.Connection):
+		conn=database
+	else:
+		conn=sqlite3.connect(database)
+	count=0
+	try:
+		names=[f[0] for f in fields]
+		conn.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (table, ", ".join("%s %s" % (name, _SQLTYPES[t]) for name, t, getter in fields)))
+		conn.commit()
+		insert="INSERT INTO %s (%s) VALUES (%s)" % (table, ", ".join(names), ", ".join("?"*len(names)))
+		strings=[i for i, f in enumerate(fields) if f[1]=="str"]
+		for columns in batches(events, fields, batchSize):
+			for i in strings:
+				columns[i]=[_text(v) for v in columns[i]]
+			conn.executemany(insert, zip(*columns))
+			conn.commit()
+			count+=len(columns[0])
+		for name in SQLITE_INDEXES:
+			if name in names:
+				conn.execute("CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)" % (table, name, table, name))
+		conn.commit()
+	finally:
+		if conn is not database:
+			conn.close()
+	return count
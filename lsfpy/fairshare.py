@@ -0,0 +1,246 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+import math
+from lsfpy.aggregate import runSeconds, waitSeconds
+
+## Returns the CPU time a job used in seconds, the user and system time from
+#  its resource usage.
+def cpuTimeSeconds(e):
+	return e.utime.total_seconds()+e.stime.total_seconds()
+
+## Returns the wall clock time a job ran for multiplied by the number of
+#  slots, in seconds, the run time used by LSF fairshare.
+def slotSeconds(e):
+	return e.numProcessors*runSeconds(e)
+
+## Splits a fairshare account path into the names of each level.
+#\param path The path, for example /dept/group/user.
+#\returns A tuple of names, empty for the root.
+def splitPath(path):
+	return tuple(p for p in path.split("/") if p)
+
+## A node in a SAAPTree.  The totals of a node include the usage charged to
+#  the node itself and to every node below it, and are kept up to date as
+#  usage is added, so reading them does not look at the rest of the tree.
+#
+#  The decayed usage is stored as the value at the time usage was last
+#  added, and decayed to the time it is read.
+class SAAPNode(object):
+	__slots__=("tree","name","path","parent","children","numJobs","cpuTime","wallTime",
+			"pendTime","_decayTime","_decayedCpu","_decayedWall")
+
+	def __init__(self, tree, name, path, parent):
+		self.tree=tree
+		## The name of this level of the path, "" for the root.
+		self.name=name
+		## The normalized path of the node, / for the root.
+		self.path=path
+		## The node above this one, None for the root.
+		self.parent=parent
+		## The nodes below this one keyed on their name.
+		self.children={}
+		self.numJobs=0
+		## The CPU time in seconds, see cpuTimeSeconds.
+		self.cpuTime=0.0
+		## The slot wall clock time in seconds, see slotSeconds.
+		self.wallTime=0.0
+		## The time jobs were pending in seconds.
+		self.pendTime=0.0
+		self._decayTime=None
+		self._decayedCpu=0.0
+		self._decayedWall=0.0
+
+	## Adds usage to the decayed totals.
+	#\param cpu The CPU time decayed to time t.
+	#\param wall The wall clock time decayed to time t.
+	#\param t The time in seconds since the epoch.
+	def _decay(self, cpu, wall, t):
+		last=self._decayTime
+		if last is None:
+			self._decayTime=t
+		elif t>last:
+			f=self.tree.decayFactor(t-last)
+			self._decayedCpu*=f
+			self._decayedWall*=f
+			self._decayTime=t
+		elif t<last:
+			# Usage from before the last update is decayed to that time
+			f=self.tree.decayFactor(last-t)
+			cpu*=f
+			wall*=f
+		self._decayedCpu+=cpu
+		self._decayedWall+=wall
+
+	## Returns the decayed CPU time of the node.
+	#\param t The time in seconds since the epoch to decay the usage to,
+	#  defaults to the time usage was last added.
+	def decayedCpuTime(self, t=None):
+		if t is None or self._decayTime is None:
+			return self._decayedCpu
+		return self._decayedCpu*self.tree.decayFactor(t-self._decayTime)
+
+	## Returns the decayed wall clock time of the node, see decayedCpuTime.
+	def decayedWallTime(self, t=None):
+		if t is None or self._decayTime is None:
+			return self._decayedWall
+		return self._decayedWall*self.tree.decayFactor(t-self._decayTime)
+
+	## Returns the totals of the node.
+	#\param t The time to decay the usage to, see decayedCpuTime.
+	#\returns A dictionary of the totals.
+	def totals(self, t=None):
+		return {
+				"path":self.path,
+				"numJobs":self.numJobs,
+				"cpuTime":self.cpuTime,
+				"wallTime":self.wallTime,
+				"pendTime":self.pendTime,
+				"decayedCpuTime":self.decayedCpuTime(t),
+				"decayedWallTime":self.decayedWallTime(t),
+				}
+
+	## Returns the nodes below this one, in path order, starting with this
+	#  node.
+	def walk(self):
+		yield self
+		for name in sorted(self.children):
+			for node in self.children[name].walk():
+				yield node
+
+	def __repr__(self):
+		return "SAAPNode(%r)" % self.path
+
+## Rolls up usage by fairshare account path (chargedSAAP).  Each path is
+#  parsed once, after which the node for it is found with a dictionary
+#  lookup.  Adding a job adds its usage to its node and every node above it,
+#  so the totals of any node can be read without a rescan.  Jobs with no
+#  path are charged to the root.
+#
+#  Decayed usage follows LSF fairshare, where usage decays so that after
+#  HIST_HOURS hours it counts as a tenth of its value.  Each job's usage
+#  is decayed from the time it finished.
+#
+# Example Usage:
+#
+# The following code prints the usage of each account.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.fairshare import SAAPTree
+#t=SAAPTree()
+#t.extend(AcctFile(open('lsb.acct','rb'), lazy=True))
+#for node in t.walk():
+#    print(node.path, node.numJobs, node.cpuTime, node.decayedCpuTime(1325462400))
+#\endcode
+class SAAPTree(object):
+	## Initializer is called with the decay rate.
+	#\param histHours The number of hours after which usage has decayed to a
+	#  tenth, HIST_HOURS in lsb.params.
+	def __init__(self, histHours=5):
+		self.histHours=histHours
+		self._rate=math.log(0.1)/(histHours*3600.0)
+		## The root of the tree.
+		self.root=SAAPNode(self, "", "/", None)
+		self._nodes={"":self.root, "/":self.root}
+
+	## Returns the factor usage decays by over a number of seconds.
+	def decayFactor(self, seconds):
+		return math.exp(self._rate*seconds)
+
+	## Returns the node for a path.
+	#\param path The fairshare account path, unnormalized paths such as
+	#  dept/group/ are the same as /dept/group.
+	#\param create True to create the node and any missing nodes above it.
+	#\returns A SAAPNode object, or None if create is False and there is no
+	#  node for the path.
+	def node(self, path, create=False):
+		try:
+			return self._nodes[path]
+		except KeyError:
+			pass
+		node=self.root
+		for name in splitPath(path):
+			try:
+				node=node.children[name]
+			except KeyError:
+				if not create:
+					return None
+				child=SAAPNode(self, name, node.path.rstrip("/")+"/"+name, node)
+				node.children[name]=child
+				self._nodes[child.path]=child
+				node=child
+		self._nodes[path]=node
+		return node
+
+	## Adds the usage of a job to the node for a path and every node above.
+	#\param path The fairshare account path.
+	#\param cpuTime The CPU time in seconds.
+	#\param wallTime The slot wall clock time in seconds.
+	#\param pendTime The time the job was pending in seconds.
+	#\param t The time the usage was recorded, used to decay it.
+	#\param numJobs The number of jobs the usage is for.
+	def addUsage(self, path, cpuTime, wallTime, pendTime, t, numJobs=1):
+		node=self.node(path or "", True)
+		while node is not None:
+			node.numJobs+=numJobs
+			node.cpuTime+=cpuTime
+			node.wallTime+=wallTime
+			node.pendTime+=pendTime
+			node._decay(cpuTime, wallTime, t)
+			node=node.parent
+
+	## Adds a job.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	def add(self, event):
+		self.addUsage(event.chargedSAAP, cpuTimeSeconds(event), slotSeconds(event),
+				waitSeconds(event), event.eventTimeEpoch)
+
+	## Adds every event from an iterable, such as an AcctFile.
+	def extend(self, events):
+		for e in events:
+			self.add(e)
+
+	## Adds the totals from another SAAPTree, for example one calculated from
+	#  another file or in another process.
+	def merge(self, other):
+		for node in other.root.walk():
+			into=self.node(node.path, True)
+			into.numJobs+=node.numJobs
+			into.cpuTime+=node.cpuTime
+			into.wallTime+=node.wallTime
+			into.pendTime+=node.pendTime
+			if node._decayTime is not None:
+				into._decay(node._decayedCpu, node._decayedWall, node._decayTime)
+
+	## Returns the totals of the node for a path, see SAAPNode.totals.
+	#\returns A dictionary of totals, or None if there is no node for the path.
+	def totals(self, path, t=None):
+		node=self.node(path)
+		if node is None:
+			return None
+		return node.totals(t)
+
+	## Returns every node in path order, starting with the root.
+	def walk(self):
+		return self.root.walk()
+
+	## Returns the totals of every node in path order, see SAAPNode.totals.
+	def report(self, t=None):
+		return [node.totals(t) for node in self.walk()]
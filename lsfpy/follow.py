@@ -0,0 +1,162 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import os
+import time
+from lsfpy.accounting import *
+
+## Follows an accounting file as mbatchd appends to it, returning each new 
+#  JOB_FINISH event as it is written.  The position in the file can be saved
+#  to a checkpoint file, so a collector that is restarted carries on from 
+#  where it stopped instead of reading the whole file again.
+#
+#  A record that is only partly written is left until the rest of it has 
+#  been written.  When the file is rotated to lsb.acct.1, the rest of the 
+#  rotated file is read before moving to the new file, so no records are 
+#  lost or returned twice.  If the checkpoint refers to a file that has since
+#  been rotated, reading resumes from lsb.acct.1.
+#
+#  Iterating over the object never ends, it waits for new records when it
+#  reaches the end of the file.  The checkpoint is saved each time all the 
+#  events read so far have been consumed.  Use poll() to read the events that
+#  are available without waiting.
+#
+# Example Usage:
+#
+# The following code prints the queue of each job as it finishes.
+#\code
+#from lsfpy.follow import AcctFollower
+#for i in AcctFollower('lsb.acct', checkpoint='lsb.acct.chk'):
+#    print(i.queue)
+#\endcode
+class AcctFollower(object):
+	## Initializer is called with the path to the accounting file.
+	#\param path The path to the accounting file.
+	#\param checkpoint The path to the checkpoint file, if None the position 
+	#  is not saved and reading starts at the beginning of the file.
+	#\param lazy If True, create LazyJobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row.  This overrides lazy.
+	#\param interval The number of seconds to wait before checking for new 
+	#  records when the end of the file is reached.
+	def __init__(self, path, checkpoint=None, lazy=False, eventClass=None, interval=5.0):
+		self.path=path
+		self.checkpoint=checkpoint
+		self.interval=interval
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
+		## The inode of the file being read.
+		self.inode=None
+		## The offset of the next record to be read.
+		self.offset=0
+		self.fh=None
+		self._resume()
+
+	def _open(self, path, offset):
+		self.fh=open(path, 'rb')
+		self.inode=os.fstat(self.fh.fileno()).st_ino
+		self.fh.seek(offset)
+		self.offset=offset
+
+	def _resume(self):
+		inode=None
+		offset=0
+		if self.checkpoint and os.path.exists(self.checkpoint):
+			f=open(self.checkpoint, 'r')
+			try:
+				inode, offset=[int(v) for v in f.read().split()]
+			finally:
+				f.close()
+		if inode is not None and os.stat(self.path).st_ino!=inode:
+			# The file has been rotated since the checkpoint was saved
+			rotated=self.path+".1"
+			if os.path.exists(rotated) and os.stat(rotated).st_ino==inode:
+				self._open(rotated, offset)
+				return
+			offset=0
+		self._open(self.path, offset)
+
+	## Saves the position of the next record to the checkpoint file.
+	def commit(self):
+		if not self.checkpoint:
+			return
+		tmp=self.checkpoint+".tmp"
+		f=open(tmp, 'w')
+		try:
+			f.write("%d %d\n" % (self.inode, self.offset))
+		finally:
+			f.close()
+		os.rename(tmp, self.checkpoint)
+
+	def _read(self, events):
+		for offset, record in readRecords(self.fh, partial=False):
+			self.offset=offset+len(record)
+			if not record.startswith(b'"JOB_FINISH"'):
+				continue
+			try:
+				events.append(self.eventClass(parseRecord(record)))
+			except (ValueError, IndexError):
+				pass
+
+	## Reads the events that have been written since the last call.
+	#\returns A list of events, empty if there are no new records.
+	def poll(self):
+		events=[]
+		while True:
+			self._read(events)
+			try:
+				st=os.stat(self.path)
+			except OSError:
+				# The file is being rotated, it will be picked up next time
+				break
+			if st.st_ino!=self.inode:
+				# Rotated, anything written before the rename is still in the 
+				# old file.
+				self._read(events)
+				self.fh.close()
+				self._open(self.path, 0)
+				continue
+			if st.st_size<self.offset:
+				# Truncated, start again
+				self.fh.close()
+				self._open(self.path, 0)
+				continue
+			break
+		return events
+
+	def __iter__(self):
+		while True:
+			events=self.poll()
+			for e in events:
+				yield e
+			self.commit()
+			if not events:
+				time.sleep(self.interval)
+
+	## Closes the file being followed.
+	def close(self):
+		if self.fh:
+			self.fh.close()
+			self.fh=None
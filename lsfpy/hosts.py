@@ -0,0 +1,363 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+from array import array
+from collections import Counter
+from lsfpy.accounting import LazyJobFinishEvent, decodeField
+
+## Gives each host name a small integer ID, so that allocations and reports
+#  store an integer for each host instead of a string.  Names are never
+#  removed, so an ID is valid for as long as the dictionary exists.  The
+#  shared dictionary HOSTS is used unless another one is given.
+#
+#  A dictionary created with intern=True also remembers each execHosts entry
+#  it has parsed, and each distinct HostAllocation, so jobs that ran on the
+#  same hosts share one allocation object.  These are never removed either,
+#  so HOSTS does not intern, and a dictionary that does should only live as
+#  long as the objects that use it.
+class HostDictionary(object):
+	## Initializer is called with whether to intern entries and allocations.
+	#\param intern True to remember each entry and allocation.
+	def __init__(self, intern=False):
+		self.intern=intern
+		self._names=[]
+		self._ids={}
+		self._entries={}
+		self._allocations={}
+
+	## Returns the ID of a host, adding the host if it is not known.
+	#\param name The name of the host.
+	def id(self, name):
+		try:
+			return self._ids[name]
+		except KeyError:
+			i=self._ids[name]=len(self._names)
+			self._names.append(name)
+			return i
+
+	## Returns the host ID and number of slots of an execHosts entry, see 
+	#  parseHost.
+	#\param entry The entry as a string or bytes.
+	def entry(self, entry):
+		try:
+			return self._entries[entry]
+		except KeyError:
+			host, slots=parseHost(entry)
+			value=(self.id(host), slots)
+			if self.intern:
+				self._entries[entry]=value
+			return value
+
+	## Returns the ID of a host, or None if the host is not known.
+	def find(self, name):
+		return self._ids.get(name)
+
+	## Returns the name of the host with an ID.
+	def name(self, hostId):
+		return self._names[hostId]
+
+	## Returns the names of every host, in the order of their IDs.
+	def names(self):
+		return list(self._names)
+
+	def __len__(self):
+		return len(self._names)
+
+	def __contains__(self, name):
+		return name in self._ids
+
+	def __getstate__(self):
+		return self._names, self.intern
+
+	def __setstate__(self, state):
+		names, intern=state
+		self.__init__(intern)
+		for name in names:
+			self.id(name)
+
+## The host dictionary shared by allocations and reports.
+HOSTS=HostDictionary()
+
+## Splits an execHosts entry into the host name and the number of slots.
+#  With LSF_HPC_EXTENSIONS="SHORT_EVENTFILE" an entry is written as N*host
+#  for N slots on the host, otherwise it is the host name for one slot.
+#\param entry The entry as a string or bytes.
+#\returns A tuple of (host, slots), host is a string.
+def parseHost(entry):
+	entry=decodeField(entry)
+	count, star, host=entry.partition("*")
+	if star and count.isdigit():
+		return host, int(count)
+	return entry, 1
+
+## Counts the slots on each host of a list of execHosts entries, which can be
+#  in the long form, with an entry for each slot, the short N*host form, or a
+#  mix of both.  Repeated entries are counted before they are decoded, so
+#  each distinct entry is only decoded once.
+#\param entries The entries as strings or bytes.
+#\returns A list of (host, slots) tuples in the order each host is first
+#  listed.
+def countHosts(entries):
+	counts={}
+	for entry, n in Counter(entries).items():
+		host, slots=parseHost(entry)
+		counts[host]=counts.get(host, 0)+slots*n
+	return list(counts.items())
+
+## Returns the execHosts entries of an event without decoding them.  A lazy
+#  event returns the fields from its row.
+def _execHostEntries(event):
+	if isinstance(event, LazyJobFinishEvent):
+		return event._row[event._ex+1:event._tail]
+	return event.execHosts
+
+## The hosts a job ran on and the number of slots it used on each, stored as
+#  host IDs from a HostDictionary.  A job uses two tuples of integers however
+#  many slots it has, so a 512 slot job on 16 hosts stores 32 integers rather
+#  than 512 host names.  Allocations created from an interning dictionary,
+#  or with the same shared dictionary of allocations, are shared between
+#  jobs that ran on the same hosts, and must not be changed.
+#
+# Example Usage:
+#
+# The following code prints the hosts and slots used by each job.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.hosts import HostAllocation
+#for i in AcctFile(open('lsb.acct','rb'), lazy=True):
+#    print(i.jobID, HostAllocation.fromEvent(i).items())
+#\endcode
+class HostAllocation(object):
+	__slots__=("hostIds","slots")
+
+	## Initializer is called with the host IDs and the slots on each host.
+	#\param hostIds A tuple of host IDs.
+	#\param slots A tuple of the number of slots on each host.
+	def __init__(self, hostIds=(), slots=()):
+		self.hostIds=hostIds
+		self.slots=slots
+
+	## Creates an allocation from a list of execHosts entries, see countHosts.
+	#\param entries The entries as strings or bytes.
+	#\param dictionary The HostDictionary used to look up host IDs.
+	#\param shared A dictionary of allocations to share the allocation with,
+	#  defaults to the allocations of an interning HostDictionary.
+	@classmethod
+	def fromHosts(cls, entries, dictionary=HOSTS, shared=None):
+		counts={}
+		lookup=dictionary.entry
+		for entry, n in Counter(entries).items():
+			hostId, slots=lookup(entry)
+			counts[hostId]=counts.get(hostId, 0)+slots*n
+		allocation=cls(tuple(counts), tuple(counts.values()))
+		if shared is None:
+			if not dictionary.intern:
+				return allocation
+			shared=dictionary._allocations
+		return shared.setdefault(allocation, allocation)
+
+	## Creates an allocation from the execHosts of an event.  A
+	#  LazyJobFinishEvent does not create its execHosts list.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	#\param dictionary The HostDictionary used to look up host IDs.
+	#\param shared A dictionary of allocations to share the allocation with.
+	@classmethod
+	def fromEvent(cls, event, dictionary=HOSTS, shared=None):
+		return cls.fromHosts(_execHostEntries(event), dictionary, shared)
+
+	## The number of slots used on every host.
+	@property
+	def numSlots(self):
+		return sum(self.slots)
+
+	## Returns the number of hosts.
+	def __len__(self):
+		return len(self.hostIds)
+
+	## Returns the host names and the slots used on each.
+	#\param dictionary The HostDictionary the allocation was created with.
+	#\returns A list of (host, slots) tuples.
+	def items(self, dictionary=HOSTS):
+		return [(dictionary.name(h), n) for h, n in zip(self.hostIds, self.slots)]
+
+	## Returns the number of slots used on a host.
+	#\param host The name of the host.
+	#\param dictionary The HostDictionary the allocation was created with.
+	def slotsOn(self, host, dictionary=HOSTS):
+		hostId=dictionary.find(host)
+		for h, n in zip(self.hostIds, self.slots):
+			if h==hostId:
+				return n
+		return 0
+
+	## Generates the host name of each slot, in the same form as the long
+	#  execHosts list.
+	#\param dictionary The HostDictionary the allocation was created with.
+	def expand(self, dictionary=HOSTS):
+		for h, n in zip(self.hostIds, self.slots):
+			name=dictionary.name(h)
+			for i in range(n):
+				yield name
+
+	def __eq__(self, other):
+		return isinstance(other, HostAllocation) and self.hostIds==other.hostIds and self.slots==other.slots
+
+	def __ne__(self, other):
+		return not self==other
+
+	def __hash__(self):
+		return hash((self.hostIds, self.slots))
+
+	def __repr__(self):
+		return "HostAllocation(%r, %r)" % (self.hostIds, self.slots)
+
+## Adds up the busy slot seconds of each host from JOB_FINISH events, and
+#  reports how busy each host was.  The totals are kept in arrays indexed
+#  by host ID, so the memory used depends on the number of hosts, not the
+#  number of jobs or slots.  When start and end are given only the part of
+#  each job that ran between them is counted.
+#
+# Example Usage:
+#
+# The following code prints the utilization of each host for a day, where
+# every host has 16 slots.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.hosts import HostUsage
+#u=HostUsage(start=1325376000, end=1325462400)
+#u.extend(AcctFile(open('lsb.acct','rb'), lazy=True))
+#for row in u.report(16):
+#    print(row)
+#\endcode
+class HostUsage(object):
+	## Initializer is called with the period to count.
+	#\param start The start of the period in seconds since the epoch, or
+	#  None to count from the start of each job.
+	#\param end The end of the period, or None to count until the end of
+	#  each job.
+	#\param dictionary The HostDictionary used to look up host IDs.
+	def __init__(self, start=None, end=None, dictionary=HOSTS):
+		self.start=start
+		self.end=end
+		self.dictionary=dictionary
+		self._busy=array("d")
+		self._jobs=array("l")
+
+	def _grow(self, n):
+		if n>len(self._busy):
+			extra=n-len(self._busy)
+			self._busy.extend([0.0]*extra)
+			self._jobs.extend([0]*extra)
+
+	## Adds a job.  Jobs that never started, or that did not run during the
+	#  period, are ignored.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	def add(self, event):
+		start=event.startTimeEpoch
+		if start<1:
+			return
+		end=event.eventTimeEpoch
+		if self.start is not None:
+			start=max(start, self.start)
+		if self.end is not None:
+			end=min(end, self.end)
+		if end<=start:
+			return
+		self.addAllocation(HostAllocation.fromEvent(event, self.dictionary), end-start)
+
+	## Adds the slots of an allocation for a number of seconds.
+	#\param allocation A HostAllocation created with the same dictionary.
+	#\param seconds The number of seconds the slots were busy.
+	def addAllocation(self, allocation, seconds):
+		if allocation.hostIds:
+			self._grow(max(allocation.hostIds)+1)
+		busy=self._busy
+		jobs=self._jobs
+		for h, n in zip(allocation.hostIds, allocation.slots):
+			busy[h]+=n*seconds
+			jobs[h]+=1
+
+	## Adds every event from an iterable, such as an AcctFile.
+	def extend(self, events):
+		for e in events:
+			self.add(e)
+
+	## Adds the totals from another HostUsage object, for example one
+	#  calculated from another file or in another process.  Hosts are
+	#  matched by name when the objects use different dictionaries.
+	def merge(self, other):
+		if other.dictionary is self.dictionary:
+			ids=range(len(other._busy))
+		else:
+			ids=[self.dictionary.id(other.dictionary.name(h)) for h in range(len(other._busy))]
+		if ids:
+			self._grow(max(ids)+1)
+		for h, busy, jobs in zip(ids, other._busy, other._jobs):
+			self._busy[h]+=busy
+			self._jobs[h]+=jobs
+
+	## Returns the hosts that have been used by a job.
+	def hostNames(self):
+		return sorted(self.dictionary.name(h) for h in range(len(self._jobs)) if self._jobs[h])
+
+	def _get(self, values, host):
+		h=self.dictionary.find(host)
+		if h is None or h>=len(values):
+			return 0
+		return values[h]
+
+	## Returns the number of slot seconds a host was busy.
+	#\param host The name of the host.
+	def busySlotSeconds(self, host):
+		return self._get(self._busy, host)
+
+	## Returns the number of jobs that ran on a host.
+	#\param host The name of the host.
+	def numJobs(self, host):
+		return self._get(self._jobs, host)
+
+	## Returns the fraction of the slots of a host that were busy.
+	#\param host The name of the host.
+	#\param slots The number of slots the host has.
+	#\param seconds The length of the period, defaults to end-start.
+	def utilization(self, host, slots, seconds=None):
+		if seconds is None:
+			if self.start is None or self.end is None:
+				raise ValueError("The length of the period is not known")
+			seconds=self.end-self.start
+		return self.busySlotSeconds(host)/float(slots*seconds)
+
+	## Returns the usage of every host.
+	#\param slots The number of slots on each host, either a number used
+	#  for every host or a dictionary keyed on host name.
+	#\param seconds The length of the period, defaults to end-start.
+	#\returns A list of (host, jobs, busySlotSeconds, utilization) tuples
+	#  sorted by host name.  utilization is None for a host missing from
+	#  slots.
+	def report(self, slots, seconds=None):
+		rows=[]
+		for host in self.hostNames():
+			if isinstance(slots, dict):
+				n=slots.get(host)
+			else:
+				n=slots
+			rows.append((host, self.numJobs(host), self.busySlotSeconds(host),
+					self.utilization(host, n, seconds) if n else None))
+		return rows
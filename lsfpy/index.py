@@ -0,0 +1,316 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import bisect
+import io
+import os
+import struct
+from array import array
+from lsfpy.accounting import *
+from lsfpy.compressed import SPLITTABLE, CompressedFile, openAcct, pathCompression
+
+_MAGIC=b"LSFACIDX"
+## Header of the index file, the magic string, the inode of the accounting 
+#  file, the number of bytes of the accounting file that have been indexed,
+#  and the length of the index file when it was last updated.
+_HEADER=struct.Struct("<8sQQQ")
+## An index entry, the offset of the record, jobID, idx, eventTimeEpoch and
+#  the codes of userName and queue.
+_ENTRY=struct.Struct("<QqidII")
+_LENGTH=struct.Struct("<H")
+## A seek point in a compressed accounting file, the position in the 
+#  decompressed data and the offset of the member in the file.
+_POINT=struct.Struct("<QQ")
+## Position of the idx field in JOB_FINISH_TAIL.
+_IDX=[name for name, convert in JOB_FINISH_TAIL].index("idx")
+
+## An index of the JOB_FINISH records in an accounting file, stored in a 
+#  small file alongside it.  For each record the index stores the offset of
+#  the record along with its jobID, idx, eventTimeEpoch, userName and queue.
+#  Lookups find the offsets of the matching records in the index, then seek 
+#  straight to each record instead of reading the whole accounting file.
+#
+#  The index file is only ever appended to.  As the accounting file grows,
+#  update() indexes just the records added since the last update.  If the 
+#  accounting file is replaced, for example when it is rotated, the index is
+#  rebuilt.
+#
+#  A compressed accounting file is indexed by offsets in the decompressed 
+#  data.  For gzip and zstd files the index also stores a seek point at the
+#  start of each member, so a lookup only decompresses the members that 
+#  hold the records it returns, see CompressedFile.  Compressed files are
+#  not expected to grow, the index is rebuilt if one changes.
+#
+# Example Usage:
+#
+# The following code prints the run time of element 7 of job 123456.
+#\code
+#from lsfpy.index import AcctIndex
+#for i in AcctIndex('lsb.acct').byJobID(123456, 7):
+#    print(i.runTime)
+#\endcode
+class AcctIndex(object):
+	## Initializer is called with the path to the accounting file, the index 
+	#  is loaded and brought up to date.
+	#\param path The path to the accounting file.
+	#\param indexPath The path to the index file, defaults to the path of the
+	#  accounting file with .idx appended.
+	#\param eventClass The class used to create the events returned by 
+	#  lookups.
+	def __init__(self, path, indexPath=None, eventClass=JobFinishEvent):
+		self.path=path
+		self.indexPath=indexPath or path+".idx"
+		self.eventClass=eventClass
+		## The compression format of the accounting file, see compressionOf.
+		self.compression=pathCompression(path)
+		self._reset()
+		self._load()
+		self.update()
+
+	def _reset(self):
+		self.inode=0
+		self.indexedBytes=0
+		self._indexLength=_HEADER.size
+		self.offsets=array("l")
+		self.jobIDs=array("l")
+		self.idxs=array("l")
+		self.eventTimes=array("d")
+		self.userCodes=array("l")
+		self.queueCodes=array("l")
+		## The (position, offset) seek points of a compressed file.
+		self.seekPoints=[]
+		self.strings=[]
+		self._codes={}
+		self._byJobID=None
+		self._byTime=None
+		self._byCodes=None
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def _load(self):
+		if not os.path.exists(self.indexPath):
+			return
+		fh=open(self.indexPath, 'rb')
+		try:
+			header=fh.read(_HEADER.size)
+			if len(header)<_HEADER.size:
+				return
+			magic, inode, indexedBytes, indexLength=_HEADER.unpack(header)
+			if magic!=_MAGIC:
+				return
+			data=fh.read(indexLength-_HEADER.size)
+		finally:
+			fh.close()
+		self.inode=inode
+		self.indexedBytes=indexedBytes
+		self._indexLength=indexLength
+		pos=0
+		while pos<len(data):
+			kind=data[pos:pos+1]
+			pos+=1
+			if kind==b"S":
+				n=_LENGTH.unpack_from(data, pos)[0]
+				pos+=_LENGTH.size
+				self._addString(data[pos:pos+n].decode("utf-8"))
+				pos+=n
+			elif kind==b"P":
+				self.seekPoints.append(_POINT.unpack_from(data, pos))
+				pos+=_POINT.size
+			else:
+				self._addEntry(*_ENTRY.unpack_from(data, pos))
+				pos+=_ENTRY.size
+
+	def _addString(self, value):
+		self._codes[value]=len(self.strings)
+		self.strings.append(value)
+
+	def _addEntry(self, offset, jobID, idx, eventTime, userCode, queueCode):
+		self.offsets.append(offset)
+		self.jobIDs.append(jobID)
+		self.idxs.append(idx)
+		self.eventTimes.append(eventTime)
+		self.userCodes.append(userCode)
+		self.queueCodes.append(queueCode)
+
+	def _code(self, value, out):
+		try:
+			return self._codes[value]
+		except KeyError:
+			self._addString(value)
+			encoded=value.encode("utf-8")
+			out.append(b"S"+_LENGTH.pack(len(encoded))+encoded)
+			return self._codes[value]
+
+	## Indexes any records that have been added to the accounting file since 
+	#  the last update.  If the accounting file has been replaced or 
+	#  truncated, the index is rebuilt.
+	#\returns The number of records added to the index.
+	def update(self):
+		st=os.stat(self.path)
+		if st.st_ino!=self.inode or st.st_size<self.indexedBytes or (self.compression and st.st_size!=self.indexedBytes):
+			self._reset()
+			self.inode=st.st_ino
+		if st.st_size==self.indexedBytes and os.path.exists(self.indexPath):
+			return 0
+		out=[]
+		added=0
+		fh=self._open()
+		try:
+			if not self.compression:
+				fh.seek(self.indexedBytes)
+			for offset, record in readRecords(fh, partial=False):
+				if not self.compression:
+					self.indexedBytes=offset+len(record)
+				if not record.startswith(b'"JOB_FINISH"'):
+					continue
+				try:
+					row=parseRecord(record)
+					ex, tail=jobFinishOffsets(row)
+					entry=(offset, int(row[3]), int(row[tail+_IDX]), float(row[2]),
+							self._code(decodeField(row[11]), out), self._code(decodeField(row[12]), out))
+				except (ValueError, IndexError):
+					continue
+				self._addEntry(*entry)
+				out.append(b"R"+_ENTRY.pack(*entry))
+				added+=1
+			if self.compression:
+				self.indexedBytes=st.st_size
+			if self.compression in SPLITTABLE:
+				self.seekPoints=fh.raw.seekPoints()
+				out.extend(b"P"+_POINT.pack(*p) for p in self.seekPoints)
+		finally:
+			fh.close()
+		self._write(out)
+		if added:
+			self._byJobID=None
+			self._byTime=None
+			self._byCodes=None
+		return added
+
+	def _write(self, out):
+		if self._indexLength==_HEADER.size or not os.path.exists(self.indexPath):
+			fh=open(self.indexPath, 'wb')
+			self._indexLength=_HEADER.size
+		else:
+			fh=open(self.indexPath, 'r+b')
+		try:
+			# Anything after the recorded length was left by an update that
+			# did not complete.
+			fh.seek(self._indexLength)
+			fh.truncate()
+			for chunk in out:
+				fh.write(chunk)
+				self._indexLength+=len(chunk)
+			fh.flush()
+			# The header is written last, so if the update is interrupted the
+			# index still describes the entries that were completely written.
+			fh.seek(0)
+			fh.write(_HEADER.pack(_MAGIC, self.inode, self.indexedBytes, self._indexLength))
+		finally:
+			fh.close()
+
+	## Opens the accounting file, decompressing it if it is compressed.
+	def _open(self):
+		if self.compression in SPLITTABLE:
+			return io.BufferedReader(CompressedFile(open(self.path, 'rb'), self.compression,
+					self.seekPoints, closeFile=True), 256*1024)
+		return openAcct(self.path)
+
+	## Reads the events at a list of positions in the index.
+	#\param positions The positions of the entries in the index.
+	#\returns A list of events, in the order of the positions.
+	def events(self, positions):
+		positions=list(positions)
+		events=[None]*len(positions)
+		fh=self._open()
+		try:
+			# Reading in file order means a compressed file is only 
+			# decompressed forwards.
+			for i in sorted(range(len(positions)), key=lambda i: self.offsets[positions[i]]):
+				fh.seek(self.offsets[positions[i]])
+				for offset, record in readRecords(fh):
+					events[i]=self.eventClass(parseRecord(record))
+					break
+		finally:
+			fh.close()
+		return [e for e in events if e is not None]
+
+	## Returns the events for a job.
+	#\param jobID The ID of the job.
+	#\param idx The array index of the element, if None every element of the
+	#  job is returned.
+	#\returns A list of events, a job that was requeued may have more than one.
+	def byJobID(self, jobID, idx=None):
+		if self._byJobID is None:
+			self._byJobID={}
+			for p, j in enumerate(self.jobIDs):
+				self._byJobID.setdefault(j, []).append(p)
+		positions=self._byJobID.get(jobID, [])
+		if idx is not None:
+			positions=[p for p in positions if self.idxs[p]==idx]
+		return self.events(positions)
+
+	## Returns the events in a time range.
+	#\param since Return events at or after this time, either a datetime or 
+	#  seconds since the epoch.
+	#\param until Return events before this time.
+	#\returns A list of events in time order.
+	def byTime(self, since, until):
+		since=toEpoch(since)
+		until=toEpoch(until)
+		if self._byTime is None:
+			times=self.eventTimes
+			# Records are appended in time order, only sort when that is not 
+			# the case.
+			if all(a<=b for a, b in zip(times, times[1:])):
+				self._byTime=(times, None)
+			else:
+				order=sorted(range(len(times)), key=times.__getitem__)
+				self._byTime=(array("d", [times[p] for p in order]), order)
+		times, order=self._byTime
+		positions=range(bisect.bisect_left(times, since), bisect.bisect_left(times, until))
+		if order is not None:
+			positions=[order[p] for p in positions]
+		return self.events(positions)
+
+	## Returns the events with a value in a column of codes.  The positions 
+	#  of each code are found the first time the column is searched.
+	def _byCode(self, name, codes, value):
+		code=self._codes.get(value)
+		if code is None:
+			return []
+		if self._byCodes is None:
+			self._byCodes={}
+		positions=self._byCodes.get(name)
+		if positions is None:
+			positions=self._byCodes[name]={}
+			for p, c in enumerate(codes):
+				positions.setdefault(c, []).append(p)
+		return self.events(positions.get(code, []))
+
+	## Returns the events for jobs owned by a user.
+	def byUser(self, userName):
+		return self._byCode("userName", self.userCodes, userName)
+
+	## Returns the events for jobs submitted to a queue.
+	def byQueue(self, queue):
+		return self._byCode("queue", self.queueCodes, queue)
@@ -0,0 +1,240 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import mmap
+import os
+import re
+from lsfpy.accounting import *
+from lsfpy.accounting import _LazyField
+from lsfpy.compressed import compressionOf
+from lsfpy.parallel import RECORD, RECORD_START
+
+## Matches a single field, either a quoted string or a run of characters 
+#  without spaces.
+_FIELD=re.compile(br'"[^"]*(?:""[^"]*)*"|[^ "\n]+')
+
+## The fields of a record in a memory mapped accounting file.  Only the 
+#  position of each field is stored, a field is copied out of the mapping 
+#  and unquoted when it is read.  Fields are only located as far as the last
+#  field that has been read, so reading the first few fields of a record 
+#  does not look at the rest of it.  This can be used anywhere a list of 
+#  fields is expected.
+class MappedRow(object):
+	__slots__=("buffer","spans","_fields")
+
+	## Initializer is called with the buffer and the position of the record.
+	#\param buffer The memory mapped accounting file.
+	#\param start The offset of the start of the record.
+	#\param end The offset of the end of the record.
+	def __init__(self, buffer, start, end):
+		self.buffer=buffer
+		## The start and end offset of each field found so far, including 
+		#  any quotes.
+		self.spans=[]
+		self._fields=_FIELD.finditer(buffer, start, end)
+
+	## Locates fields until field i has been found, or every field if i is
+	#  None.
+	def _find(self, i):
+		spans=self.spans
+		if self._fields is None:
+			return
+		for m in self._fields:
+			spans.append(m.span())
+			if i is not None and len(spans)>i:
+				return
+		self._fields=None
+
+	def __len__(self):
+		self._find(None)
+		return len(self.spans)
+
+	def _value(self, span):
+		start, end=span
+		if self.buffer[start:start+1]==b'"':
+			return self.buffer[start+1:end-1].replace(b'""', b'"')
+		return self.buffer[start:end]
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			if i.stop is None or i.stop<0 or (i.start or 0)<0:
+				self._find(None)
+			else:
+				self._find(i.stop-1)
+			return [self._value(s) for s in self.spans[i]]
+		if i<0:
+			self._find(None)
+		elif i>=len(self.spans):
+			self._find(i)
+		return self._value(self.spans[i])
+
+def _hostOffsets(e):
+	ex=len(JOB_FINISH_HEAD)+int(e._row[len(JOB_FINISH_HEAD)-1])
+	return ex, ex+1+int(e._row[ex])
+
+## A LazyJobFinishEvent that reads its fields straight from a memory mapped 
+#  accounting file.  Fields that are never read are never copied out of the
+#  mapping, and the position of the host lists is only worked out when a 
+#  field after them is read.
+class MappedJobFinishEvent(LazyJobFinishEvent):
+	def __init__(self, row):
+		# If the first entry isn't JOB_FINISH, then its the wrong type of accounting entry
+		if not row[0]==b"JOB_FINISH":
+			raise ValueError
+		self._row=row
+
+	_ex=_LazyField("_ex", lambda e: _hostOffsets(e)[0])
+	_tail=_LazyField("_tail", lambda e: _hostOffsets(e)[1])
+
+## Reads an accounting file through a read only memory map.  The start and 
+#  end of each record, and of each field within a record, are found in the 
+#  mapped file, and fields are only copied out of the mapping when they are
+#  read.  
+#
+#  A MappedAcctFile can be limited to a byte range of the file, and events 
+#  can be read from any offset, so several worker processes can each map the
+#  same file and read their own part of it.  The operating system shares 
+#  the mapped pages between them, nothing is copied.  A compressed file 
+#  cannot be mapped.
+#
+# Example Usage:
+#
+# The following code prints out the queue for each job found.
+#\code
+#from lsfpy.mapped import MappedAcctFile
+#for i in MappedAcctFile('lsb.acct'):
+#    print(i.queue)
+#\endcode
+class MappedAcctFile(object):
+	## Initializer is called with the path to the accounting file.
+	#\param path The path to the accounting file.
+	#\param start The offset of the first record to read, this must be the
+	#  start of a record.
+	#\param end The offset to stop reading at, defaults to the end of the file.
+	#\param buffer An existing mapping of the file to share.
+	def __init__(self, path, start=0, end=None, buffer=None):
+		self.path=path
+		if buffer is None:
+			f=open(path, 'rb')
+			try:
+				if os.fstat(f.fileno()).st_size:
+					buffer=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+				else:
+					# An empty file cannot be mapped
+					buffer=b""
+			finally:
+				f.close()
+			if compressionOf(buffer[:6]):
+				raise ValueError("%s is compressed and cannot be mapped, use AcctFile or ParallelAcctFile" % path)
+		## The memory mapped file.
+		self.buffer=buffer
+		self.start=start
+		if end is None:
+			end=len(buffer)
+		self.end=end
+
+	## Returns a MappedAcctFile that reads a byte range of the same mapping.
+	#\param start The offset of the first record in the range.
+	#\param end The offset to stop reading at.
+	def slice(self, start, end):
+		return MappedAcctFile(self.path, start, end, self.buffer)
+
+	## Finds the offset of the first record that starts at or after offset.
+	def recordStart(self, offset):
+		if offset<=0:
+			return 0
+		m=RECORD_START.search(self.buffer, offset-1)
+		if m:
+			return m.start()+1
+		return len(self.buffer)
+
+	## Splits the mapped range into byte ranges that start on record 
+	#  boundaries.
+	#\param count The number of ranges.
+	#\returns A list of (start, end) tuples.
+	def ranges(self, count):
+		size=self.end-self.start
+		bounds=[self.start]
+		for i in range(1, count):
+			b=max(self.recordStart(self.start+size*i//count), bounds[-1])
+			bounds.append(min(b, self.end))
+		bounds.append(self.end)
+		return [(s, e) for s, e in zip(bounds[:-1], bounds[1:]) if s<e]
+
+	## Returns the end of the record at an offset, or None if there is no
+	#  complete record.  The last record before end does not need to end 
+	#  with a newline, as long as it has no unclosed quote.
+	def _recordEnd(self, pos, end):
+		m=RECORD.match(self.buffer, pos, end)
+		if m is not None:
+			return m.end()
+		if self.recordStart(pos+1)>=end and not self.buffer[pos:end].count(b'"')%2:
+			return end
+		return None
+
+	## Finds the complete records in the mapped range.  A record at the end 
+	#  of the range with a quote that is never closed, such as one that is
+	#  still being written, is not returned.
+	#\returns A generator of (start, end) tuples, end includes the newline
+	#  if there is one.
+	def records(self):
+		pos=self.start
+		end=self.end
+		while pos<end:
+			recordEnd=self._recordEnd(pos, end)
+			if recordEnd is None:
+				# A quote that is never closed, either a record that is still 
+				# being written, or a corrupt record.  Move on to the next 
+				# record if there is one.
+				pos=self.recordStart(pos+1)
+				continue
+			yield pos, recordEnd
+			pos=recordEnd
+
+	## Returns the fields of the record at an offset.
+	#\param start The offset of the start of the record.
+	#\param end The offset of the end of the record, if None it is found.
+	#\returns A MappedRow object.
+	def row(self, start, end=None):
+		if end is None:
+			end=self._recordEnd(start, len(self.buffer))
+			if end is None:
+				raise ValueError("No complete record at offset %d" % start)
+		return MappedRow(self.buffer, start, end)
+
+	## Returns the event for the JOB_FINISH record at an offset.
+	def eventAt(self, offset):
+		return MappedJobFinishEvent(self.row(offset))
+
+	def __iter__(self):
+		buffer=self.buffer
+		for start, end in self.records():
+			if buffer[start:start+12]!=b'"JOB_FINISH"':
+				continue
+			try:
+				yield MappedJobFinishEvent(MappedRow(buffer, start, end))
+			except (ValueError, IndexError):
+				continue
+
+	## Unmaps the file.
+	def close(self):
+		if isinstance(self.buffer, mmap.mmap):
+			self.buffer.close()
@@ -0,0 +1,337 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import io
+import os
+import re
+from collections import deque
+from multiprocessing import Pool
+from lsfpy.accounting import AcctFile, JobFinishEvent, LazyJobFinishEvent
+from lsfpy.compressed import SPLITTABLE, CompressedFile, decompressRange, hasMembers, openAcct, pathCompression
+
+## Matches the start of a record, a newline followed by the quoted event 
+#  type.  Inside a quoted field every double quote is logged twice, so this 
+#  can never match a newline embedded in a field such as the job command.
+RECORD_START=re.compile(br'\n"[A-Z][A-Z_]*" ')
+## Matches a complete record, any mix of quoted strings, which can contain 
+#  newlines, and other characters up to the newline that ends the record.
+RECORD=re.compile(br'[^"\n]*(?:"[^"]*"[^"\n]*)*\n')
+
+## Finds the offset of the first record that starts at or after offset.
+#\param fh A file object opened in binary mode on the accounting file.
+#\param offset The byte offset to start searching from.
+#\param size The size of the file.
+#\returns The byte offset of the start of the record, or size if there are no
+#  more records.
+def recordStart(fh, offset, size):
+	if offset<=0:
+		return 0
+	if offset>=size:
+		return size
+	# Start on the byte before the offset so a record that starts exactly at
+	# the offset is found.
+	base=offset-1
+	fh.seek(base)
+	data=b""
+	while True:
+		block=fh.read(65536)
+		if not block:
+			return size
+		searchFrom=max(0, len(data)-64)
+		data+=block
+		m=RECORD_START.search(data, searchFrom)
+		if m:
+			return base+m.start()+1
+
+## Finds the offset of the last complete record in a file.  A last record
+#  that does not end with a newline, such as one mbatchd is still writing, 
+#  is skipped and the record before it is returned.
+#\param fh A file object opened in binary mode on the accounting file.
+#\param size The size of the file.
+#\returns The byte offset of the start of the last record, or None if the file
+#  has no complete record.
+def lastRecordStart(fh, size):
+	if size==0:
+		return None
+	fh.seek(size-1)
+	if fh.read(1)!=b"\n":
+		size=_lastRecordStart(fh, size)
+		if not size:
+			return None
+	return _lastRecordStart(fh, size)
+
+## Finds the offset of the last record that starts before size.
+def _lastRecordStart(fh, size):
+	pos=size
+	data=b""
+	while pos>0:
+		step=min(65536, pos)
+		pos-=step
+		fh.seek(pos)
+		data=fh.read(step)+data
+		matches=[m.start() for m in RECORD_START.finditer(data)]
+		if matches:
+			return pos+matches[-1]+1
+	return 0
+
+## Accounting files compress to less than an eighth of their size, each task
+#  reading a compressed file decompresses chunkSize/_RATIO bytes of it.
+_RATIO=8
+
+## Finds the start of the last record in some data.
+#\param data Bytes read from an accounting file.
+#\returns The offset of the start of the last record, or 0 if no record 
+#  starts after the first byte.
+def _lastStart(data):
+	i=len(data)
+	while True:
+		i=data.rfind(b'\n"', 0, i)
+		if i<0:
+			return 0
+		if RECORD_START.match(data, i):
+			return i+1
+
+## Splits an accounting file into byte ranges that each start and end on a 
+#  record boundary.
+#\param path The path to the accounting file.
+#\param chunkSize The approximate size of each range in bytes.
+#\returns A list of (start, end) tuples in file order.
+def chunkRanges(path, chunkSize=64*1024*1024):
+	size=os.path.getsize(path)
+	fh=open(path, 'rb')
+	try:
+		bounds=[]
+		for offset in range(0, size, chunkSize):
+			b=recordStart(fh, offset, size)
+			if not bounds or b>bounds[-1]:
+				bounds.append(b)
+	finally:
+		fh.close()
+	if not bounds or bounds[-1]<size:
+		bounds.append(size)
+	return list(zip(bounds[:-1], bounds[1:]))
+
+## Parses the records in a byte range of an accounting file.
+#\param path The path to the accounting file.
+#\param start The offset of the first byte of the range, this must be the 
+#  start of a record.
+#\param end The offset after the last byte of the range.
+#\param eventClass The class used to create an event from each JOB_FINISH row.
+#\returns A list of events.
+def parseRange(path, start, end, eventClass=JobFinishEvent):
+	fh=open(path, 'rb')
+	try:
+		fh.seek(start)
+		data=fh.read(end-start)
+	finally:
+		fh.close()
+	return list(AcctFile(io.BytesIO(data), eventClass=eventClass))
+
+def _parseChunk(args):
+	path, start, end, eventClass, func=args
+	events=parseRange(path, start, end, eventClass)
+	if func is None:
+		return events
+	return func(events)
+
+def _parseBlock(args):
+	data, eventClass, func=args
+	events=list(AcctFile(io.BytesIO(data), eventClass=eventClass))
+	if func is None:
+		return events
+	return func(events)
+
+## Decompresses and parses the members of a compressed accounting file that
+#  start in a byte range.  Members do not start on record boundaries, so the
+#  data before the first record that starts in the range, and the last 
+#  record, which may continue in the next range, are returned unparsed.
+#\returns A tuple of (first, last, head, result, tail, found), first and 
+#  last are from decompressRange, found is False if no record starts in the 
+#  range, when head holds all of the data.
+def _parseMembers(args):
+	path, compression, start, end, eventClass, func=args
+	first, last, data=decompressRange(path, compression, start, end)
+	if start==0:
+		begin=0
+	else:
+		m=RECORD_START.search(data)
+		if m is None:
+			return (first, last, data, None, b"", False)
+		begin=m.start()+1
+	tail=max(begin, _lastStart(data))
+	return (first, last, data[:begin], _parseBlock((data[begin:tail], eventClass, func)), data[tail:], True)
+
+## Parses a single accounting file using a pool of processes.  The file is 
+#  split into byte ranges that start on record boundaries, and each range is
+#  parsed by a separate process.  
+#
+#  Iterating over the object returns the events in the same order as they are
+#  in the file, the same as AcctFile.  Every event is sent back from the 
+#  worker processes, so when only totals are needed it is much faster to use
+#  reduce(), this only sends back the result for each range.
+#
+#  Functions passed to reduce() are sent to the worker processes, so they must
+#  be defined at the top level of a module.
+#
+#  A compressed file is detected from its first bytes.  A gzip or zstd file
+#  made of many members, see CompressedFile, is split into byte ranges of
+#  members, and each process decompresses and parses its own ranges.  Other
+#  compressed files are decompressed by this process and parsed by the 
+#  pool.
+#
+# Example Usage:
+#
+# The following code counts the jobs in each queue using every core.
+#\code
+#from lsfpy.parallel import ParallelAcctFile
+#def countQueues(events):
+#    counts={}
+#    for e in events:
+#        counts[e.queue]=counts.get(e.queue,0)+1
+#    return counts
+#def mergeCounts(a, b):
+#    for k, v in b.items():
+#        a[k]=a.get(k,0)+v
+#    return a
+#print(ParallelAcctFile('lsb.acct').reduce(countQueues, mergeCounts, {}))
+#\endcode
+class ParallelAcctFile(object):
+	## Initializer is called with the path to the accounting file.
+	#\param path The path to the accounting file.
+	#\param processes The number of worker processes, defaults to the number 
+	#  of CPUs.
+	#\param chunkSize The approximate number of bytes parsed by each task.
+	#\param lazy If True, create LazyJobFinishEvent objects.
+	#\param eventClass The class used to create an event from each JOB_FINISH
+	#  row.  This overrides lazy.
+	def __init__(self, path, processes=None, chunkSize=64*1024*1024, lazy=False, eventClass=None):
+		self.path=path
+		self.processes=processes
+		self.chunkSize=chunkSize
+		if eventClass:
+			self.eventClass=eventClass
+		elif lazy:
+			self.eventClass=LazyJobFinishEvent
+		else:
+			self.eventClass=JobFinishEvent
+
+	def _map(self, func):
+		compression=pathCompression(self.path)
+		pool=Pool(self.processes)
+		try:
+			if compression is None:
+				tasks=[(self.path, start, end, self.eventClass, func) for start, end in chunkRanges(self.path, self.chunkSize)]
+				results=pool.imap(_parseChunk, tasks)
+			elif compression in SPLITTABLE and hasMembers(self.path, compression, max(2, self.chunkSize//_RATIO)):
+				results=self._members(pool, func, compression)
+			else:
+				results=self._blocks(pool, func, openAcct(self.path), b"")
+			for result in results:
+				yield result
+			pool.close()
+		except:
+			pool.terminate()
+			raise
+		finally:
+			pool.join()
+
+	## Reads a decompressed file in blocks that end on record boundaries, and
+	#  parses them in the pool.  Only a few blocks are waiting to be parsed at
+	#  a time, so the whole file is never held in memory.
+	#\param fh A file object that reads the decompressed data, it is closed
+	#  at the end.
+	#\param carry Data before the first byte read from fh.
+	def _blocks(self, pool, func, fh, carry):
+		pending=deque()
+		window=2*(self.processes or os.cpu_count() or 1)
+		try:
+			while True:
+				data=fh.read(self.chunkSize)
+				if not data:
+					break
+				data=carry+data
+				end=_lastStart(data)
+				carry=data[end:]
+				if end:
+					pending.append(pool.apply_async(_parseBlock, ((data[:end], self.eventClass, func),)))
+				while len(pending)>=window:
+					yield pending.popleft().get()
+		finally:
+			fh.close()
+		if carry:
+			pending.append(pool.apply_async(_parseBlock, ((carry, self.eventClass, func),)))
+		while pending:
+			yield pending.popleft().get()
+
+	## Decompresses and parses byte ranges of a gzip or zstd file in the pool,
+	#  and parses the records that cross from one range to the next.  Every 
+	#  range must start with the member the one before it ended at, a range 
+	#  that does not, because a member was not recognized, means the rest of
+	#  the file is read in order.
+	def _members(self, pool, func, compression):
+		size=os.path.getsize(self.path)
+		step=max(2, self.chunkSize//_RATIO)
+		tasks=[(self.path, compression, start, min(size, start+step), self.eventClass, func) for start in range(0, size, step)]
+		offset=0
+		carry=b""
+		for first, last, head, result, tail, found in pool.imap(_parseMembers, tasks):
+			if first is None and last<=offset:
+				# The range is inside a member an earlier range read
+				continue
+			if first!=offset:
+				fh=io.BufferedReader(CompressedFile(open(self.path, 'rb'), compression, start=offset, closeFile=True))
+				for result in self._blocks(pool, func, fh, carry):
+					yield result
+				return
+			offset=last
+			carry+=head
+			if not found:
+				continue
+			if carry:
+				yield _parseBlock((carry, self.eventClass, func))
+			yield result
+			carry=tail
+		if carry:
+			yield _parseBlock((carry, self.eventClass, func))
+
+	def __iter__(self):
+		for events in self._map(None):
+			for e in events:
+				yield e
+
+	## Applies a function to the events of each byte range in the worker 
+	#  processes, and combines the results.
+	#\param func Function called with the list of events in a range, returns
+	#  the partial result for the range.
+	#\param merge Function called with the combined result so far and the 
+	#  partial result of the next range, returns the new combined result. 
+	#  Ranges are merged in file order.
+	#\param initial The initial combined result, if None the partial result of
+	#  the first range is used.
+	#\returns The combined result.
+	def reduce(self, func, merge, initial=None):
+		result=initial
+		for partial in self._map(func):
+			if result is None:
+				result=partial
+			else:
+				result=merge(result, partial)
+		return result
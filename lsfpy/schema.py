@@ -0,0 +1,168 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import datetime
+from lsfpy.accounting import JOB_FINISH_HEAD, JOB_FINISH_TAIL, decodeField, fromEpoch
+from lsfpy.events import compileLayout, field, listOf, versionKey
+
+## Fields of a JOB_FINISH record logged by LSF 6.x, the fields read by 
+#  JobFinishEvent.
+JOB_FINISH_BASE=tuple(
+		[field(name, convert) for name, convert in JOB_FINISH_HEAD]+
+		[listOf("askedHosts", "numAskedHosts"), field("numExHosts", int), listOf("execHosts", "numExHosts")]+
+		[field(name, convert) for name, convert in JOB_FINISH_TAIL])
+
+## Fields added in LSF 7.0.
+JOB_FINISH_7_0=(
+		field("app"),
+		field("postExecCmd"),
+		field("runtimeEstimation", int),
+		field("jgroup"),
+		field("options2", int),
+		field("requeueEValues"),
+		field("notifyCmd"),
+		field("lastResizeTime", float),
+		field("jobDescription"),
+		)
+
+## Fields added in LSF 7.0 update 6.  Each entry of submitEXT is a (key, 
+#  value) tuple, and each entry of hostRusage is a (hostname, mem, swap, 
+#  utime, stime) tuple.
+JOB_FINISH_7_06=(
+		field("numSubmitEXT", int),
+		listOf("submitEXT", "numSubmitEXT", width=2),
+		field("numHostRusage", int),
+		listOf("hostRusage", "numHostRusage", width=5),
+		)
+
+## Fields added in LSF 8.0.  The logged run time is stored as 
+#  loggedRunTime, as runTime is calculated from the start and event times.
+JOB_FINISH_8_0=(
+		field("options3", int),
+		field("runLimit", int),
+		field("avgMem", int),
+		field("effectiveResReq"),
+		field("srcCluster"),
+		field("srcJobId", int),
+		field("dstCluster"),
+		field("dstJobId", int),
+		field("forwardTime", float),
+		field("flowId", int),
+		field("acJobWaitTime", int),
+		field("totalProvisionTime", int),
+		field("outdir"),
+		field("loggedRunTime", int),
+		field("subcwd"),
+		)
+
+## Fields added in LSF 9.1.  Each entry of networks is a (networkID, 
+#  num_window) tuple, and each entry of indexRanges is a (start, end, step)
+#  tuple.
+JOB_FINISH_9_1=(
+		field("numNetworks", int),
+		listOf("networks", "numNetworks", width=2),
+		field("affinity"),
+		field("serialJobEnergy", float),
+		field("cpi", float),
+		field("gips", int),
+		field("gbs", int),
+		field("gflops", int),
+		field("numAllocSlots", int),
+		listOf("allocSlots", "numAllocSlots"),
+		field("ineligiblePendTime", int),
+		field("indexRangeCnt", int),
+		listOf("indexRanges", "indexRangeCnt", width=3),
+		)
+
+## Fields added in LSF 10.1.
+JOB_FINISH_10_1=(
+		field("requeueTime", float),
+		)
+
+## The fields of a JOB_FINISH record logged by each version of LSF.  A record
+#  uses the layout of the newest version that is not newer than the version 
+#  logged in the record.  To support a new version, add its layout here.
+JOB_FINISH_SCHEMA=(
+		("6.0", JOB_FINISH_BASE),
+		("7.0", JOB_FINISH_BASE+JOB_FINISH_7_0),
+		("7.06", JOB_FINISH_BASE+JOB_FINISH_7_0+JOB_FINISH_7_06),
+		("8.0", JOB_FINISH_BASE+JOB_FINISH_7_0+JOB_FINISH_7_06+JOB_FINISH_8_0),
+		("9.1", JOB_FINISH_BASE+JOB_FINISH_7_0+JOB_FINISH_7_06+JOB_FINISH_8_0+JOB_FINISH_9_1),
+		("10.1", JOB_FINISH_BASE+JOB_FINISH_7_0+JOB_FINISH_7_06+JOB_FINISH_8_0+JOB_FINISH_9_1+JOB_FINISH_10_1),
+		)
+
+## Decoders compiled for each version string seen so far.
+_decoders={}
+
+## Returns the compiled decoder for the JOB_FINISH records of a version.
+#\param version The version logged in the record, for example "7.06".
+def jobFinishDecoder(version):
+	try:
+		return _decoders[version]
+	except KeyError:
+		pass
+	logged=versionKey(decodeField(version))
+	fields=JOB_FINISH_SCHEMA[0][1]
+	for v, f in JOB_FINISH_SCHEMA:
+		if versionKey(v)<=logged:
+			fields=f
+	d=_decoders[version]=compileLayout(fields, len(JOB_FINISH_BASE))
+	return d
+
+## A JOB_FINISH event that reads every field logged by the version of LSF 
+#  that wrote the record, as described by JOB_FINISH_SCHEMA.  It provides 
+#  the same attributes as JobFinishEvent, plus the fields added in later 
+#  versions of LSF, such as app, jobDescription and hostRusage.  Fields that
+#  were not logged are None.
+#
+#  Each version has its own decoder that is compiled the first time a record
+#  of that version is read, so a file that contains records from several 
+#  versions, for example after an upgrade, is parsed as quickly as a file 
+#  from a single version.
+class VersionedJobFinishEvent(object):
+	def __init__(self, row=[]):
+		# If the first entry isn't JOB_FINISH, then its the wrong type of accounting entry
+		if not decodeField(row[0])=="JOB_FINISH":
+			raise ValueError
+		try:
+			decode=_decoders[row[1]]
+		except KeyError:
+			decode=jobFinishDecoder(row[1])
+		decode(self, row)
+		self.eventTime=fromEpoch(self.eventTimeEpoch)
+		self.submitTime=fromEpoch(self.submitTimeEpoch)
+		self.beginTime=fromEpoch(self.beginTimeEpoch)
+		self.termTime=fromEpoch(self.termTimeEpoch)
+		if self.startTimeEpoch<1:
+			# Job never started
+			self.startTime=self.termTime
+			self.runTime=datetime.timedelta(0)
+			self.waitTime=self.eventTime-self.submitTime
+		else:
+			self.startTime=fromEpoch(self.startTimeEpoch)
+			self.runTime=self.eventTime-self.startTime
+			self.waitTime=self.startTime-self.submitTime
+		self.pendTime=self.waitTime
+
+for _v, _fields in JOB_FINISH_SCHEMA:
+	for _f in _fields:
+		if not hasattr(VersionedJobFinishEvent, _f[1]):
+			setattr(VersionedJobFinishEvent, _f[1], None)
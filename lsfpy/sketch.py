@@ -0,0 +1,303 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+import base64
+import hashlib
+import heapq
+import math
+import struct
+
+## Estimates quantiles of a stream of numbers using a merging t-digest.  
+#  Values are summarised by centroids, a mean and a weight, which are small 
+#  near the ends of the distribution and larger in the middle, so extreme 
+#  quantiles such as the 99th percentile stay accurate.  The number of 
+#  centroids depends on the compression and not on how many values are added.
+#
+#  Digests built from different files or processes can be combined with 
+#  merge(), and saved with toDict() and restored with fromDict().
+class TDigest(object):
+	## Initializer is called with the compression.
+	#\param compression Higher values use more centroids and are more 
+	#  accurate.
+	def __init__(self, compression=100):
+		self.compression=compression
+		## The centroids as a sorted list of (mean, weight) tuples.
+		self.centroids=[]
+		## The total weight of the values added.
+		self.count=0.0
+		self.min=None
+		self.max=None
+		self._buffer=[]
+
+	## Adds a value.
+	#\param value The value to add.
+	#\param weight The number of times to add it.
+	def add(self, value, weight=1):
+		self._buffer.append((value, weight))
+		self.count+=weight
+		if self.min is None or value<self.min:
+			self.min=value
+		if self.max is None or value>self.max:
+			self.max=value
+		if len(self._buffer)>=self.compression*5:
+			self._compress()
+
+	def _k(self, q):
+		return self.compression/(2*math.pi)*math.asin(2*q-1)
+
+	def _limit(self, k):
+		return (math.sin(min(k, self.compression/4.0)*2*math.pi/self.compression)+1)/2
+
+	def _compress(self):
+		if not self._buffer:
+			return
+		points=sorted(self.centroids+self._buffer)
+		self._buffer=[]
+		centroids=[]
+		mean, weight=points[0]
+		done=0.0
+		limit=self._limit(self._k(0)+1)*self.count
+		for m, w in points[1:]:
+			if done+weight+w<=limit:
+				mean+=(m-mean)*w/(weight+w)
+				weight+=w
+			else:
+				centroids.append((mean, weight))
+				done+=weight
+				limit=self._limit(self._k(done/self.count)+1)*self.count
+				mean, weight=m, w
+		centroids.append((mean, weight))
+		self.centroids=centroids
+
+	## Adds the values of another digest to this one.
+	def merge(self, other):
+		other._compress()
+		if not other.count:
+			return
+		self._buffer.extend(other.centroids)
+		self.count+=other.count
+		if self.min is None or other.min<self.min:
+			self.min=other.min
+		if self.max is None or other.max>self.max:
+			self.max=other.max
+		self._compress()
+
+	## Returns an estimate of a quantile.
+	#\param q The quantile as a fraction, for example 0.95.
+	#\returns The estimate, or None if no values have been added.
+	def quantile(self, q):
+		self._compress()
+		if not self.centroids:
+			return None
+		target=q*self.count
+		# Interpolate between the centres of the centroids, using the min 
+		# and max values at the ends.
+		lastCenter, lastMean=0.0, self.min
+		seen=0.0
+		for mean, weight in self.centroids:
+			center=seen+weight/2.0
+			if target<center:
+				if center==lastCenter:
+					return mean
+				return lastMean+(mean-lastMean)*(target-lastCenter)/(center-lastCenter)
+			lastCenter, lastMean=center, mean
+			seen+=weight
+		if self.count==lastCenter:
+			return self.max
+		return lastMean+(self.max-lastMean)*(target-lastCenter)/(self.count-lastCenter)
+
+	## Returns the digest as a dictionary that can be saved as JSON.
+	def toDict(self):
+		self._compress()
+		return {"compression":self.compression, "min":self.min, "max":self.max,
+				"centroids":[list(c) for c in self.centroids]}
+
+	## Creates a digest from a dictionary returned by toDict().
+	@classmethod
+	def fromDict(cls, d):
+		t=cls(d["compression"])
+		t.centroids=[tuple(c) for c in d["centroids"]]
+		t.count=float(sum(w for m, w in t.centroids))
+		t.min=d["min"]
+		t.max=d["max"]
+		return t
+
+def _bytes(value):
+	if isinstance(value, bytes):
+		return value
+	if not isinstance(value, type(u"")):
+		value=u"%s" % (value,)
+	return value.encode("utf-8")
+
+## Estimates the number of distinct values in a stream using HyperLogLog.  
+#  The memory used is 2**precision bytes whatever the number of values, and 
+#  the standard error of the estimate is about 1.04/sqrt(2**precision), 1.6%
+#  for the default precision.  Two sketches with the same precision can be 
+#  merged, giving the number of distinct values in either.
+class HyperLogLog(object):
+	## Initializer is called with the precision.
+	#\param precision The number of bits used to choose a register, from 4 
+	#  to 16.
+	def __init__(self, precision=12):
+		if not 4<=precision<=16:
+			raise ValueError("precision must be between 4 and 16")
+		self.precision=precision
+		self.registers=bytearray(1<<precision)
+
+	## Adds a value.
+	#\param value A string, or any value that can be converted to a string.
+	def add(self, value):
+		h=struct.unpack("<Q", hashlib.sha1(_bytes(value)).digest()[:8])[0]
+		bits=64-self.precision
+		i=h>>bits
+		rank=bits-(h&((1<<bits)-1)).bit_length()+1
+		if rank>self.registers[i]:
+			self.registers[i]=rank
+
+	## Adds the values of another sketch to this one.
+	def merge(self, other):
+		if other.precision!=self.precision:
+			raise ValueError("cannot merge sketches with different precision")
+		self.registers=bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+	## Returns the estimated number of distinct values.
+	def count(self):
+		m=len(self.registers)
+		alpha=0.7213/(1+1.079/m)
+		estimate=alpha*m*m/sum(2.0**-r for r in self.registers)
+		zeros=self.registers.count(b"\0")
+		if estimate<=2.5*m and zeros:
+			# Linear counting is more accurate for small numbers of values
+			estimate=m*math.log(float(m)/zeros)
+		return int(round(estimate))
+
+	## Returns the sketch as a dictionary that can be saved as JSON.
+	def toDict(self):
+		return {"precision":self.precision, 
+				"registers":base64.b64encode(bytes(self.registers)).decode("ascii")}
+
+	## Creates a sketch from a dictionary returned by toDict().
+	@classmethod
+	def fromDict(cls, d):
+		h=cls(d["precision"])
+		h.registers=bytearray(base64.b64decode(d["registers"]))
+		return h
+
+## Finds the most frequent values in a stream using the Space Saving 
+#  algorithm.  At most k values are counted, when a new value is seen and 
+#  there is no room, the value with the lowest count is replaced and the new 
+#  value starts from that count.  Any value that makes up more than 1/k of 
+#  the total is guaranteed to be kept, and each count is too high by at most 
+#  the error recorded with it.  Sketches are merged as described by Agarwal 
+#  et al, "Mergeable Summaries".
+#
+#  The counted values are also kept in a heap on their count, so the value 
+#  with the lowest count is found in O(log k) time.  A count in the heap is 
+#  only brought up to date when the value reaches the top of the heap, so 
+#  adding to a value that is already counted does not touch the heap.
+class SpaceSaving(object):
+	## Initializer is called with the number of values to count.
+	#\param k The number of values to count.
+	def __init__(self, k=100):
+		self.k=k
+		## The count and error of each value, keyed on the value.
+		self.counters={}
+		self._heap=[]
+		self._seq=0
+
+	## Rebuilds the heap after the counters have been replaced.
+	def _heapify(self):
+		self._heap=[(c[0], i, v) for i, (v, c) in enumerate(self.counters.items())]
+		heapq.heapify(self._heap)
+		self._seq=len(self._heap)
+
+	## Returns a heap entry for a value, the sequence number stops values 
+	#  from being compared when counts are equal.
+	def _entry(self, value, count):
+		self._seq+=1
+		return (count, self._seq, value)
+
+	## Returns the value with the lowest count, bringing the counts at the 
+	#  top of the heap up to date.
+	def _smallest(self):
+		heap=self._heap
+		while True:
+			count, seq, value=heap[0]
+			current=self.counters[value][0]
+			if current==count:
+				return value
+			heapq.heapreplace(heap, self._entry(value, current))
+
+	## Adds a value.
+	#\param value The value.
+	#\param weight The amount to add to its count, for example the cpu time 
+	#  of a job to find the heaviest users.
+	def add(self, value, weight=1):
+		try:
+			self.counters[value][0]+=weight
+			return
+		except KeyError:
+			pass
+		if len(self.counters)<self.k:
+			self.counters[value]=[weight, 0]
+			heapq.heappush(self._heap, self._entry(value, weight))
+			return
+		smallest=self._smallest()
+		count=self.counters.pop(smallest)[0]
+		self.counters[value]=[count+weight, count]
+		heapq.heapreplace(self._heap, self._entry(value, count+weight))
+
+	def _floor(self):
+		if len(self.counters)<self.k:
+			return 0
+		return self.counters[self._smallest()][0]
+
+	## Adds the values of another sketch to this one.
+	def merge(self, other):
+		mine=self._floor()
+		theirs=other._floor()
+		counters={}
+		for value in set(self.counters)|set(other.counters):
+			a=self.counters.get(value, [mine, mine])
+			b=other.counters.get(value, [theirs, theirs])
+			counters[value]=[a[0]+b[0], a[1]+b[1]]
+		top=sorted(counters.items(), key=lambda i: -i[1][0])[:self.k]
+		self.counters=dict(top)
+		self._heapify()
+
+	## Returns the most frequent values.
+	#\param n The number of values to return, defaults to all of them.
+	#\returns A list of (value, count, error) tuples, most frequent first.
+	def top(self, n=None):
+		items=sorted(self.counters.items(), key=lambda i: -i[1][0])[:n]
+		return [(v, c[0], c[1]) for v, c in items]
+
+	## Returns the sketch as a dictionary that can be saved as JSON.
+	def toDict(self):
+		return {"k":self.k, "counters":[[v, c[0], c[1]] for v, c in self.counters.items()]}
+
+	## Creates a sketch from a dictionary returned by toDict().
+	@classmethod
+	def fromDict(cls, d):
+		s=cls(d["k"])
+		s.counters=dict((v, [c, e]) for v, c, e in d["counters"])
+		s._heapify()
+		return s
@@ -17,13 +17,206 @@
 #
 # Copyright 2011 David Irvine
 #
-from lsfpy import JobFinishEvent
+import csv
+import datetime
+import io
+import unittest
+from lsfpy.accounting import *
+
+## A JOB_FINISH record for a job that ran on two hosts.
+FINISHED='"JOB_FINISH" "7.06" 1325376000 1234 500 33554450 2 1325372000 0 0 1325372400 "alice" "normal" "" "" "" "submithost" "/home/alice" "" "/dev/null" "" "1325372000.1234" 1 "hostA" 2 "hostA" "hostB" 64 100.00 "myjob" "sleep 10" 1.500000 0.250000 2048 0 0 0 0 100 0 0 0 0 0 0 0 0 10 5 -1 "" "default" 0 2 "/bin/sh" "" 0 4096 8192 "" "" "" "" 0 "" 0 "" "" "/dept/alice" ""'
+
+## A JOB_FINISH record for a job that was killed before it started.
+NEVER_STARTED='"JOB_FINISH" "7.06" 1325376000 1235 500 33554450 1 1325372000 0 0 0 "bob" "short" "" "" "" "submithost" "/home/bob" "" "/dev/null" "" "1325372000.1235" 0 0 32 0.00 "myjob" "sleep 10" -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 "" "default" 130 1 "" "" 0 0 0 "" "" "" "" 0 "" 14 "" "" "/dept/bob" ""'
+
+def parse(line):
+	return next(csv.reader([line],delimiter=' ', quotechar='"'))
 
 class TestBasic(unittest.TestCase):
 	def test_invalid_row(self):
-		j=JobFinishEvent()
 		with self.assertRaises(ValueError):
-			j.fromRow([Foo,Bar,Baz])
+			JobFinishEvent(["Foo","Bar","Baz"])
+
+	def test_finished(self):
+		j=JobFinishEvent(parse(FINISHED))
+		self.assertEqual(j.jobID,1234)
+		self.assertEqual(j.queue,"normal")
+		self.assertEqual(j.askedHosts,["hostA"])
+		self.assertEqual(j.execHosts,["hostA","hostB"])
+		self.assertEqual(j.runTime,datetime.timedelta(seconds=3600))
+		self.assertEqual(j.waitTime,datetime.timedelta(seconds=400))
+		self.assertEqual(j.chargedSAAP,"/dept/alice")
+
+class TestRecords(unittest.TestCase):
+	def test_multiline(self):
+		data=b'"A" "1" 2 "x\ny"\n"B" "1" 3\n'
+		records=list(readRecords(io.BytesIO(data)))
+		self.assertEqual(records,[(0,b'"A" "1" 2 "x\ny"\n'),(16,b'"B" "1" 3\n')])
+		self.assertEqual(parseRecord(records[0][1]),[b"A",b"1",b"2",b"x\ny"])
+		self.assertEqual(parseRecord(records[0][1].decode("ascii")),["A","1","2","x\ny"])
+
+	def test_split_quotes(self):
+		self.assertEqual(splitRecord(b'"A" "say ""hi""" "" 12\n'),[b"A",b'say "hi"',b"",b"12"])
+		self.assertEqual(splitRecord(b'"""a" 1 2 "b"'),[b'"a',b"1",b"2",b"b"])
+
+	def test_decode(self):
+		self.assertEqual(decodeField("caf\xe9"),"caf\xe9")
+		self.assertEqual(decodeField("caf\xe9".encode("utf-8")),"caf\xe9")
+		# Not valid UTF-8, every byte is kept
+		self.assertEqual(decodeField("caf\xe9".encode("latin-1")),"caf\xe9")
+		self.assertEqual(decodeRow([b"a", "caf\xe9".encode("utf-8")]),["a","caf\xe9"])
+		self.assertEqual(decodeRow([b"a", "caf\xe9".encode("latin-1")]),["a","caf\xe9"])
+
+	def test_binary_matches_text(self):
+		data=(FINISHED+"\n"+NEVER_STARTED.replace('"bob"','"b\xf6b"')+"\n").encode("utf-8")
+		text=list(AcctFile(io.StringIO(data.decode("utf-8"))))
+		for lazy in (False, True):
+			binary=list(AcctFile(io.BytesIO(data), lazy=lazy))
+			self.assertEqual([(j.userName, j.execHosts, j.command, j.termInfo.number) for j in binary],
+					[(j.userName, j.execHosts, j.command, j.termInfo.number) for j in text])
+		self.assertEqual(binary[1].userName,"b\xf6b")
+
+	def test_partial(self):
+		fh=io.BytesIO(b'"A" "1" 2\n"B" "1" "x\n')
+		self.assertEqual(len(list(readRecords(fh, partial=False))),1)
+		self.assertEqual(fh.tell(),10)
+		fh=io.BytesIO(b'"A" "1" 2\n"B" "1" 3')
+		self.assertEqual(list(readRecords(fh)),[(0,b'"A" "1" 2\n'),(10,b'"B" "1" 3')])
+
+	def test_no_final_newline(self):
+		data="\n".join(FINISHED.replace(" 1234 "," %d " % i,1) for i in range(5))
+		self.assertEqual(len(list(AcctFile(io.StringIO(data)))),5)
+		for lazy in (False, True):
+			self.assertEqual([j.jobID for j in AcctFile(io.BytesIO(data.encode("utf-8")), lazy=lazy)],list(range(5)))
+		stats=ParseStats()
+		self.assertEqual(len(list(AcctFile(io.BytesIO(data.encode("utf-8")), stats=stats))),5)
+		self.assertEqual(stats.records,5)
+
+class TestScan(unittest.TestCase):
+	LINES=[FINISHED+"\n", '"JOB_NEW" "7.06" 1325376000 1236\n', NEVER_STARTED+"\n",
+			FINISHED.replace('"sleep 10"','"echo \nsleep 10"')+"\n", "garbage\n"]
+
+	def scan(self, **filters):
+		return [j.jobID for j in AcctScan(self.LINES, **filters)]
+
+	def test_no_filters(self):
+		self.assertEqual(self.scan(),[1234,1235,1234])
+
+	def test_multiline(self):
+		self.assertEqual(list(AcctScan(self.LINES))[2].command,"echo \nsleep 10")
+
+	def test_prefix_filters(self):
+		self.assertEqual(self.scan(queues=["short"]),[1235])
+		self.assertEqual(self.scan(users=["alice"]),[1234,1234])
+		self.assertEqual(self.scan(users=[]),[])
+		self.assertEqual(self.scan(since=1325376000, until=1325376001),[1234,1235,1234])
+		self.assertEqual(self.scan(until=datetime.datetime(2012,1,1)),[])
+
+	def test_row_filters(self):
+		self.assertEqual(self.scan(jStatus=[32]),[1235])
+		self.assertEqual(self.scan(projects=["default"], queues=["normal"]),[1234,1234])
+		self.assertEqual(self.scan(projects=["other"]),[])
+
+class TestLazy(unittest.TestCase):
+	def assertSameEvent(self, line):
+		eager=JobFinishEvent(parse(line))
+		lazy=LazyJobFinishEvent(parse(line))
+		for name in eager.__dict__:
+			if name=="termInfo":
+				self.assertEqual(lazy.termInfo.number,eager.termInfo.number)
+			else:
+				self.assertEqual(getattr(lazy,name),getattr(eager,name),name)
+
+	def test_matches_eager(self):
+		self.assertSameEvent(FINISHED)
+
+	def test_never_started(self):
+		self.assertSameEvent(NEVER_STARTED)
+
+	def test_invalid_row(self):
+		with self.assertRaises(ValueError):
+			LazyJobFinishEvent(["Foo","Bar","Baz"])
+
+	def test_truncated_row(self):
+		with self.assertRaises(ValueError):
+			LazyJobFinishEvent(parse(FINISHED)[:-1])
+
+	def test_cached(self):
+		j=LazyJobFinishEvent(parse(FINISHED))
+		self.assertFalse("eventTime" in j.__dict__)
+		self.assertTrue(j.eventTime is j.eventTime)
+		self.assertTrue("eventTime" in j.__dict__)
+
+	def test_acctfile(self):
+		jobs=list(AcctFile([FINISHED,NEVER_STARTED], lazy=True))
+		self.assertEqual([j.jobID for j in jobs],[1234,1235])
+		self.assertTrue(isinstance(jobs[0],LazyJobFinishEvent))
+
+class TestCompact(unittest.TestCase):
+	def assertSameEvent(self, line):
+		eager=JobFinishEvent(parse(line))
+		compact=CompactJobFinishEvent(parse(line))
+		for name, value in eager.__dict__.items():
+			if name=="termInfo":
+				self.assertEqual(compact.termInfo.number,value.number)
+			elif name in ("askedHosts","execHosts"):
+				self.assertEqual(list(getattr(compact,name)),value)
+			elif isinstance(value,str) and isinstance(getattr(compact,name),(int,float)):
+				# Resource usage counters are converted to numbers
+				self.assertEqual(getattr(compact,name),float(value),name)
+			else:
+				self.assertEqual(getattr(compact,name),value,name)
+
+	def test_matches_eager(self):
+		self.assertSameEvent(FINISHED)
+
+	def test_never_started(self):
+		self.assertSameEvent(NEVER_STARTED)
+
+	def test_no_dict(self):
+		j=CompactJobFinishEvent(parse(FINISHED))
+		self.assertFalse(hasattr(j,"__dict__"))
+		self.assertEqual(j.utimeSeconds,1.5)
+
+	def test_shared_terminfo(self):
+		a=CompactJobFinishEvent(parse(FINISHED))
+		b=CompactJobFinishEvent(parse(FINISHED))
+		self.assertTrue(a.termInfo is b.termInfo)
+
+	def test_acctfile(self):
+		jobs=list(AcctFile([FINISHED,NEVER_STARTED], eventClass=CompactJobFinishEvent))
+		self.assertEqual([j.queue for j in jobs],["normal","short"])
+
+class TestStats(unittest.TestCase):
+	def setUp(self):
+		multiline=FINISHED.replace('"sleep 10"','"sleep\n10"')
+		# The truncated record starts on line 4, after the two line record
+		self.data=(multiline+"\n"+'"JOB_RESIZE" "7.06" 1325376000\n'+FINISHED[:FINISHED.index(" 64 100.00")]+"\n"+
+				'"JOB_RESIZE" "7.06" 1325376001\n'+NEVER_STARTED+"\n").encode("utf-8")
+
+	def test_skipped(self):
+		for lazy in (False, True):
+			jobs=list(AcctFile(io.BytesIO(self.data), lazy=lazy))
+			self.assertEqual([j.jobID for j in jobs],[1234, 1235])
+		with self.assertRaises(IndexError):
+			list(AcctFile(io.BytesIO(self.data), strict=True))
+
+	def test_counters(self):
+		for fh in (io.BytesIO(self.data), io.StringIO(self.data.decode("utf-8"))):
+			reports=[]
+			stats=ParseStats(callback=reports.append, interval=2, sampleInterval=1)
+			jobs=list(AcctFile(fh, stats=stats))
+			self.assertEqual(len(jobs),2)
+			r=stats.toDict()
+			self.assertEqual((r["lines"], r["records"], r["events"], r["skipped"], r["malformed"]),(6, 5, 2, 2, 1))
+			self.assertEqual(r["byType"],{"JOB_FINISH":3, "JOB_RESIZE":2})
+			self.assertEqual([e["line"] for e in r["errors"]],[4])
+			self.assertEqual(r["bytesRead"],len(self.data))
+			self.assertEqual(sorted(r["times"]),sorted(ParseStats.STAGES))
+			self.assertTrue(r["fieldCosts"]["execHosts"]>0)
+			# Every second record, and the end of the file
+			self.assertEqual([x["records"] for x in reports],[2, 4, 5])
+			self.assertEqual(reports[-1],r)
 
 if __name__ == '__main__':
 	unittest.main()
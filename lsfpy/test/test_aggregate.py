@@ -0,0 +1,122 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import pickle
+import unittest
+from lsfpy.accounting import *
+from lsfpy.aggregate import *
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+
+class Job(object):
+	def __init__(self, queue, user, wait):
+		self.queue=queue
+		self.userName=user
+		self.submitTimeEpoch=0.0
+		self.startTimeEpoch=float(wait)
+		self.eventTimeEpoch=float(wait)+100
+		self.numProcessors=2
+
+class TestGroupBy(unittest.TestCase):
+	def setUp(self):
+		self.jobs=[Job("q%d" % (i%2), "u%d" % (i%3), i) for i in range(1,101)]
+
+	def group(self, jobs, **kwargs):
+		g=GroupBy(["queue","userName"], [Count(), Sum("waitTime"), Min("waitTime"), 
+				Max("waitTime"), Mean("cpuTime"), Percentile("waitTime", 0.5)], **kwargs)
+		g.extend(jobs)
+		return g
+
+	def test_aggregates(self):
+		r=self.group(self.jobs).result(("q0","u0"))
+		waits=[j.startTimeEpoch for j in self.jobs if j.queue=="q0" and j.userName=="u0"]
+		self.assertEqual(r["numJobs"],len(waits))
+		self.assertEqual(r["count"],len(waits))
+		self.assertEqual(r["waitTime"],sum(waits))
+		self.assertEqual(r["minWaitTime"],min(waits))
+		self.assertEqual(r["maxWaitTime"],max(waits))
+		self.assertEqual(r["meanCpuTime"],200.0)
+		median=sorted(waits)[(len(waits)-1)//2]
+		self.assertTrue(abs(r["waitTimeP50"]-median)<=median*0.01)
+
+	def test_single_key(self):
+		g=GroupBy(["queue"], [Count()])
+		g.extend(self.jobs)
+		self.assertEqual([k for k, r in g.rows()],[("q0",),("q1",)])
+
+	def test_where(self):
+		g=GroupBy([lambda j: j.queue], [Count(name="long", where=lambda j: j.startTimeEpoch>50)])
+		g.extend(self.jobs)
+		self.assertEqual(g.result(("q0",))["long"],25)
+
+	def test_merge(self):
+		whole=self.group(self.jobs)
+		a=self.group(self.jobs[:37])
+		b=self.group(self.jobs[37:])
+		a.merge(pickle.loads(pickle.dumps(b.groups)))
+		self.assertEqual(a.rows(),whole.rows())
+		# Merging does not share state with the other GroupBy
+		a=self.group([])
+		a.merge(b)
+		rows=b.rows()
+		a.extend(self.jobs[:37])
+		self.assertEqual(b.rows(),rows)
+		self.assertEqual(a.rows(),whole.rows())
+
+	def test_max_groups(self):
+		g=GroupBy(["userName"], [Count()], maxGroups=2)
+		g.extend(self.jobs)
+		self.assertTrue(len(g.groups)<=2)
+		self.assertEqual(sum(r["count"] for k, r in g.rows()),100)
+		# Numeric keys are sorted, with the OTHER group last
+		g=GroupBy([lambda j: int(j.startTimeEpoch)], [Count()], maxGroups=20)
+		g.extend(self.jobs)
+		rows=g.rows()
+		self.assertEqual(rows[-1][0],(GroupBy.OTHER,))
+		keys=[k for k, r in rows[:-1]]
+		self.assertEqual(keys,sorted(keys))
+		self.assertEqual(sum(r["count"] for k, r in rows),100)
+
+	def test_events(self):
+		g=GroupBy(["queue"], [Sum("waitTime"), Sum("cpuTime"), Count(name="failed", where=failed)])
+		g.extend(AcctFile([FINISHED,NEVER_STARTED], lazy=True))
+		self.assertEqual(g.result(("normal",)),{"numJobs":1,"waitTime":400.0,"cpuTime":7200.0,"failed":0})
+		self.assertEqual(g.result(("short",))["failed"],1)
+
+	def test_sketches(self):
+		def group(jobs):
+			g=GroupBy(["queue"], [Quantiles("waitTime", (0.5,)), DistinctCount("userName"), 
+					TopK("userName", 2, weight="cpuTime")])
+			g.extend(jobs)
+			return g
+		a=group(self.jobs[:37])
+		a.merge(pickle.loads(pickle.dumps(group(self.jobs[37:]).groups)))
+		r=a.result(("q0",))
+		waits=sorted(j.startTimeEpoch for j in self.jobs if j.queue=="q0")
+		self.assertTrue(abs(r["waitTimeQuantiles"][0.5]-waits[len(waits)//2])<=2)
+		self.assertEqual(r["distinctUserName"],3)
+		cpu={}
+		for j in self.jobs:
+			if j.queue=="q0":
+				cpu[j.userName]=cpu.get(j.userName,0)+200.0
+		top=sorted(cpu.items(), key=lambda i: -i[1])
+		self.assertEqual([c for u, c in r["topUserName"]],[c for u, c in top[:2]])
+		self.assertTrue(set(r["topUserName"])<=set(top))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,118 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from lsfpy.accounting import JobFinishEvent, parseRecord, readRecords
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED
+
+if sys.version_info>=(3, 5):
+	import asyncio
+	from lsfpy.aio import AsyncAcctFile
+
+@unittest.skipIf(sys.version_info<(3, 5), "requires asyncio")
+class TestAsyncAcctFile(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir, "lsb.acct")
+		f=open(self.path, "w")
+		AcctGenerator(seed=4).write(f, 200)
+		f.close()
+		self.loop=asyncio.new_event_loop()
+
+	def tearDown(self):
+		self.loop.close()
+		shutil.rmtree(self.dir)
+
+	def take(self, f, count=None):
+		events=[]
+		it=f.__aiter__()
+		while count is None or len(events)<count:
+			try:
+				events.append(self.loop.run_until_complete(it.__anext__()))
+			except StopAsyncIteration:
+				break
+		return events
+
+	def expected(self):
+		jobs=[]
+		f=open(self.path, "rb")
+		for offset, record in readRecords(f):
+			try:
+				jobs.append(JobFinishEvent(parseRecord(record.decode("latin-1"))).jobID)
+			except (ValueError, IndexError):
+				pass
+		f.close()
+		return jobs
+
+	def test_read(self):
+		f=AsyncAcctFile(self.path, lazy=True, chunkSize=4096, queueSize=2)
+		events=self.take(f)
+		self.assertEqual([e.jobID for e in events],self.expected())
+		self.assertEqual(f.offset,os.path.getsize(self.path))
+		f.close()
+
+	def test_no_final_newline(self):
+		f=open(self.path, "a")
+		f.write(FINISHED)
+		f.close()
+		f=AsyncAcctFile(self.path, chunkSize=4096)
+		events=self.take(f)
+		self.assertEqual([e.jobID for e in events],self.expected())
+		self.assertEqual(events[-1].jobID,1234)
+		self.assertEqual(f.offset,os.path.getsize(self.path))
+		f.close()
+
+	def test_backpressure(self):
+		f=AsyncAcctFile(self.path, chunkSize=1024, queueSize=1)
+		self.take(f, 1)
+		# Give the reader time to fill the queue, it then waits for the 
+		# consumer instead of reading the rest of the file.
+		self.loop.run_until_complete(asyncio.sleep(0.2))
+		self.assertEqual(f._queue.qsize(),1)
+		self.assertTrue(f._readOffset<os.path.getsize(self.path)/2)
+		f.close()
+		self.loop.run_until_complete(asyncio.sleep(0))
+		self.assertTrue(f._task.cancelled())
+
+	def test_follow(self):
+		size=os.path.getsize(self.path)
+		f=AsyncAcctFile(self.path, offset=size, follow=True, interval=0.01)
+		line=FINISHED+"\n"
+		g=open(self.path, "a")
+		# Only the first half of the record has been written
+		g.write(line[:100])
+		g.flush()
+		task=self.loop.create_task(f.__anext__())
+		self.loop.run_until_complete(asyncio.sleep(0.1))
+		self.assertFalse(task.done())
+		g.write(line[100:])
+		g.close()
+		self.assertEqual(self.loop.run_until_complete(task).jobID,1234)
+		# Cancelling a waiting consumer stops the reader
+		task=self.loop.create_task(f.__anext__())
+		self.loop.run_until_complete(asyncio.sleep(0.05))
+		task.cancel()
+		self.assertRaises(asyncio.CancelledError, self.loop.run_until_complete, task)
+		self.loop.run_until_complete(asyncio.sleep(0))
+		self.assertTrue(f._task.done())
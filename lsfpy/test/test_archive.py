@@ -0,0 +1,91 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.accounting import fromEpoch
+from lsfpy.archive import *
+from lsfpy.test.test_accounting import FINISHED
+
+## Returns a JOB_FINISH record for a job that finished at eventTime.
+def finishedAt(jobID, eventTime):
+	return FINISHED.replace(" 1234 "," %d " % jobID,1).replace(" 1325376000 "," %d " % eventTime,1)
+
+class TestArchive(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		# lsb.acct.2 is the oldest archive, lsb.acct is the current file
+		for name, start in (("lsb.acct.2",1000),("lsb.acct.1",2000),("lsb.acct",3000)):
+			f=open(os.path.join(self.dir,name),"w")
+			for t in range(start, start+1000, 100):
+				f.write(finishedAt(t, t)+"\n")
+			f.close()
+		open(os.path.join(self.dir,"lsb.events"),"w").close()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_time_span(self):
+		self.assertEqual(timeSpan(os.path.join(self.dir,"lsb.acct.1")),(2000.0,2900.0))
+
+	def test_truncated_last_record(self):
+		# mbatchd has only written part of the last record
+		path=os.path.join(self.dir,"lsb.acct")
+		f=open(path,"a")
+		f.write(finishedAt(9999, 5000)[:30])
+		f.close()
+		self.assertEqual(timeSpan(path),(3000.0,3900.0))
+		path=os.path.join(self.dir,"lsb.acct.3")
+		f=open(path,"w")
+		f.write(finishedAt(9999, 5000)[:30])
+		f.close()
+		self.assertEqual(timeSpan(path),None)
+
+	def test_empty_file(self):
+		path=os.path.join(self.dir,"lsb.acct.3")
+		open(path,"w").close()
+		self.assertEqual(timeSpan(path),None)
+
+	def test_chronological(self):
+		times=[e.eventTimeEpoch for e in AcctArchive(self.dir)]
+		self.assertEqual(times,sorted(times))
+		self.assertEqual(len(times),30)
+
+	def test_pruned(self):
+		a=AcctArchive(self.dir, since=2950, until=3200)
+		self.assertEqual([os.path.basename(f[0]) for f in a.files()],["lsb.acct"])
+		self.assertEqual([e.jobID for e in a],[3000,3100])
+
+	def test_datetime_window(self):
+		since=fromEpoch(2000)
+		until=fromEpoch(2200)
+		self.assertEqual([e.jobID for e in AcctArchive(self.dir, since=since, until=until)],[2000,2100])
+
+	def test_glob(self):
+		a=AcctArchive(os.path.join(self.dir,"lsb.acct.*"))
+		self.assertEqual(len(a.files()),2)
+
+	def test_parallel(self):
+		a=AcctArchive(self.dir, since=1500, processes=2)
+		self.assertEqual(len(list(a)),25)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,114 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import pickle
+import unittest
+from lsfpy.accounting import *
+from lsfpy.arrays import *
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED, parse
+
+_TAIL=[name for name, convert in JOB_FINISH_TAIL]
+
+## Returns FINISHED as element idx of array 2000, finishing at the given time.
+def element(idx, eventTime=1325376000, termInfo=0):
+	row=parse(FINISHED)
+	tail=jobFinishOffsets(row)[1]
+	row[2]=str(eventTime)
+	row[3]="2000"
+	row[tail+_TAIL.index("jobName")]="myjob[%d]" % idx
+	row[tail+_TAIL.index("idx")]=str(idx)
+	row[tail+_TAIL.index("termInfo")]=str(termInfo)
+	return JobFinishEvent(row)
+
+class TestJobArray(unittest.TestCase):
+	def setUp(self):
+		self.arrays=JobArrays()
+		self.arrays.extend([element(i, 1325376000+i, 0 if i%10 else 1) for i in range(1, 31)]+
+				[element(32), element(31), JobFinishEvent(parse(NEVER_STARTED))])
+		self.a=self.arrays.get(2000)
+
+	def test_ranges(self):
+		self.assertEqual(len(self.arrays),1)
+		self.assertEqual(len(self.a),32)
+		self.assertEqual(self.a.indexRanges(),[(1, 32)])
+		self.assertEqual(list(self.a.indexes())[-3:],[30, 32, 31])
+		self.assertEqual(self.a.failedIndexRanges(),[(10, 10),(20, 20),(30, 30)])
+		self.assertEqual(toRanges([1,2,2,3,5,7,8]),[(1, 3),(5, 5),(7, 8)])
+		# Merged arrays are copied, so adding to them does not change the source
+		merged=JobArrays()
+		merged.merge(self.arrays)
+		merged.add(element(40))
+		self.assertEqual(len(merged.get(2000)),33)
+		self.assertEqual(len(self.a),32)
+
+	def test_elements(self):
+		e=self.a.find(31)
+		self.assertEqual((e.idx, e.position),(31, 31))
+		self.assertEqual(e.jobName,"myjob[31]")
+		self.assertEqual(e.userName,"alice")
+		self.assertEqual(e.execHosts,["hostA","hostB"])
+		self.assertEqual(self.a.element(-1).idx,31)
+		self.assertEqual(self.a.element(9).termInfo.name,"TERM_PREEMPT")
+		self.assertEqual(self.a.find(99),None)
+		# Every element matches the event it was created from
+		j=element(5, 1325376005)
+		e=self.a.find(5)
+		for name in ["jobID","queue","jobName","startTime","eventTime","runTime","waitTime","utime","exitStatus"]:
+			self.assertEqual(getattr(e, name),getattr(j, name))
+		# An element that never started has the start time of JobFinishEvent
+		row=parse(NEVER_STARTED)
+		row[jobFinishOffsets(row)[1]+_TAIL.index("idx")]="3"
+		row[9]="1325390000"
+		j=JobFinishEvent(row)
+		a=JobArray()
+		a.add(j)
+		self.assertEqual(a.find(3).startTime,j.startTime)
+		self.assertEqual(a.find(3).startTime,j.termTime)
+		with self.assertRaises(AttributeError):
+			e.notAField
+		self.assertEqual(self.a.overrides,{})
+
+	def test_stats(self):
+		self.assertEqual(self.a.makespan(),1325376030-1325372000)
+		runTimes=self.a.runTimeDistribution()
+		self.assertEqual((runTimes["count"], runTimes["min"], runTimes["max"]),(32, 3600, 3630))
+		self.assertEqual(runTimes["p50"],3615)
+		stats=self.a.stats()
+		self.assertEqual((stats["numFailed"], stats["queue"]),(3, "normal"))
+
+	def test_generated(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=6).write(f, 2000)
+		events=[e for e in AcctFile(io.BytesIO(f.getvalue()), lazy=True) if e.idx!="0"]
+		arrays=JobArrays()
+		arrays.extend(events[:1000])
+		other=pickle.loads(pickle.dumps(JobArrays()))
+		other.extend(events[1000:])
+		arrays.merge(other)
+		self.assertEqual(sum(len(a) for a in arrays),len(events))
+		self.assertEqual(sum(len(a.overrides) for a in arrays),0)
+		# Elements that ran on the same hosts share an allocation
+		self.assertEqual(len(arrays.allocations),len(set(a for array in arrays for a in array.hosts)))
+		self.assertEqual(len(set(map(id, (a for array in arrays for a in array.hosts)))),len(arrays.allocations))
+		for e in events:
+			a=arrays.get(e.jobID)
+			self.assertEqual(a.find(int(e.idx)).execHosts,e.execHosts)
+			self.assertEqual(a.find(int(e.idx)).jobName,e.jobName)
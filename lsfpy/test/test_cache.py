@@ -0,0 +1,115 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.cache import AcctCache
+from lsfpy.columnar import AcctTable
+from lsfpy.synthetic import AcctGenerator
+
+class TestCache(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir,"lsb.acct")
+		self.generator=AcctGenerator(seed=5)
+		self.append(300)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def append(self, count, partial=""):
+		f=open(self.path,"a")
+		self.generator.write(f, count)
+		f.write(partial)
+		f.close()
+
+	def cache(self):
+		return AcctCache(self.path, os.path.join(self.dir,"cache"))
+
+	def assertSameTable(self, table):
+		f=open(self.path,"rb")
+		expected=AcctTable.load(f)
+		f.close()
+		self.assertEqual(len(table),len(expected))
+		for name in AcctTable.STRINGS:
+			self.assertEqual(table.values(name),expected.values(name))
+		for name, column in expected.columns().items():
+			self.assertEqual(list(table.columns()[name]),list(column),name)
+
+	def test_first_load(self):
+		self.assertSameTable(self.cache().load())
+		self.assertTrue(os.path.exists(self.cache().cachePath))
+
+	def test_reload(self):
+		self.cache().load()
+		self.assertSameTable(self.cache().load())
+
+	def test_mapped(self):
+		self.cache().load()
+		table=self.cache().load()
+		# The columns are views of the mapped cache file, not copies
+		self.assertTrue(all(isinstance(c, memoryview) for c in table.columns().values()))
+		self.assertSameTable(table)
+		with open(self.path,"rb") as f:
+			self.assertEqual(table.groupBy("queue"),AcctTable.load(f).groupBy("queue"))
+		# A partly written record leaves the columns mapped
+		record=self.generator.record()
+		self.append(0, record[:30])
+		table=self.cache().load()
+		self.assertTrue(all(isinstance(c, memoryview) for c in table.columns().values()))
+		self.assertSameTable(table)
+		# New records are appended to copies of the columns
+		self.append(0, record[30:])
+		table=self.cache().load()
+		self.assertFalse(any(isinstance(c, memoryview) for c in table.columns().values()))
+		self.assertEqual(len(table),301)
+		self.assertSameTable(self.cache().load())
+
+	def test_appended(self):
+		self.cache().load()
+		record=self.generator.record()
+		self.append(50, record[:30])
+		self.assertSameTable(self.cache().load())
+		f=open(self.path,"a")
+		f.write(record[30:])
+		f.close()
+		self.assertSameTable(self.cache().load())
+		self.assertEqual(len(self.cache().load()),351)
+
+	def test_rewritten(self):
+		self.cache().load()
+		with open(self.path) as f:
+			data=f.read()
+		f=open(self.path,"r+")
+		f.write(data.replace('"normal"','"NORMAL"',1))
+		f.close()
+		table=self.cache().load()
+		self.assertTrue("NORMAL" in table.values("queue"))
+		self.assertSameTable(table)
+
+	def test_replaced(self):
+		self.cache().load()
+		os.rename(self.path, self.path+".1")
+		self.append(10)
+		self.assertEqual(len(self.cache().load()),10)
+
+if __name__ == '__main__':
+	unittest.main()
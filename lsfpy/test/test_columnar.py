@@ -0,0 +1,153 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import unittest
+from lsfpy import columnar
+from lsfpy.accounting import *
+from lsfpy.columnar import AcctTable, JobTable
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+
+class TestAcctTable(unittest.TestCase):
+	def setUp(self):
+		self.table=AcctTable()
+		self.table.extend(AcctFile([FINISHED,NEVER_STARTED,FINISHED]))
+
+	def test_length(self):
+		self.assertEqual(len(self.table),3)
+
+	def test_dictionary_encoded(self):
+		self.assertEqual(self.table.values("queue"),["normal","short"])
+		self.assertEqual(list(self.table.column("queue")),[0,1,0])
+
+	def test_times(self):
+		self.assertEqual(list(self.table.waitTimes()),[400.0,4000.0,400.0])
+		self.assertEqual(list(self.table.runTimes()),[3600.0,0.0,3600.0])
+
+	def test_group_by(self):
+		groups=self.table.groupBy("queue")
+		self.assertEqual(groups["normal"]["numJobs"],2)
+		self.assertEqual(groups["normal"]["runTime"],2*2*3600.0)
+		self.assertEqual(groups["normal"]["wallTime"],2*3600.0)
+		self.assertEqual(groups["short"]["numFJobs"],1)
+		self.assertEqual(groups["short"]["waitTime"],4000.0)
+
+class TestJobTable(unittest.TestCase):
+	def setUp(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=3).write(f, 400)
+		self.events=list(AcctFile(io.BytesIO(f.getvalue()), lazy=True))
+		self.table=JobTable()
+		self.table.extend(self.events)
+
+	def expected(self, match):
+		return [i for i, e in enumerate(self.events) if match(e)]
+
+	def test_hash_index(self):
+		queue=self.events[0].queue
+		self.assertEqual(list(self.table.rowsWhere("queue", queue)),self.expected(lambda e: e.queue==queue))
+		self.assertEqual(list(self.table.rowsWhere("queue", "nosuchqueue")),[])
+
+	def test_time_range(self):
+		since=self.events[100].submitTimeEpoch
+		until=self.events[300].submitTimeEpoch
+		self.assertEqual(self.table.rowsBetween("submitTimeEpoch", since, until),
+				self.expected(lambda e: since<=e.submitTimeEpoch<until))
+
+	def test_running_at(self):
+		for e in self.events[::37]:
+			for t in (e.startTimeEpoch, e.eventTimeEpoch, (e.startTimeEpoch+e.eventTimeEpoch)/2):
+				self.assertEqual(self.table.runningAt(t),
+						self.expected(lambda j: 1<=j.startTimeEpoch<=t<j.eventTimeEpoch))
+
+	def test_select(self):
+		e=self.events[10]
+		t=e.startTimeEpoch+1
+		rows=self.table.select(userName=e.userName, queue=[e.queue, "nosuchqueue"], runningAt=t)
+		self.assertEqual(rows,self.expected(lambda j: j.userName==e.userName and j.queue==e.queue
+				and 1<=j.startTimeEpoch<=t<j.eventTimeEpoch))
+		self.assertEqual(self.table.select(),list(range(len(self.events))))
+
+	def test_filter_and_group(self):
+		user=self.events[0].userName
+		jobs=self.table.filter(userName=user)
+		expected=[e for e in self.events if e.userName==user]
+		self.assertEqual(len(jobs),len(expected))
+		self.assertEqual(list(jobs.column("jobID")),[e.jobID for e in expected])
+		groups=jobs.groupBy("userName")
+		self.assertEqual(list(groups),[user])
+		self.assertEqual(groups[user]["numJobs"],len(expected))
+		self.assertEqual(jobs.row(0)["userName"],user)
+
+	def test_indexes_rebuilt(self):
+		queue=self.events[0].queue
+		before=len(self.table.rowsWhere("queue", queue))
+		self.table.append(self.events[0])
+		self.assertEqual(len(self.table.rowsWhere("queue", queue)),before+1)
+
+## Runs a function with the columnar module using array.array instead of 
+#  NumPy.
+def withoutNumpy(f, *args):
+	numpy=columnar.numpy
+	columnar.numpy=None
+	try:
+		return f(*args)
+	finally:
+		columnar.numpy=numpy
+
+@unittest.skipIf(columnar.numpy is None, "requires numpy")
+class TestNumpy(unittest.TestCase):
+	def setUp(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=8).write(f, 400)
+		self.events=list(AcctFile(io.BytesIO(f.getvalue()), lazy=True))
+		self.table=AcctTable()
+		self.table.extend(self.events)
+
+	def test_columns(self):
+		self.assertTrue(isinstance(self.table.column("numProcessors"), columnar.numpy.ndarray))
+		self.assertEqual(self.table.column("numProcessors").tolist(),[e.numProcessors for e in self.events])
+		self.assertEqual(len(AcctTable().column("submitTimeEpoch")),0)
+		self.assertEqual(self.table.waitTimes().tolist(),list(withoutNumpy(self.table.waitTimes)))
+		self.assertEqual(self.table.runTimes().tolist(),list(withoutNumpy(self.table.runTimes)))
+
+	def test_group_by(self):
+		groups=self.table.groupBy("queue")
+		expected=withoutNumpy(self.table.groupBy, "queue")
+		self.assertEqual(sorted(groups),sorted(expected))
+		for queue, g in expected.items():
+			for k, v in g.items():
+				if isinstance(v, float):
+					self.assertAlmostEqual(groups[queue][k],v,places=3)
+				else:
+					self.assertEqual(groups[queue][k],v)
+
+	def test_sorted_index(self):
+		table=JobTable()
+		table.extend(self.events)
+		times, rows=table.sortedIndex("eventTimeEpoch")
+		expected=JobTable()
+		withoutNumpy(expected.extend, self.events)
+		self.assertEqual((times, rows),withoutNumpy(expected.sortedIndex, "eventTimeEpoch"))
+		t=self.events[50].eventTimeEpoch
+		self.assertEqual(table.runningAt(t),[i for i, e in enumerate(self.events) if 1<=e.startTimeEpoch<=t<e.eventTimeEpoch])
+
+if __name__ == '__main__':
+	unittest.main()
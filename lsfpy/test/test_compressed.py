@@ -0,0 +1,242 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.accounting import *
+from lsfpy.archive import AcctArchive, timeSpan
+from lsfpy.compressed import *
+from lsfpy.events import EventFile
+from lsfpy.index import AcctIndex
+from lsfpy.mapped import MappedAcctFile
+from lsfpy.parallel import ParallelAcctFile
+from lsfpy.test.test_archive import finishedAt
+from lsfpy.test.test_parallel import MULTILINE, countQueues, mergeCounts
+
+## Compresses data as gzip members of size bytes, which do not end on record
+#  boundaries.
+def gzipMembers(data, size):
+	return b"".join(gzip.compress(data[i:i+size]) for i in range(0, len(data), size))
+
+def zstdFrames(data, size):
+	c=zstandard.ZstdCompressor()
+	return b"".join(c.compress(data[i:i+size]) for i in range(0, len(data), size))
+
+class TestCompressed(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		lines=[]
+		for t in range(1000, 5000, 20):
+			lines.append(finishedAt(t, t))
+			if t%500==0:
+				lines.append(MULTILINE.replace(" 1325376000 "," %d " % (t+10),1))
+		self.data=("\n".join(lines)+"\n").encode("utf-8")
+		self.expected=[(e.jobID, e.command) for e in AcctFile(io.BytesIO(self.data))]
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def write(self, name, data):
+		path=os.path.join(self.dir, name)
+		f=open(path, "wb")
+		f.write(data)
+		f.close()
+		return path
+
+	def events(self, events):
+		return [(e.jobID, e.command) for e in events]
+
+	def test_detect(self):
+		self.assertEqual(compressionOf(gzip.compress(self.data)),"gzip")
+		self.assertEqual(compressionOf(bz2.compress(self.data)),"bz2")
+		self.assertEqual(compressionOf(lzma.compress(self.data)),"xz")
+		self.assertEqual(compressionOf(b"\x28\xb5\x2f\xfd\x00\x00"),"zstd")
+		self.assertEqual(compressionOf(self.data),None)
+		f=io.BytesIO(gzip.compress(self.data))
+		f.read(3)
+		self.assertEqual(detectCompression(f),None)
+		f.seek(0)
+		self.assertEqual(detectCompression(f),"gzip")
+		self.assertEqual(f.tell(),0)
+
+	def test_acct_file(self):
+		for data in (gzip.compress(self.data), gzipMembers(self.data, 1000), bz2.compress(self.data),
+				lzma.compress(self.data), self.data):
+			path=self.write("lsb.acct.1", data)
+			with open(path, "rb") as f:
+				self.assertEqual(self.events(AcctFile(f)),self.expected)
+			with openAcct(path) as f:
+				self.assertEqual(f.read(),self.data)
+
+	def test_unseekable(self):
+		# A pipe cannot seek, so it is read with the gzip module
+		class Pipe(io.RawIOBase):
+			def __init__(self, data):
+				self.data=io.BytesIO(data)
+			def readable(self):
+				return True
+			def readinto(self, b):
+				return self.data.readinto(b)
+		f=io.BufferedReader(Pipe(gzipMembers(self.data, 1000)))
+		self.assertEqual(self.events(AcctFile(f)),self.expected)
+
+	def test_scan_and_events(self):
+		f=io.BytesIO(gzip.compress(self.data))
+		# Two of the jobs have a multi-line command
+		self.assertEqual(len(list(AcctScan(f, since=2000, until=3000))),52)
+		f=io.BytesIO(bz2.compress(self.data))
+		self.assertEqual(len(list(EventFile(f, types=["JOB_FINISH"]))),len(self.expected))
+
+	def test_seek_points(self):
+		blob=gzipMembers(self.data, 1000)
+		f=CompressedFile(io.BytesIO(blob))
+		self.assertEqual(f.readall(),self.data)
+		points=f.seekPoints()
+		self.assertEqual(len(points),(len(self.data)+999)//1000)
+		self.assertEqual(points[1][0],1000)
+		f=io.BufferedReader(CompressedFile(io.BytesIO(blob), seekPoints=points))
+		for position in (len(self.data)-50, 12345, 1000, 0, 999, 31000):
+			self.assertEqual(f.seek(position),position)
+			self.assertEqual(f.read(40),self.data[position:position+40])
+		f.seek(0, io.SEEK_END)
+		self.assertEqual(f.tell(),len(self.data))
+
+	def test_single_member_seek(self):
+		f=io.BufferedReader(CompressedFile(io.BytesIO(gzip.compress(self.data))))
+		f.seek(20000)
+		self.assertEqual(f.read(10),self.data[20000:20010])
+		f.seek(100)
+		self.assertEqual(f.read(10),self.data[100:110])
+		self.assertEqual(len(f.raw.seekPoints()),1)
+
+	def test_padding_and_corruption(self):
+		blob=gzip.compress(self.data)
+		self.assertEqual(CompressedFile(io.BytesIO(blob+b"\0"*10)).readall(),self.data)
+		self.assertRaises(EOFError, CompressedFile(io.BytesIO(blob[:-20])).readall)
+		self.assertRaises(ValueError, CompressedFile(io.BytesIO(blob+b"garbage")).readall)
+		self.assertRaises(ValueError, CompressedFile, io.BytesIO(bz2.compress(self.data)))
+
+	def test_decompress_range(self):
+		blob=gzipMembers(self.data, 1000)
+		path=self.write("lsb.acct.1.gz", blob)
+		self.assertTrue(hasMembers(path, "gzip", len(blob)))
+		data=b""
+		offset=0
+		for start in range(0, len(blob), 700):
+			first, last, part=decompressRange(path, "gzip", start, start+700)
+			if first is None:
+				self.assertTrue(last<=offset)
+				continue
+			self.assertEqual(first,offset)
+			offset=last
+			data+=part
+		self.assertEqual(offset,len(blob))
+		self.assertEqual(data,self.data)
+		self.assertFalse(hasMembers(self.write("single.gz", gzip.compress(self.data)), "gzip", len(blob)))
+
+	def test_parallel(self):
+		for data in (gzipMembers(self.data, 1000), gzip.compress(self.data), bz2.compress(self.data)):
+			path=self.write("lsb.acct.1", data)
+			self.assertEqual(self.events(ParallelAcctFile(path, processes=2, chunkSize=8000)),self.expected)
+			counts=ParallelAcctFile(path, processes=2, chunkSize=8000).reduce(countQueues, mergeCounts, {})
+			self.assertEqual(counts,countQueues(AcctFile(io.BytesIO(self.data))))
+
+	def test_index(self):
+		path=self.write("lsb.acct.1.gz", gzipMembers(self.data, 1000))
+		i=AcctIndex(path)
+		self.assertEqual(len(i),len(self.expected))
+		self.assertEqual(len(i.seekPoints),(len(self.data)+999)//1000)
+		self.assertEqual([e.jobID for e in i.byTime(3000, 3100)],[3000,1234,3020,3040,3060,3080])
+		self.assertEqual(i.byJobID(1234)[0].command,'echo "hi"\n"JOB_FINISH" "7.06" 1\nsleep 10')
+		i=AcctIndex(path)
+		self.assertEqual(i.update(),0)
+		self.assertEqual(len(i.seekPoints),(len(self.data)+999)//1000)
+		self.assertEqual([e.jobID for e in i.byJobID(4980)],[4980])
+		# A replaced file is indexed again
+		self.write("lsb.acct.1.gz", bz2.compress(self.data[:self.data.index(b"\n")+1]))
+		i=AcctIndex(path)
+		self.assertEqual(len(i),1)
+		self.assertEqual(i.seekPoints,[])
+
+	def test_archive(self):
+		self.write("lsb.acct.2.gz", gzipMembers(self.data, 1000))
+		self.write("lsb.acct.1.xz", lzma.compress(finishedAt(6000, 6000).encode("utf-8")+b"\n"))
+		self.write("lsb.acct", (finishedAt(7000, 7000)+"\n").encode("utf-8"))
+		self.assertEqual(timeSpan(os.path.join(self.dir, "lsb.acct.2.gz")),(1000.0,4980.0))
+		self.assertEqual(timeSpan(os.path.join(self.dir, "lsb.acct.1.xz")),(6000.0,6000.0))
+		self.assertEqual(timeSpan(self.write("single.gz", gzip.compress(self.data))),(1000.0,4980.0))
+		self.assertEqual(timeSpan(self.write("empty.gz", gzip.compress(b""))),None)
+		a=AcctArchive(self.dir, since=4900)
+		self.assertEqual([os.path.basename(f[0]) for f in a.files()],["lsb.acct.2.gz","lsb.acct.1.xz","lsb.acct"])
+		self.assertEqual([e.jobID for e in a],[4900,4920,4940,4960,4980,6000,7000])
+
+	def test_time_span_cached(self):
+		blob=bz2.compress(self.data)
+		path=self.write("lsb.acct.1.bz2", blob)
+		self.assertEqual(timeSpan(path),(1000.0,4980.0))
+		# An unchanged archive is not decompressed again
+		st=os.stat(path)
+		self.write("lsb.acct.1.bz2", blob[:10]+b"\0"*(len(blob)-10))
+		os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+		self.assertEqual(timeSpan(path),(1000.0,4980.0))
+		# A replaced archive is read again
+		self.write("lsb.acct.1.bz2", bz2.compress(finishedAt(6000, 6000).encode("utf-8")+b"\n"))
+		self.assertEqual(timeSpan(path),(6000.0,6000.0))
+
+	def test_write_members(self):
+		source=self.write("lsb.acct.1.xz", lzma.compress(self.data))
+		dest=os.path.join(self.dir, "lsb.acct.1.gz")
+		self.assertEqual(writeMembers(source, dest, 4096),(len(self.data)+4095)//4096)
+		with open(dest, "rb") as f:
+			self.assertEqual(gzip.decompress(f.read()),self.data)
+		self.assertEqual(len(AcctIndex(dest).seekPoints),(len(self.data)+4095)//4096)
+
+	def test_mapped(self):
+		self.assertRaises(ValueError, MappedAcctFile, self.write("lsb.acct.1", gzip.compress(self.data)))
+
+	@unittest.skipIf(zstandard is None, "requires zstandard")
+	def test_zstd(self):
+		blob=zstdFrames(self.data, 1000)
+		path=self.write("lsb.acct.1.zst", blob)
+		with open(path, "rb") as f:
+			self.assertEqual(self.events(AcctFile(f)),self.expected)
+		f=CompressedFile(io.BytesIO(blob))
+		self.assertEqual(f.readall(),self.data)
+		self.assertEqual(len(f.seekPoints()),(len(self.data)+999)//1000)
+		self.assertEqual(self.events(ParallelAcctFile(path, processes=2, chunkSize=8000)),self.expected)
+		self.assertEqual([e.jobID for e in AcctIndex(path).byTime(3000, 3050)],[3000,1234,3020,3040])
+		self.assertEqual(timeSpan(path),(1000.0,4980.0))
+		# A skippable frame holds no data
+		skippable=b"\x50\x2a\x4d\x18\x04\x00\x00\x00abcd"
+		self.assertEqual(compressionOf(skippable),"zstd")
+		self.assertEqual(CompressedFile(io.BytesIO(skippable+blob)).readall(),self.data)
+		path=self.write("lsb.acct.1.zst", b"".join(skippable+zstdFrames(self.data[i:i+1000], 1000) for i in range(0, len(self.data), 1000)))
+		self.assertEqual(self.events(ParallelAcctFile(path, processes=2, chunkSize=8000)),self.expected)
+
+	def test_zstd_requires_zstandard(self):
+		if zstandard is not None:
+			return
+		self.assertRaises(ValueError, CompressedFile, io.BytesIO(b"\x28\xb5\x2f\xfd\x00\x00"))
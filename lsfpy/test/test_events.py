@@ -0,0 +1,125 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import unittest
+from lsfpy.accounting import *
+from lsfpy.events import *
+from lsfpy.test.test_accounting import FINISHED
+
+JOB_NEW='"JOB_NEW" "7.06" 1325370000 1300 500 33554450 0 4 1325370000 0 0 0 -1 0 "alice" -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 -1 "" 60.00 18 "normal" "" "submithost" "/home/alice" "" "" "/dev/null" "" "" "" "" "/home/alice" "1325370000.1300" 0 "" "" "myjob" "sleep 10" 0 "" "default" 0 4 "" "/bin/sh" "" 0 "" 0'
+JOB_START='"JOB_START" "7.06" 1325370100 1300 4 1234 1234 60.00 4 "hostA" "hostA" "hostB" "hostB" "" "" 0 "" 0 ""'
+JOB_STATUS_RU='"JOB_STATUS" "7.06" 1325370200 1300 64 0 0 12.5 1325370200 1 12.0 0.5 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 -1 0 0 0 0'
+JOB_STATUS='"JOB_STATUS" "7.06" 1325370200 1300 32 0 0 0.0 1325370200 0 0 130 0 14'
+ADRSV='"EVENT_ADRSV_FINISH" "7.06" 1325376000 1325300000 1 500 "alice#0" "alice" "1325300000-1325376000" "alice" 3600 2 "hostA" 8 "hostB" 4'
+
+def rows(*lines):
+	return [parseRecord(l+"\n") for l in lines]
+
+class TestEvents(unittest.TestCase):
+	def test_job_new(self):
+		e=JobNewEvent(rows(JOB_NEW)[0])
+		self.assertEqual(e.jobID,1300)
+		self.assertEqual(e.numProcessors,4)
+		self.assertEqual(e.userName,"alice")
+		self.assertEqual(e.queue,"normal")
+		self.assertEqual(e.command,"sleep 10")
+		self.assertEqual(e.xf,[])
+		self.assertEqual(e.loginShell,"/bin/sh")
+
+	def test_host_list(self):
+		e=JobStartEvent(rows(JOB_START)[0])
+		self.assertEqual(e.execHosts,["hostA","hostA","hostB","hostB"])
+		self.assertEqual(e.idx,0)
+
+	def test_optional_group(self):
+		with_ru, without_ru=[JobStatusEvent(r) for r in rows(JOB_STATUS_RU, JOB_STATUS)]
+		self.assertEqual(len(with_ru.lsfRusage),19)
+		self.assertEqual(with_ru.lsfRusage[0],12.0)
+		self.assertEqual(with_ru.exitInfo,0)
+		self.assertEqual(without_ru.lsfRusage,None)
+		self.assertEqual(without_ru.exitStatus,130)
+		self.assertEqual(without_ru.exitInfo,14)
+
+	def test_grouped_list(self):
+		e=AdvanceReservationFinishEvent(rows(ADRSV)[0])
+		self.assertEqual(e.rsvHosts,[("hostA","8"),("hostB","4")])
+
+	def test_short_and_long_records(self):
+		e=JobStartAcceptEvent(rows('"JOB_START_ACCEPT" "6.0" 1 1300 55')[0])
+		self.assertEqual((e.jobPid, e.jobPGid, e.idx),(55,None,None))
+		e=JobCleanEvent(rows('"JOB_CLEAN" "10.1" 1 1300 0 "future"')[0])
+		self.assertEqual(e.extra,["future"])
+
+	def test_version_layout(self):
+		class Versioned(Event):
+			eventType="TEST_VERSIONED"
+			layouts=(("7.0",[field("a", int)]),("9.1",[field("a", int), field("b")]))
+		self.assertEqual(Versioned(["TEST_VERSIONED","7.06","1","1","x"]).extra,["x"])
+		self.assertEqual(Versioned(["TEST_VERSIONED","10.1","1","1","x"]).b,"x")
+		self.assertEqual(Versioned(["TEST_VERSIONED","6.2","1","1","x"]).a,1)
+		self.assertEqual(Versioned(["TEST_VERSIONED","10.1","1","1"]).b,None)
+
+	def test_compiled_layout(self):
+		first, second=[JobStatusEvent(r) for r in rows(JOB_STATUS_RU, JOB_STATUS)]
+		self.assertTrue(Event._compiled[("JOB_STATUS","7.06")] is JobStatusEvent._decoder("7.06"))
+		self.assertEqual(first.extra,[])
+		self.assertFalse("lsfRusage" in JobStatusEvent(rows('"JOB_STATUS" "7.06" 1 1300 32 0 0 0.0 1 1')[0]).__dict__)
+		decode=compileLayout([field("n", int), listOf("l", "n", int), optional("o", "n", 2)], 0, start=1, extra=True)
+		e=Event.__new__(Event)
+		decode(e, ["x","2","1","2","a","b","c"])
+		self.assertEqual((e.n, e.l, e.o, e.extra),(2,[1,2],["a","b"],["c"]))
+
+	def test_event_file(self):
+		lines=[JOB_NEW, JOB_START, '"NEW_TYPE" "7.06" 1 2 3', 'garbage', FINISHED]
+		events=list(EventFile(lines))
+		self.assertEqual([e.eventType for e in events],["JOB_NEW","JOB_START","NEW_TYPE","JOB_FINISH"])
+		self.assertTrue(isinstance(events[-1],JobFinishEvent))
+		self.assertEqual(events[2].extra,["2","3"])
+		self.assertEqual(len(list(EventFile(lines, unknown=False))),3)
+		self.assertEqual([e.eventType for e in EventFile(lines, types=["JOB_START"])],["JOB_START"])
+
+	def test_job_states(self):
+		s=JobStates()
+		s.add(JobNewEvent(rows(JOB_NEW)[0]))
+		self.assertEqual(s.counts(),{("normal","PEND"):[1,4]})
+		s.add(JobStartEvent(rows(JOB_START)[0]))
+		self.assertEqual(s.counts(),{("normal","RUN"):[1,4]})
+		s.add(JobStatusEvent(rows(JOB_STATUS)[0]))
+		self.assertEqual(s.counts(),{})
+
+	def test_array_states(self):
+		self.assertEqual(numElements("myjob[1-10]"),10)
+		self.assertEqual(numElements(b"myjob[1-9:2,20,30-31]%2"),8)
+		self.assertEqual(numElements("myjob"),1)
+		s=JobStates()
+		s.add(JobNewEvent(rows(JOB_NEW.replace('"myjob"', '"myjob[1-10]"'))[0]))
+		self.assertEqual(s.counts(),{("normal","PEND"):[10,40]})
+		# Each element that starts leaves the rest of the array pending, and
+		# slots are counted from short form execHosts
+		start=JOB_START.replace('4 "hostA" "hostA" "hostB" "hostB"', '2 "3*hostA" "hostB"')
+		s.add(JobStartEvent(rows(start.replace('0 "" 0 ""', '0 "" 3 ""'))[0]))
+		self.assertEqual(s.counts(),{("normal","PEND"):[9,36],("normal","RUN"):[1,4]})
+		s.add(JobStartEvent(rows(start.replace('0 "" 0 ""', '0 "" 4 ""'))[0]))
+		s.add(JobCleanEvent(rows('"JOB_CLEAN" "7.06" 1325370300 1300 5')[0]))
+		self.assertEqual(s.counts(),{("normal","PEND"):[7,28],("normal","RUN"):[2,8]})
+		s.add(JobCleanEvent(rows('"JOB_CLEAN" "7.06" 1325370300 1300 3')[0]))
+		self.assertEqual(s.counts(),{("normal","PEND"):[7,28],("normal","RUN"):[1,4]})
+
+if __name__ == '__main__':
+	unittest.main()
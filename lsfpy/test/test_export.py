@@ -0,0 +1,93 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from lsfpy.accounting import AcctFile
+from lsfpy.export import *
+from lsfpy.synthetic import AcctGenerator
+
+class TestExport(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		f=io.BytesIO()
+		AcctGenerator(seed=9).write(f, 250)
+		self.data=f.getvalue()
+		self.events=list(AcctFile(io.BytesIO(self.data), lazy=True))
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_batches(self):
+		sizes=[len(c[0]) for c in batches(iter(self.events), EXPORT_FIELDS, 100)]
+		self.assertEqual(sizes,[100,100,50])
+
+	def test_compact(self):
+		path=os.path.join(self.dir,"jobs.cols")
+		self.assertEqual(exportColumns(AcctFile(io.BytesIO(self.data), lazy=True), path, batchSize=64, parquet=False),len(self.events))
+		jobIDs=[]
+		users=[]
+		waits=[]
+		for batch in readColumns(path):
+			self.assertTrue(len(batch["jobID"])<=64)
+			jobIDs.extend(batch["jobID"])
+			users.extend(batch["userName"])
+			waits.extend(batch["waitTime"])
+		self.assertEqual(jobIDs,[e.jobID for e in self.events])
+		self.assertEqual(users,[e.userName for e in self.events])
+		self.assertEqual(waits,[e.waitTime.total_seconds() for e in self.events])
+
+	def test_selected_fields(self):
+		path=os.path.join(self.dir,"jobs.cols")
+		exportColumns(self.events, path, fields=["jobID", ("slots", "int", lambda e: e.numProcessors*2)], parquet=False)
+		batch=next(readColumns(path))
+		self.assertEqual(sorted(batch),["jobID","slots"])
+		self.assertEqual(batch["slots"][0],self.events[0].numProcessors*2)
+
+	def test_parquet_requires_pyarrow(self):
+		if pyarrow is not None:
+			return
+		self.assertRaises(ValueError, exportColumns, self.events, os.path.join(self.dir,"jobs.parquet"), parquet=True)
+		# A .parquet file is not written in the compact format
+		path=os.path.join(self.dir,"jobs.parquet")
+		self.assertRaises(ValueError, exportColumns, self.events, path)
+		self.assertFalse(os.path.exists(path))
+		self.assertEqual(exportColumns(self.events, os.path.join(self.dir,"jobs.cols")),len(self.events))
+
+	def test_sqlite(self):
+		path=os.path.join(self.dir,"jobs.db")
+		self.assertEqual(exportSQLite(AcctFile(io.BytesIO(self.data), lazy=True), path, batchSize=64),len(self.events))
+		conn=sqlite3.connect(path)
+		rows=conn.execute("SELECT queue, COUNT(*) FROM jobs GROUP BY queue").fetchall()
+		expected={}
+		for e in self.events:
+			expected[e.queue]=expected.get(e.queue,0)+1
+		self.assertEqual(dict(rows),expected)
+		indexes=[r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")]
+		self.assertEqual(sorted(indexes),["jobs_eventTime","jobs_jobID","jobs_queue","jobs_userName"])
+		conn.close()
+		# Exporting again appends to the table
+		exportSQLite(self.events, path)
+		conn=sqlite3.connect(path)
+		self.assertEqual(conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0],2*len(self.events))
+		conn.close()
@@ -0,0 +1,79 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import pickle
+import unittest
+from lsfpy.accounting import *
+from lsfpy.aggregate import GroupBy, Sum
+from lsfpy.fairshare import *
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+
+class TestSAAPTree(unittest.TestCase):
+	def setUp(self):
+		self.t=SAAPTree()
+		self.t.extend(AcctFile([FINISHED, NEVER_STARTED]))
+
+	def test_totals(self):
+		# FINISHED ran for an hour on 2 slots, and was pending for 400 seconds
+		alice=self.t.totals("/dept/alice")
+		self.assertEqual(alice["numJobs"],1)
+		self.assertEqual(alice["cpuTime"],1.75)
+		self.assertEqual(alice["wallTime"],7200)
+		self.assertEqual(alice["pendTime"],400)
+		dept=self.t.node("dept/")
+		self.assertEqual((dept.numJobs, dept.wallTime, dept.pendTime),(2, 7200, 4400))
+		self.assertEqual(self.t.root.numJobs,2)
+		self.assertEqual([n.path for n in self.t.walk()],["/","/dept","/dept/alice","/dept/bob"])
+		self.assertEqual(self.t.node("/nobody"),None)
+		self.assertEqual(self.t.totals("/nobody"),None)
+
+	def test_decay(self):
+		t=SAAPTree(histHours=1)
+		t.addUsage("/a/b", 100, 1000, 0, 0)
+		self.assertAlmostEqual(t.node("/a").decayedCpuTime(3600),10)
+		# Usage added before the last update is decayed to that time
+		t.addUsage("/a/c", 100, 1000, 0, -3600)
+		self.assertAlmostEqual(t.node("/a").decayedWallTime(),1100)
+		self.assertAlmostEqual(t.node("/a/c").decayedWallTime(0),100)
+		self.assertAlmostEqual(t.root.decayedCpuTime(7200),1.1)
+
+	def test_matches_group_by(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=8).write(f, 300)
+		events=list(AcctFile(io.BytesIO(f.getvalue()), lazy=True))
+		g=GroupBy(["chargedSAAP"], [Sum(slotSeconds, name="wallTime"), Sum(cpuTimeSeconds, name="cpuTime")])
+		g.extend(events)
+		a=SAAPTree()
+		a.extend(events[:100])
+		b=pickle.loads(pickle.dumps(SAAPTree()))
+		b.extend(events[100:])
+		a.merge(b)
+		for key, r in g.rows():
+			node=a.node(key[0])
+			if not node.children:
+				self.assertEqual(node.numJobs,r["numJobs"])
+				self.assertAlmostEqual(node.wallTime,r["wallTime"])
+		self.assertAlmostEqual(a.root.cpuTime,sum(r["cpuTime"] for key, r in g.rows()))
+		whole=SAAPTree()
+		whole.extend(events)
+		for x, y in zip(whole.report(1325462400), a.report(1325462400)):
+			self.assertEqual(x["path"],y["path"])
+			self.assertAlmostEqual(x["decayedWallTime"],y["decayedWallTime"])
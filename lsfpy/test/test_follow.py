@@ -0,0 +1,95 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.follow import AcctFollower
+from lsfpy.test.test_archive import finishedAt
+
+class TestFollow(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir,"lsb.acct")
+		self.checkpoint=os.path.join(self.dir,"lsb.acct.chk")
+		self.append(1,2)
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def append(self, *jobIDs):
+		f=open(self.path,"a")
+		for j in jobIDs:
+			f.write(finishedAt(j, 1000+j)+"\n")
+		f.close()
+
+	def follower(self):
+		f=AcctFollower(self.path, checkpoint=self.checkpoint, interval=0)
+		self.addCleanup(f.close)
+		return f
+
+	def test_poll(self):
+		f=self.follower()
+		self.assertEqual([e.jobID for e in f.poll()],[1,2])
+		self.assertEqual(f.poll(),[])
+		self.append(3)
+		self.assertEqual([e.jobID for e in f.poll()],[3])
+
+	def test_partial(self):
+		f=self.follower()
+		f.poll()
+		line=finishedAt(3, 1003)+"\n"
+		out=open(self.path,"a")
+		out.write(line[:40])
+		out.flush()
+		self.assertEqual(f.poll(),[])
+		out.write(line[40:])
+		out.close()
+		self.assertEqual([e.jobID for e in f.poll()],[3])
+
+	def test_checkpoint(self):
+		f=self.follower()
+		self.assertEqual([e.jobID for e in itertools.islice(f, 2)],[1,2])
+		f.commit()
+		f.close()
+		self.append(3)
+		self.assertEqual([e.jobID for e in self.follower().poll()],[3])
+
+	def test_rotation(self):
+		f=self.follower()
+		f.poll()
+		self.append(3)
+		os.rename(self.path, self.path+".1")
+		self.append(4)
+		self.assertEqual([e.jobID for e in f.poll()],[3,4])
+
+	def test_rotated_since_checkpoint(self):
+		f=self.follower()
+		f.poll()
+		f.commit()
+		f.close()
+		self.append(3)
+		os.rename(self.path, self.path+".1")
+		self.append(4)
+		self.assertEqual([e.jobID for e in self.follower().poll()],[3,4])
+
+if __name__ == '__main__':
+	unittest.main()
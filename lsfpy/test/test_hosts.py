@@ -0,0 +1,111 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import pickle
+import unittest
+from lsfpy.accounting import *
+from lsfpy.hosts import *
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED, parse
+from lsfpy.utilization import Utilization
+
+## FINISHED logged with LSF_HPC_EXTENSIONS="SHORT_EVENTFILE", running on 512
+#  slots of two hosts.
+SHORT=FINISHED.replace('2 "hostA" "hostB"', '2 "500*hostA" "12*hostB"')
+
+class TestAllocation(unittest.TestCase):
+	def test_parse(self):
+		self.assertEqual(parseHost("hostA"),("hostA", 1))
+		self.assertEqual(parseHost(b"16*hostA"),("hostA", 16))
+		self.assertEqual(countHosts(["hostA","hostB","hostA","4*hostB"]),[("hostA", 2),("hostB", 5)])
+
+	def test_short_form(self):
+		d=HostDictionary()
+		a=HostAllocation.fromEvent(JobFinishEvent(parse(SHORT)), d)
+		self.assertEqual(a.items(d),[("hostA", 500),("hostB", 12)])
+		self.assertEqual(a.numSlots,512)
+		self.assertEqual(a.slotsOn("hostB", d),12)
+		self.assertEqual(a.slotsOn("hostC", d),0)
+		self.assertEqual(len(list(a.expand(d))),512)
+		self.assertEqual(d.names(),["hostA","hostB"])
+
+	def test_interning(self):
+		# HOSTS does not keep the allocation of every job
+		event=JobFinishEvent(parse(SHORT))
+		a=HostAllocation.fromEvent(event)
+		self.assertFalse(HOSTS.intern)
+		self.assertEqual((HOSTS._entries, HOSTS._allocations),({}, {}))
+		self.assertIsNot(HostAllocation.fromEvent(event),a)
+		d=HostDictionary(intern=True)
+		self.assertIs(HostAllocation.fromEvent(event, d),HostAllocation.fromEvent(event, d))
+		self.assertEqual(len(d._entries),2)
+		self.assertTrue(pickle.loads(pickle.dumps(d)).intern)
+		shared={}
+		self.assertIs(HostAllocation.fromEvent(event, shared=shared),HostAllocation.fromEvent(event, shared=shared))
+		self.assertEqual(HOSTS._allocations,{})
+
+	def test_lazy_matches_eager(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=4).write(f, 200)
+		eager=list(AcctFile(io.BytesIO(f.getvalue())))
+		lazy=list(AcctFile(io.BytesIO(f.getvalue()), lazy=True))
+		self.assertEqual([HostAllocation.fromEvent(e) for e in eager],[HostAllocation.fromEvent(e) for e in lazy])
+		# The lazy events never create their execHosts lists
+		self.assertFalse(any("execHosts" in e.__dict__ for e in lazy))
+
+	def test_generated_short_form(self):
+		long=io.BytesIO()
+		AcctGenerator(seed=5).write(long, 200)
+		short=io.BytesIO()
+		AcctGenerator(seed=5, shortHosts=True).write(short, 200)
+		self.assertLess(len(short.getvalue()),len(long.getvalue()))
+		self.assertEqual([HostAllocation.fromEvent(e).items() for e in AcctFile(io.BytesIO(long.getvalue()), lazy=True)],
+				[HostAllocation.fromEvent(e).items() for e in AcctFile(io.BytesIO(short.getvalue()), lazy=True)])
+
+class TestHostUsage(unittest.TestCase):
+	def test_usage(self):
+		# SHORT runs from 1325372400 to 1325376000
+		u=HostUsage(start=1325374200, end=1325376000, dictionary=HostDictionary())
+		u.extend(AcctFile([SHORT, FINISHED]))
+		self.assertEqual(u.hostNames(),["hostA","hostB"])
+		self.assertEqual(u.busySlotSeconds("hostA"),501*1800)
+		self.assertEqual(u.numJobs("hostB"),2)
+		self.assertEqual(u.utilization("hostB", 13),1.0)
+		self.assertEqual(u.report({"hostA":1002}),[("hostA", 2, 501*1800, 0.5),("hostB", 2, 13*1800, None)])
+		self.assertEqual(u.busySlotSeconds("hostC"),0)
+
+	def test_merge(self):
+		a=HostUsage()
+		a.add(JobFinishEvent(parse(SHORT)))
+		# A copy has its own dictionary, hosts are matched by name
+		b=pickle.loads(pickle.dumps(a))
+		b.dictionary.id("hostZ")
+		c=HostUsage(dictionary=HostDictionary())
+		c.dictionary.id("hostB")
+		c.merge(b)
+		c.merge(a)
+		self.assertEqual(c.busySlotSeconds("hostA"),2*500*3600)
+		self.assertEqual(c.busySlotSeconds("hostB"),2*12*3600)
+
+	def test_utilization_short_form(self):
+		u=Utilization(hosts=True)
+		u.add(JobFinishEvent(parse(SHORT)))
+		self.assertEqual(u.slotsAt(1325373000, "hostA"),500)
+		self.assertEqual(u.hostNames(),["hostA","hostB"])
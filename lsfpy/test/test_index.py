@@ -0,0 +1,95 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.accounting import *
+from lsfpy.index import AcctIndex
+from lsfpy.test.test_accounting import NEVER_STARTED
+from lsfpy.test.test_archive import finishedAt
+from lsfpy.test.test_parallel import MULTILINE
+
+class TestIndex(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir,"lsb.acct")
+		f=open(self.path,"w")
+		for t in range(1000, 2000, 100):
+			f.write(finishedAt(t, t)+"\n")
+		f.write(MULTILINE+"\n")
+		f.write('"JOB_NEW" "7.06" 2000 99\n')
+		f.write(NEVER_STARTED+"\n")
+		f.close()
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def append(self, line):
+		f=open(self.path,"a")
+		f.write(line)
+		f.close()
+
+	def test_lookups(self):
+		i=AcctIndex(self.path)
+		self.assertEqual(len(i),12)
+		self.assertEqual([e.jobID for e in i.byJobID(1234)],[1234])
+		self.assertEqual(i.byJobID(1234)[0].command,'echo "hi"\n"JOB_FINISH" "7.06" 1\nsleep 10')
+		self.assertEqual([e.jobID for e in i.byJobID(1100, 0)],[1100])
+		self.assertEqual(i.byJobID(1100, 3),[])
+		self.assertEqual([e.jobID for e in i.byTime(1200, 1500)],[1200,1300,1400])
+		self.assertEqual([e.jobID for e in i.byTime(fromEpoch(1200), fromEpoch(1500))],[1200,1300,1400])
+		self.assertEqual([e.jobID for e in i.byUser("bob")],[1235])
+		self.assertEqual(len(i.byQueue("normal")),11)
+		self.assertEqual(i.byQueue("missing"),[])
+
+	def test_persisted(self):
+		AcctIndex(self.path)
+		self.assertTrue(os.path.exists(self.path+".idx"))
+		i=AcctIndex(self.path)
+		self.assertEqual(i.update(),0)
+		self.assertEqual(len(i),12)
+		self.assertEqual([e.jobID for e in i.byUser("bob")],[1235])
+
+	def test_incremental(self):
+		i=AcctIndex(self.path)
+		self.assertEqual(len(i.byQueue("normal")),11)
+		line=finishedAt(5000, 5000)+"\n"
+		# A partly written record is not indexed until it is complete
+		self.append(line[:50])
+		self.assertEqual(i.update(),0)
+		self.append(line[50:])
+		self.assertEqual(i.update(),1)
+		self.assertEqual(len(i.byQueue("normal")),12)
+		self.assertEqual(len(AcctIndex(self.path)),13)
+		self.assertEqual([e.jobID for e in AcctIndex(self.path).byJobID(5000)],[5000])
+
+	def test_rotated(self):
+		i=AcctIndex(self.path)
+		os.rename(self.path, self.path+".1")
+		f=open(self.path,"w")
+		f.write(finishedAt(6000, 6000)+"\n")
+		f.close()
+		self.assertEqual(i.update(),1)
+		self.assertEqual(len(i),1)
+		self.assertEqual(len(AcctIndex(self.path)),1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,95 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.accounting import *
+from lsfpy.mapped import *
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED
+
+class TestMapped(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir,"lsb.acct")
+		f=open(self.path,"w")
+		AcctGenerator(seed=7).write(f, 500)
+		f.close()
+		f=open(self.path,"rb")
+		self.expected=list(AcctFile(f))
+		f.close()
+		f=open(self.path,"a")
+		f.write('"JOB_NEW" "7.06" 1 2\n')
+		f.write('"JOB_FINISH" "7.06" 1 "unterminated')
+		f.close()
+		self.mapped=MappedAcctFile(self.path)
+
+	def tearDown(self):
+		self.mapped.close()
+		shutil.rmtree(self.dir)
+
+	def test_matches_acctfile(self):
+		events=list(self.mapped)
+		self.assertEqual(len(events),500)
+		for e, x in zip(events, self.expected):
+			self.assertEqual((e.jobID, e.command, e.execHosts, e.runTime, e.termInfo.number),
+					(x.jobID, x.command, x.execHosts, x.runTime, x.termInfo.number))
+
+	def test_fields_not_copied(self):
+		e=next(iter(self.mapped))
+		self.assertTrue(isinstance(e._row, MappedRow))
+		self.assertEqual(e.queue, self.expected[0].queue)
+
+	def test_ranges(self):
+		jobs=[]
+		for start, end in self.mapped.ranges(7):
+			jobs.extend(e.jobID for e in self.mapped.slice(start, end))
+		self.assertEqual(jobs,[e.jobID for e in self.expected])
+
+	def test_event_at(self):
+		starts=[s for s, e in self.mapped.records()]
+		self.assertEqual(self.mapped.eventAt(starts[3]).jobID,self.expected[3].jobID)
+		self.assertEqual(self.mapped.row(starts[-1])[0],b"JOB_NEW")
+
+	def test_unescape(self):
+		data=b'"A" "say ""hi""" 12 ""\n'
+		row=MappedRow(data, 0, len(data))
+		self.assertEqual(row[:],[b"A",b'say "hi"',b"12",b""])
+
+	def test_no_final_newline(self):
+		path=os.path.join(self.dir,"lsb.acct.1")
+		f=open(path,"w")
+		AcctGenerator(seed=7).write(f, 5)
+		f.write(FINISHED)
+		f.close()
+		m=MappedAcctFile(path)
+		self.assertEqual([e.jobID for e in m][-1],1234)
+		self.assertEqual(len(list(m)),6)
+		self.assertEqual(m.row(list(m.records())[-1][0])[3],b"1234")
+		m.close()
+
+	def test_empty(self):
+		path=os.path.join(self.dir,"empty")
+		open(path,"w").close()
+		self.assertEqual(list(MappedAcctFile(path)),[])
+
+if __name__ == '__main__':
+	unittest.main()
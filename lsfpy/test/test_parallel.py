@@ -0,0 +1,97 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import os
+import shutil
+import tempfile
+import unittest
+from lsfpy.accounting import *
+from lsfpy.parallel import *
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+
+## A JOB_FINISH record whose command contains newlines and quotes, including a
+#  line that looks like the start of another record.
+MULTILINE=FINISHED.replace('"sleep 10"','"echo ""hi""\n""JOB_FINISH"" ""7.06"" 1\nsleep 10"')
+
+def countQueues(events):
+	counts={}
+	for e in events:
+		counts[e.queue]=counts.get(e.queue,0)+1
+	return counts
+
+def mergeCounts(a, b):
+	for k, v in b.items():
+		a[k]=a.get(k,0)+v
+	return a
+
+class TestParallel(unittest.TestCase):
+	def setUp(self):
+		self.dir=tempfile.mkdtemp()
+		self.path=os.path.join(self.dir,"lsb.acct")
+		f=open(self.path,"w")
+		for i in range(20):
+			f.write(FINISHED.replace(" 1234 "," %d " % i,1)+"\n")
+			f.write(MULTILINE+"\n")
+			f.write(NEVER_STARTED+"\n")
+		f.close()
+		with open(self.path,"rb") as f:
+			self.expected=[(e.jobID, e.command) for e in AcctFile(f)]
+
+	def tearDown(self):
+		shutil.rmtree(self.dir)
+
+	def test_record_start(self):
+		fh=open(self.path,"rb")
+		data=fh.read()
+		size=len(data)
+		for offset in range(size):
+			b=recordStart(fh, offset, size)
+			self.assertTrue(b==size or data[b:b+12]==b'"JOB_FINISH"', offset)
+			self.assertTrue(b>=offset)
+		fh.close()
+
+	def test_ranges_cover_file(self):
+		ranges=chunkRanges(self.path, 1000)
+		self.assertEqual(ranges[0][0],0)
+		self.assertEqual(ranges[-1][1],os.path.getsize(self.path))
+		for a, b in zip(ranges, ranges[1:]):
+			self.assertEqual(a[1],b[0])
+
+	def test_file_order(self):
+		events=list(ParallelAcctFile(self.path, processes=2, chunkSize=1000))
+		self.assertEqual([(e.jobID, e.command) for e in events],self.expected)
+
+	def test_compact(self):
+		events=list(ParallelAcctFile(self.path, processes=2, chunkSize=1000, eventClass=CompactJobFinishEvent))
+		self.assertEqual(len(events),len(self.expected))
+
+	def test_reduce(self):
+		counts=ParallelAcctFile(self.path, processes=2, chunkSize=1000).reduce(countQueues, mergeCounts, {})
+		self.assertEqual(counts,{"normal":40,"short":20})
+
+	def test_no_final_newline(self):
+		f=open(self.path,"ab")
+		f.write(FINISHED.replace(" 1234 "," 99 ",1).encode("utf-8"))
+		f.close()
+		events=list(ParallelAcctFile(self.path, processes=2, chunkSize=1000))
+		self.assertEqual(events[-1].jobID,99)
+		self.assertEqual(len(events),len(self.expected)+1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,83 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import unittest
+from lsfpy.accounting import *
+from lsfpy.schema import *
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+
+# The fields added after licenseProject in each version, 7.06 records with 
+# one submitEXT pair and two hostRusage entries.
+V7_0=' "myapp" "post.sh" 600 "/grp" 0 "" "" 0 "nightly"'
+V7_06=' 1 "key" "value" 2 "hostA" 100 200 1 0 "hostB" 300 400 2 1'
+V8_0=' 0 3600 1500 "select[type==any]" "" 0 "" 0 0 0 0 0 "/out" 3590 "/home/alice"'
+V9_1=' 1 "net0" 2 "" 0.5 1.25 10 20 30 2 "hostA" "hostB" 0 1 1 10 2'
+V10_1=' 1325376100'
+
+def record(version, extra=""):
+	return parseRecord(FINISHED.replace('"7.06"','"%s"' % version, 1)+extra+"\n")
+
+class TestSchema(unittest.TestCase):
+	def test_same_as_eager(self):
+		for line in [FINISHED, NEVER_STARTED]:
+			j=JobFinishEvent(parseRecord(line+"\n"))
+			v=VersionedJobFinishEvent(parseRecord(line+"\n"))
+			for name in ["jobID","userName","askedHosts","execHosts","utime","startTime","runTime","waitTime","chargedSAAP","licenseProject"]:
+				self.assertEqual(getattr(v,name),getattr(j,name),name)
+			self.assertEqual(v.termInfo.number,j.termInfo.number)
+
+	def test_versions(self):
+		v=VersionedJobFinishEvent(record("7.0", V7_0))
+		self.assertEqual(v.app,"myapp")
+		self.assertEqual(v.runtimeEstimation,600)
+		self.assertEqual(v.jobDescription,"nightly")
+		self.assertEqual(v.hostRusage,None)
+
+		v=VersionedJobFinishEvent(record("7.06", V7_0+V7_06))
+		self.assertEqual(v.submitEXT,[("key","value")])
+		self.assertEqual(v.hostRusage,[("hostA","100","200","1","0"),("hostB","300","400","2","1")])
+
+		v=VersionedJobFinishEvent(record("10.1", V7_0+V7_06+V8_0+V9_1+V10_1))
+		self.assertEqual(v.loggedRunTime,3590)
+		self.assertEqual(v.subcwd,"/home/alice")
+		self.assertEqual(v.networks,[("net0","2")])
+		self.assertEqual(v.allocSlots,["hostA","hostB"])
+		self.assertEqual(v.indexRanges,[("1","10","2")])
+		self.assertEqual(v.requeueTime,1325376100.0)
+		# runTime is still calculated, not the logged value
+		self.assertEqual(v.runTime.seconds,3600)
+
+	def test_mixed_versions(self):
+		lines=[FINISHED+"\n", FINISHED.replace('"7.06"','"9.1"',1)+V7_0+V7_06+V8_0+V9_1+"\n"]
+		jobs=list(AcctFile(lines, eventClass=VersionedJobFinishEvent))
+		self.assertEqual(len(jobs),2)
+		self.assertEqual(jobs[0].app,None)
+		self.assertEqual(jobs[1].ineligiblePendTime,0)
+		self.assertEqual(jobs[1].requeueTime,None)
+
+	def test_short_records(self):
+		# Newer fields that were not logged are None
+		v=VersionedJobFinishEvent(record("10.1", V7_0))
+		self.assertEqual(v.jobDescription,"nightly")
+		self.assertEqual(v.submitEXT,None)
+		self.assertRaises(ValueError, VersionedJobFinishEvent, parseRecord(FINISHED+"\n")[:-1])
+
+	def test_compiled_once(self):
+		self.assertTrue(jobFinishDecoder("8.0") is jobFinishDecoder("8.0"))
+		self.assertTrue(jobFinishDecoder("6.2") is not jobFinishDecoder("7.0"))
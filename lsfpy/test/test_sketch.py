@@ -0,0 +1,114 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import bisect
+import json
+import pickle
+import random
+import unittest
+from lsfpy.sketch import *
+
+class TestTDigest(unittest.TestCase):
+	def setUp(self):
+		r=random.Random(1)
+		self.values=[r.expovariate(0.01) for i in range(20000)]
+		self.digest=TDigest()
+		other=TDigest()
+		for v in self.values[:10000]:
+			self.digest.add(v)
+		for v in self.values[10000:]:
+			other.add(v)
+		self.digest.merge(other)
+
+	def test_quantiles(self):
+		values=sorted(self.values)
+		for q in (0.001, 0.01, 0.5, 0.9, 0.99, 0.999):
+			# The rank of the estimate is close to the quantile asked for
+			rank=bisect.bisect_left(values, self.digest.quantile(q))/float(len(values))
+			self.assertTrue(abs(rank-q)<=0.002, q)
+		self.assertEqual(self.digest.quantile(0),values[0])
+		self.assertEqual(self.digest.quantile(1),values[-1])
+		self.assertTrue(len(self.digest.centroids)<=100)
+
+	def test_serialize(self):
+		copy=TDigest.fromDict(json.loads(json.dumps(self.digest.toDict())))
+		self.assertEqual(copy.quantile(0.9),self.digest.quantile(0.9))
+		self.assertEqual(TDigest().quantile(0.5),None)
+
+class TestHyperLogLog(unittest.TestCase):
+	def test_count(self):
+		a=HyperLogLog()
+		b=HyperLogLog()
+		for i in range(20000):
+			a.add("user%d" % i)
+			b.add("user%d" % (i+10000))
+		self.assertTrue(abs(a.count()-20000)<=20000*0.05)
+		a.merge(b)
+		self.assertTrue(abs(a.count()-30000)<=30000*0.05)
+		self.assertEqual(HyperLogLog.fromDict(json.loads(json.dumps(a.toDict()))).count(),a.count())
+
+	def test_small(self):
+		h=HyperLogLog()
+		for v in ["a","b","c","a",1,1]:
+			h.add(v)
+		self.assertEqual(h.count(),4)
+		self.assertRaises(ValueError, h.merge, HyperLogLog(10))
+
+class TestSpaceSaving(unittest.TestCase):
+	def test_top(self):
+		r=random.Random(2)
+		values=[int(r.paretovariate(1.2)) for i in range(20000)]
+		a=SpaceSaving(20)
+		b=pickle.loads(pickle.dumps(SpaceSaving(20)))
+		for v in values[:10000]:
+			a.add(v)
+		for v in values[10000:]:
+			b.add(v)
+		a.merge(b)
+		counts={}
+		for v in values:
+			counts[v]=counts.get(v,0)+1
+		exact=sorted(counts.items(), key=lambda i: -i[1])[:3]
+		top=a.top(3)
+		self.assertEqual([v for v, c, e in top],[v for v, c in exact])
+		for (v, c, e), (ev, ec) in zip(top, exact):
+			self.assertTrue(c-e<=ec<=c)
+		self.assertEqual(SpaceSaving.fromDict(json.loads(json.dumps(a.toDict()))).top(3),top)
+
+	def test_weighted(self):
+		# Replacing the smallest count by scanning every counter gives the 
+		# same counters as the heap
+		r=random.Random(3)
+		s=SpaceSaving(50)
+		counters={}
+		for i in range(20000):
+			value=int(r.paretovariate(0.8))
+			weight=r.random()
+			s.add(value, weight)
+			if value in counters:
+				counters[value][0]+=weight
+			elif len(counters)<50:
+				counters[value]=[weight, 0]
+			else:
+				smallest=min(counters, key=lambda v: counters[v][0])
+				count=counters.pop(smallest)[0]
+				counters[value]=[count+weight, count]
+		self.assertEqual(s.counters,counters)
+		self.assertEqual(len(s._heap),50)
+		self.assertEqual(s._floor(),min(c[0] for c in counters.values()))
@@ -0,0 +1,49 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import unittest
+from lsfpy.accounting import *
+from lsfpy.synthetic import AcctGenerator
+
+class TestGenerator(unittest.TestCase):
+	def setUp(self):
+		self.records=list(AcctGenerator(seed=3).records(2000))
+
+	def test_deterministic(self):
+		self.assertEqual(list(AcctGenerator(seed=3).records(2000)),self.records)
+		self.assertNotEqual(list(AcctGenerator(seed=4).records(10)),self.records[:10])
+
+	def test_parses(self):
+		jobs=list(AcctFile(io.BytesIO("".join(self.records).encode("utf-8"))))
+		self.assertEqual(len(jobs),2000)
+		for j in jobs:
+			self.assertEqual(len(j.execHosts),j.numExHosts)
+			self.assertTrue(j.submitTimeEpoch<=j.eventTimeEpoch)
+
+	def test_variety(self):
+		jobs=list(AcctFile(io.BytesIO("".join(self.records).encode("utf-8")), lazy=True))
+		self.assertTrue(any("\n" in j.command and '"' in j.command for j in jobs))
+		self.assertTrue(any(j.idx!="0" for j in jobs))
+		self.assertTrue(any(j.maxrss=="-1" for j in jobs))
+		self.assertTrue(any(j.startTimeEpoch==0 for j in jobs))
+		self.assertTrue(any(j.numExHosts>=64 for j in jobs))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,67 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+import io
+import unittest
+from lsfpy.accounting import *
+from lsfpy.synthetic import AcctGenerator
+from lsfpy.test.test_accounting import FINISHED, NEVER_STARTED
+from lsfpy.utilization import Utilization
+
+class TestUtilization(unittest.TestCase):
+	def setUp(self):
+		# FINISHED runs on 2 slots from 1325372400 to 1325376000, NEVER_STARTED
+		# is pending from 1325372000 to 1325376000.
+		self.u=Utilization(hosts=True)
+		self.u.extend(AcctFile([FINISHED, NEVER_STARTED]))
+
+	def test_instant(self):
+		self.assertEqual(self.u.slotsAt(1325372399),0)
+		self.assertEqual(self.u.slotsAt(1325372400),2)
+		self.assertEqual(self.u.slotsAt(1325376000),0)
+		self.assertEqual(self.u.pendingAt(1325372000),2)
+		self.assertEqual(self.u.pendingAt(1325372400),1)
+		self.assertEqual(self.u.slotsAt(1325373000, "hostA"),1)
+
+	def test_series(self):
+		rows=self.u.series(1325372000, 1325376000, 400)
+		self.assertEqual(len(rows),10)
+		self.assertEqual(rows[0],(1325372000, 0.0, 2.0, 0))
+		self.assertEqual(rows[1],(1325372400, 2.0, 1.0, 0))
+		self.assertEqual(self.u.throughput(1325372000, 1325376001, 4000),[0, 2])
+		# A partial interval is averaged over its own length
+		self.assertEqual(self.u.running(1325372200, 1325372600, 400),[1.0])
+
+	def test_hosts(self):
+		self.assertEqual(self.u.hostNames(),["hostA","hostB"])
+		self.assertEqual(self.u.hostUtilization("hostB", 4, 1325372400, 1325376000, 3600),[0.25])
+
+	def test_matches_brute_force(self):
+		f=io.BytesIO()
+		AcctGenerator(seed=11).write(f, 300)
+		events=list(AcctFile(io.BytesIO(f.getvalue()), lazy=True))
+		u=Utilization()
+		u.extend(events[:150])
+		other=Utilization()
+		other.extend(events[150:])
+		u.merge(other)
+		start=min(e.submitTimeEpoch for e in events)
+		for t in range(int(start), int(start)+86400, 3001):
+			self.assertEqual(u.slotsAt(t),sum(e.numProcessors for e in events if 1<=e.startTimeEpoch<=t<e.eventTimeEpoch))
+		self.assertEqual(sum(u.throughput(0, 2**32, 3600*24*365)),len(events))
@@ -0,0 +1,204 @@
+#!python
+#
+# This file is part of the python lsf collection.
+#
+# The python LSF collection is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The python LSF collection is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with The python LSF collection.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Copyright 2011 David Irvine
+#
+
+
+from bisect import bisect_left, bisect_right
+from lsfpy.hosts import HOSTS, HostAllocation
+
+## Calculates how busy a cluster was over time from JOB_FINISH events, using
+#  a sweep over the times jobs were submitted, started and finished.  Each 
+#  job adds two changes to the number of running slots, one when it starts 
+#  and one when it finishes, and two to the number of pending jobs, when it 
+#  is submitted and when it starts.  The changes are sorted once, and then 
+#  each series is calculated in a single pass, so the cost is O(n log n) for
+#  n jobs plus the number of intervals, whatever the resolution.
+#
+#  Running slots are weighted by numProcessors.  When hosts is True the 
+#  slots used on each host are also tracked, counted from execHosts with a
+#  HostAllocation, so hosts in the short N*host form are counted correctly.
+#  Jobs that never started are pending until they finish.
+#
+# Example Usage:
+#
+# The following code prints the average number of running slots, pending 
+# jobs and jobs finished for each hour of a day.
+#\code
+#from lsfpy.accounting import AcctFile
+#from lsfpy.utilization import Utilization
+#u=Utilization()
+#u.extend(AcctFile(open('lsb.acct','rb'), lazy=True))
+#for row in u.series(1325376000, 1325462400, 3600):
+#    print(row)
+#\endcode
+class Utilization(object):
+	## Initializer is called with whether to track each host.
+	#\param hosts True to track the slots used on each host.
+	#\param dictionary The HostDictionary used to look up host IDs.
+	def __init__(self, hosts=False, dictionary=HOSTS):
+		self.hosts=hosts
+		self.dictionary=dictionary
+		self._slots=[]
+		self._pending=[]
+		self._finished=[]
+		self._hostSlots={}
+		self._sorted=True
+
+	## Adds a job.
+	#\param event A JobFinishEvent, or any object with the same attributes.
+	def add(self, event):
+		start=event.startTimeEpoch
+		end=event.eventTimeEpoch
+		submit=event.submitTimeEpoch
+		self._finished.append(end)
+		self._pending.append((submit, 1))
+		if start<1:
+			self._pending.append((end, -1))
+		else:
+			self._pending.append((start, -1))
+			self._slots.append((start, event.numProcessors))
+			self._slots.append((end, -event.numProcessors))
+			if self.hosts:
+				allocation=HostAllocation.fromEvent(event, self.dictionary)
+				for host, n in zip(allocation.hostIds, allocation.slots):
+					changes=self._hostSlots.setdefault(host, [])
+					changes.append((start, n))
+					changes.append((end, -n))
+		self._sorted=False
+
+	## Adds every event from an iterable, such as an AcctFile.
+	def extend(self, events):
+		for e in events:
+			self.add(e)
+
+	## Adds the jobs from another Utilization object, for example one 
+	#  calculated from another file or in another process.
+	def merge(self, other):
+		self._slots.extend(other._slots)
+		self._pending.extend(other._pending)
+		self._finished.extend(other._finished)
+		for host, changes in other._hostSlots.items():
+			if other.dictionary is not self.dictionary:
+				host=self.dictionary.id(other.dictionary.name(host))
+			self._hostSlots.setdefault(host, []).extend(changes)
+		self._sorted=False
+
+	def _sort(self):
+		if not self._sorted:
+			self._slots.sort()
+			self._pending.sort()
+			self._finished.sort()
+			for changes in self._hostSlots.values():
+				changes.sort()
+			self._sorted=True
+
+	## Returns the hosts that have been tracked.
+	def hostNames(self):
+		return sorted(self.dictionary.name(h) for h in self._hostSlots)
+
+	def _changes(self, host):
+		self._sort()
+		if host is None:
+			return self._slots
+		return self._hostSlots.get(self.dictionary.find(host), [])
+
+	## Returns the number of slots in use at a time.
+	#\param t The time in seconds since the epoch.
+	#\param host The host, or None for the whole cluster.
+	def slotsAt(self, t, host=None):
+		changes=self._changes(host)
+		return sum(d for time, d in changes[:bisect_right(changes, (t, float("inf")))])
+
+	## Returns the number of jobs pending at a time.
+	#\param t The time in seconds since the epoch.
+	def pendingAt(self, t):
+		self._sort()
+		return sum(d for time, d in self._pending[:bisect_right(self._pending, (t, float("inf")))])
+
+	## Returns the average number of running slots in each interval.
+	#\param start The start of the first interval, in seconds since the epoch.
+	#\param end The end of the last interval.
+	#\param step The length of each interval in seconds.
+	#\param host The host, or None for the whole cluster.
+	#\returns A list with the average for each interval.
+	def running(self, start, end, step, host=None):
+		return _averages(self._changes(host), start, end, step)
+
+	## Returns the average number of pending jobs in each interval, see 
+	#  running.
+	def pending(self, start, end, step):
+		self._sort()
+		return _averages(self._pending, start, end, step)
+
+	## Returns the number of jobs that finished in each interval, see 
+	#  running.
+	def throughput(self, start, end, step):
+		self._sort()
+		counts=[]
+		t=start
+		lo=bisect_left(self._finished, start)
+		while t<end:
+			hi=bisect_left(self._finished, min(t+step, end))
+			counts.append(hi-lo)
+			lo=hi
+			t+=step
+		return counts
+
+	## Returns the utilization of a host, the average fraction of its slots 
+	#  that were in use in each interval, see running.
+	#\param host The name of the host.
+	#\param slots The number of slots the host has.
+	def hostUtilization(self, host, slots, start, end, step):
+		return [r/float(slots) for r in self.running(start, end, step, host)]
+
+	## Returns the running slots, pending jobs and throughput for each 
+	#  interval, see running.
+	#\returns A list of (time, running, pending, finished) tuples, where time
+	#  is the start of the interval.
+	def series(self, start, end, step):
+		times=[]
+		t=start
+		while t<end:
+			times.append(t)
+			t+=step
+		return list(zip(times, self.running(start, end, step),
+				self.pending(start, end, step), self.throughput(start, end, step)))
+
+## Calculates the time weighted average of a step function in each interval.
+#\param changes A sorted list of (time, change) tuples.
+#\returns A list of averages, one for each interval.
+def _averages(changes, start, end, step):
+	i=bisect_right(changes, (start, float("inf")))
+	level=sum(d for time, d in changes[:i])
+	averages=[]
+	t=start
+	while t<end:
+		until=min(t+step, end)
+		area=0.0
+		last=t
+		while i<len(changes) and changes[i][0]<until:
+			time, d=changes[i]
+			area+=level*(time-last)
+			level+=d
+			last=time
+			i+=1
+		area+=level*(until-last)
+		averages.append(area/(until-t))
+		t=until
+	return averages
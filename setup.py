@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 
 setup(
 	name='Python LSF Collection',
@@ -6,9 +6,11 @@ setup(
 	author='David Irvine',
 	author_email='irvined@gmail.com',
 	packages=['lsfpy', 'lsfpy.test'],
-	scripts=[],
+	scripts=['bin/jobStats.py', 'bin/benchAcct.py'],
 	url='http://code.google.com/p/python-lsf-collection/',
-	license='LICENSE.txt',
+	license='LICENSE',
 	description='A collection of classes and utilities for manipulating data and tools under platform LSF.',
-	long_description=open('README.txt').read(),
+	long_description=open('README.md').read(),
+	long_description_content_type='text/markdown',
+	python_requires='>=3.9',
 )